@@ -60,6 +60,9 @@ subroutine emanuel_convection(T, Q, QS, U, V, TRA, P, PH, &
 !f2py depend(NCOL) IFLAG, CBMFold, CBMFnew, PRECIP, WD, TPRIME, QPRIME
 !f2py depend(NCOL,ND) Tout,Qout,QSout,Uout,Vout
 !f2py depend(NCOL,ND,NTRA) TRAout
+!  Release the Python GIL during the call, so independent chunks of columns
+!  can be computed in parallel threads (CONVECT has no saved state)
+!f2py threadsafe
 
     do j = 1, NCOL
       Tout(j,:) = T(j,:)
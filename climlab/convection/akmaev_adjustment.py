@@ -4,7 +4,7 @@ from climlab import constants as const
 import sys
 
 
-def convective_adjustment_direct(p, T, c, lapserate=6.5):
+def convective_adjustment_direct(p, T, c, lapserate=6.5, coefficients=None):
     """Convective Adjustment to a specified lapse rate.
 
     Input argument lapserate gives the lapse rate expressed in degrees K per km
@@ -17,28 +17,105 @@ def convective_adjustment_direct(p, T, c, lapserate=6.5):
     p is pressure in hPa
     T is temperature in K
     c is heat capacity in in J / m**2 / K
+    coefficients is the output of convective_adjustment_coefficients(p, c, lapserate)
+        (optional). These only depend on pressure, heat capacity and lapse rate,
+        so they can be computed once and reused. If given, p, c and lapserate are ignored.
+
+    The vertical axis is the last axis of all inputs. T may have any number
+    of leading (horizontal) dimensions; all columns are adjusted at once.
+    p, c and lapserate may be given per level or for every column.
+    Columns that are already stable are returned unchanged,
+    and only the unstable columns are passed to the adjustment algorithm.
 
     Implements the conservative adjustment algorithm from Akmaev (1991) MWR
     """
+    if coefficients is None:
+        coefficients = convective_adjustment_coefficients(p, c, lapserate)
+    Pi, beta, q = coefficients
+    theta = T * beta
+    #  a column is unstable if potential temperature decreases upward anywhere
+    unstable = np.any(theta[..., :-1] > theta[..., 1:], axis=-1)
+    T = np.array(np.broadcast_to(T, theta.shape))
+    if np.all(unstable):
+        T = Akmaev_adjustment_columns(theta, q) * Pi
+    elif np.any(unstable):
+        #  Pi and q may be the same for all columns or given for every column
+        Pi = np.broadcast_to(Pi, theta.shape)[unstable]
+        q = np.broadcast_to(q, theta.shape)[unstable]
+        T[unstable] = Akmaev_adjustment_columns(theta[unstable], q) * Pi
+    return T
+
+
+def convective_adjustment_coefficients(p, c, lapserate=6.5):
+    """Pressure-dependent quantities needed by :func:`convective_adjustment_direct`.
+
+    inputs: p, c and lapserate as for convective_adjustment_direct
+
+    Returns a tuple (Pi, beta, q) where Pi is the ratio of temperature to
+    potential temperature (the reference pressure is const.ps),
+    beta = 1 / Pi, and q = Pi * c is the weight of each level in the
+    potential temperature adjustment.
+    """
     # largely follows notation and algorithm in Akmaev (1991) MWR
     alpha = const.Rd / const.g * lapserate / 1.E3 # same dimensions as lapserate
-    L = p.size
     ###  now handles variable lapse rate
-    pextended = np.insert(p,0,const.ps)  # prepend const.ps = 1000 hPa as ref pressure to compute potential temperature
-    Pi = np.cumprod((p / pextended[:-1])**alpha)  # Akmaev's equation 14 recurrence formula
+    p = np.asarray(p)
+    # prepend const.ps = 1000 hPa as ref pressure to compute potential temperature
+    pextended = np.concatenate((np.full(p.shape[:-1] + (1,), const.ps), p), axis=-1)
+    Pi = np.cumprod((p / pextended[..., :-1])**alpha, axis=-1)  # Akmaev's equation 14 recurrence formula
     beta = 1./Pi
-    theta = T * beta
     q = Pi * c
-    n_k = np.zeros(L, dtype=np.int8)
-    theta_k = np.zeros_like(p)
-    s_k = np.zeros_like(p)
-    t_k = np.zeros_like(p)
-    thetaadj = Akmaev_adjustment_multidim(theta, q, beta, n_k,
-                                           theta_k, s_k, t_k)
-    T = thetaadj * Pi
-    return T
+    return Pi, beta, q
+
+
+def Akmaev_adjustment_columns(theta, q):
+    """Conservative adjustment of potential temperature for any number of columns at once.
+
+    Same result as :func:`Akmaev_adjustment` applied to each column
+    (up to roundoff), but vectorized over columns with numpy.
+
+    Akmaev's algorithm joins adjacent unstable layers into neutral layers
+    whose potential temperature is the ``q``-weighted mean.
+    The result does not depend on the order in which unstable pairs
+    are joined, so here every unstable adjacent pair of layers in every column
+    is joined at once, and this is repeated until all columns are stable.
+    The number of numpy passes is at most the number of levels,
+    and usually much smaller.
+
+    inputs:
+    theta is potential temperature, vertical axis last (surface first)
+    q is the weight of each level (same shape as theta or broadcastable to it)
+
+    Returns the adjusted potential temperature with the same shape as theta.
+    """
+    theta = np.asarray(theta, dtype=float)
+    shape = theta.shape
+    L = shape[-1]  # number of vertical levels
+    theta = np.reshape(theta, (-1, L))
+    q = np.broadcast_to(q, shape).reshape(theta.shape)
+    q_flat = q.ravel()
+    qtheta_flat = (q * theta).ravel()
+    #  first level of each layer, columns flattened one after another
+    #  Initially every level is its own layer
+    start = np.ones(theta.size, dtype=bool)
+    while True:
+        layer = np.cumsum(start) - 1
+        s = np.bincount(layer, weights=q_flat)
+        t = np.bincount(layer, weights=qtheta_flat)
+        layer_theta = t / s
+        first = np.flatnonzero(start)
+        #  unstable if the potential temperature of a layer is higher than
+        #  the layer above it in the same column
+        unstable = layer_theta[:-1] > layer_theta[1:]
+        unstable &= (first[1:] % L) != 0
+        if not np.any(unstable):
+            break
+        #  join each unstable layer with the one above
+        start[first[1:][unstable]] = False
+    return np.reshape(layer_theta[layer], shape)
 
 
+#  Pure Python reference implementation, one column at a time.
 # @jit  # numba.jit not working here. Not clear why.
 #  At least we get something like 10x speedup from the inner loop
 def Akmaev_adjustment_multidim(theta, q, beta, n_k, theta_k, s_k, t_k):
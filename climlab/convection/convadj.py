@@ -5,7 +5,8 @@ from climlab import constants as const
 from climlab.utils.thermo import rho_moist, pseudoadiabat
 from climlab.process.time_dependent_process import TimeDependentProcess
 from climlab.domain.field import Field
-from .akmaev_adjustment import convective_adjustment_direct
+from .akmaev_adjustment import (convective_adjustment_direct,
+                                convective_adjustment_coefficients)
 
 
 class ConvectiveAdjustment(TimeDependentProcess):
@@ -38,6 +39,14 @@ class ConvectiveAdjustment(TimeDependentProcess):
     levels of the adjustment. This is number of pressure levels if the surface is
     not adjusted, or number of pressure levels + 1 if the surface is adjusted.
 
+    The vertical axis must be the last axis of the state variables. Any leading
+    dimensions (latitude, longitude, ensemble members...) are treated as
+    independent columns, which are all adjusted in a single call.
+    Columns that are already stable are left untouched, so the cost of the
+    adjustment scales with the number of convecting columns.
+    For numeric or dry adiabatic lapse rates the pressure-dependent
+    coefficients of the algorithm are computed once and reused at every step.
+
     This process implements the conservative adjustment algorithm described in
     Akmaev (1991) Monthly Weather Review.
     '''
@@ -95,6 +104,14 @@ class ConvectiveAdjustment(TimeDependentProcess):
     def adj_lapse_rate(self, lapserate):
         self._adj_lapse_rate = lapserate
         self.param['adj_lapse_rate'] = lapserate
+        #  cached coefficients are no longer valid
+        self._coefficients = None
+    @property
+    def _moist(self):
+        #  critical lapse rate depends on the temperature
+        lapserate = self._adj_lapse_rate
+        return (type(lapserate) is str and
+                lapserate in ['MALR', 'moist adiabat', 'pseudoadiabat'])
 
     def _compute(self):
         if self.adj_lapse_rate is None:
@@ -102,14 +119,27 @@ class ConvectiveAdjustment(TimeDependentProcess):
             self.adjustment['Tatm'] = self.Tatm * 0.
         else:
             #  convective adjustment routine expect reversered vertical axis
-            pflip = self.pcol[..., ::-1]
             Tflip = self.Tcol[..., ::-1]
+            pflip = self.pcol[..., ::-1]
             cflip = self.ccol[..., ::-1]
             lapseflip = np.atleast_1d(self.adj_lapse_rate)[..., ::-1]
-            Tadj_flip = convective_adjustment_direct(pflip, Tflip, cflip, lapserate=lapseflip)
+            inputs = (pflip, cflip, lapseflip)
+            #  reuse the coefficients if pressure, heat capacity and lapse rate
+            #  are the same as when they were computed
+            cached = self._coefficients
+            if cached is not None and all(np.array_equal(new, old)
+                                          for new, old in zip(inputs, cached[0])):
+                coefficients = cached[1]
+            else:
+                coefficients = convective_adjustment_coefficients(*inputs)
+                if not self._moist:
+                    self._coefficients = (tuple(np.copy(x) for x in inputs),
+                                          coefficients)
+            Tadj_flip = convective_adjustment_direct(None, Tflip, None,
+                                                     coefficients=coefficients)
             Tadj = Tadj_flip[..., ::-1]
             if 'Ts' in self.state:
-                Ts = Field(Tadj[...,-1], domain=self.Ts.domain)
+                Ts = Field(np.reshape(Tadj[...,-1], self.Ts.shape), domain=self.Ts.domain)
                 Tatm = Field(Tadj[...,:-1], domain=self.Tatm.domain)
                 self.adjustment['Ts'] = Ts - self.Ts
             else:
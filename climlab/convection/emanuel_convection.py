@@ -87,6 +87,11 @@ class EmanuelConvection(TimeDependentProcess):
         - DAMP = 0.1, second parameter that controls the rate of approach to quasi-equilibrium (DAMP must be less than 1)
         - IPBL = 0, switch to bypass the dry convective adjustment (bypass if IPBL==0)
 
+    Additional input arguments:
+
+        - skip_stable_columns = False, if True, the Fortran code is not called for columns where no lifted parcel can be buoyant and there was no convection at the last time step. These columns get zero tendencies, precipitation and cloud base mass flux (as CONVECT would return) and IFLAG = -1 (not computed, instead of the reason CONVECT would give for not convecting). The test is conservative (all parcel origin levels and all levels above them are checked, with bounds that favour buoyancy), so it is faster when many columns are stable but never skips a column that convects. Ignored if IPBL != 0.
+        - num_threads = 1, number of threads. If larger than one, the columns are split into this many chunks which are computed in parallel, and the results are put back together in the same order (identical to the serial calculation). The thread pool is created on the first time step and reused until ``num_threads`` is changed. This requires the Fortran extension to release the GIL (as built from Driver.f90).
+
     Tendencies computed:
 
         - air temperature (K/s)
@@ -164,6 +169,8 @@ class EmanuelConvection(TimeDependentProcess):
             ALPHA=0.2,
             DAMP=0.1,
             IPBL=0,
+            skip_stable_columns=False,
+            num_threads=1,
             **kwargs):
         super(EmanuelConvection, self).__init__(**kwargs)
         self.time_type = 'explicit'
@@ -189,6 +196,20 @@ class EmanuelConvection(TimeDependentProcess):
         self.add_input('ALPHA', ALPHA)
         self.add_input('DAMP', DAMP)
         self.add_input('IPBL', IPBL)
+        self.add_input('skip_stable_columns', skip_stable_columns)
+        self.add_input('num_threads', num_threads)
+        self._executor = None
+        self._allocate_buffers()
+
+    def _allocate_buffers(self):
+        #  Persistent output arrays (IFLAG, FT, FQ, FU, FV, PRECIP, CBMF)
+        #  in the (NCOL, ND) order of CONVECT, filled at every time step
+        T = _climlab_to_convect(self.state['Tatm'])
+        NCOL, ND = T.shape
+        self._output_buffers = (np.zeros(NCOL, dtype=int),
+                                np.zeros((NCOL,ND)), np.zeros((NCOL,ND)),
+                                np.zeros((NCOL,ND)), np.zeros((NCOL,ND)),
+                                np.zeros(NCOL), np.zeros(NCOL))
 
     def _compute(self):
         #  Invert arrays so the first element is the bottom of column
@@ -197,10 +218,8 @@ class EmanuelConvection(TimeDependentProcess):
         P = _climlab_to_convect(dom.lev.points)
         PH = _climlab_to_convect(dom.lev.bounds)
         Q = _climlab_to_convect(self.state['q'])
-        QS = qsat(T,P)
         ND = np.size(T, axis=1)
         NCOL = np.size(T, axis=0)
-        NL = ND-1
         try:
             U = _climlab_to_convect(self.state['U'])
         except:
@@ -209,10 +228,84 @@ class EmanuelConvection(TimeDependentProcess):
             V = _climlab_to_convect(self.state['V'])
         except:
             V = np.zeros_like(T)
+        DELT = float(self.timestep)
+        CBMF = np.reshape(self.CBMF, (NCOL,))
+        if self.skip_stable_columns and self.IPBL == 0:
+            active = _possibly_convecting(T, Q, P, PH, CBMF, self.MINORIG, self.DTMAX)
+        else:
+            active = np.ones(NCOL, dtype=bool)
+        if self._output_buffers[0].shape != (NCOL,):
+            self._allocate_buffers()
+        (IFLAG, FT, FQ, FU, FV, PRECIP, CBMFnew) = self._output_buffers
+        #  Columns where convection is skipped: zero output and IFLAG = -1
+        if not np.all(active):
+            for out in self._output_buffers:
+                out[~active] = 0
+            IFLAG[~active] = -1
+        #  Chunks of the active columns, one per thread
+        columns = np.flatnonzero(active)
+        num_chunks = int(min(self.num_threads, columns.size))
+        if num_chunks > 0:
+            chunks = np.array_split(columns, num_chunks)
+            if columns.size == NCOL:
+                #  contiguous chunks, no need to gather the inputs
+                chunks = [slice(chunk[0], chunk[-1]+1) for chunk in chunks]
+            def compute_chunk(chunk):
+                #  saturation humidity only for the columns that are computed
+                Tchunk = T[chunk]
+                return self._convect(Tchunk, Q[chunk], qsat(Tchunk, P), U[chunk],
+                                     V[chunk], CBMF[chunk], P, PH, DELT)
+            if num_chunks == 1:
+                results = [compute_chunk(chunks[0])]
+            else:
+                #  results come back in the order of the chunks
+                results = list(self._get_executor().map(compute_chunk, chunks))
+            for chunk, result in zip(chunks, results):
+                for out, value in zip((IFLAG, FT, FQ, FU, FV, PRECIP, CBMFnew), result):
+                    out[chunk] = value
+        tendencies = {'Tatm': self._tendency('Tatm', FT),
+                      'q': self._tendency('q', FQ)}
+        if 'Ts' in self.state:
+            # for some strange reason self.Ts is breaking tests under Python 3.5 in some configurations
+            tendencies['Ts'] = 0. * self.state['Ts']
+        if 'U' in self.state:
+            tendencies['U'] = self._tendency('U', FU)
+        if 'V' in self.state:
+            tendencies['V'] = self._tendency('V', FV)
+        self.CBMF = CBMFnew.copy()
+        self.PRECIP = PRECIP.copy()
+        self.IFLAG = IFLAG.copy()
+        return tendencies
+
+    def _get_executor(self):
+        #  One thread pool for the lifetime of the process,
+        #  created again if the number of threads has changed
+        num_threads = int(self.num_threads)
+        if self._executor is None or self._executor_threads != num_threads:
+            from concurrent.futures import ThreadPoolExecutor
+            self._shutdown_executor()
+            self._executor = ThreadPoolExecutor(max_workers=num_threads)
+            self._executor_threads = num_threads
+        return self._executor
+
+    def _shutdown_executor(self):
+        executor = getattr(self, '_executor', None)
+        if executor is not None:
+            executor.shutdown()
+        self._executor = None
+
+    def __getstate__(self):
+        #  The thread pool cannot be copied or pickled
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        return state
+
+    def _convect(self, T, Q, QS, U, V, CBMF, P, PH, DELT):
+        #  Call the Fortran code for a set of columns
+        NCOL, ND = T.shape
+        NL = ND-1
         NTRA = 1
         TRA = np.zeros((NCOL,ND,NTRA), order='F')  # tracers ignored
-        DELT = float(self.timestep)
-        CBMF = self.CBMF
         (IFLAG, FT, FQ, FU, FV, FTRA, PRECIP, WD, TPRIME, QPRIME, CBMFnew,
         Tout, Qout, QSout, Uout, Vout, TRAout) = \
             convect(T, Q, QS, U, V, TRA, P, PH, NCOL, ND, NL, NTRA, DELT, self.IPBL, CBMF,
@@ -225,16 +318,89 @@ class EmanuelConvection(TimeDependentProcess):
         if self.IPBL != 0:
             FT += (Tout - T) / DELT
             FQ += (Qout - Q) / DELT
-        tendencies = {'Tatm': _convect_to_climlab(FT)*np.ones_like(self.state['Tatm']),
-                      'q': _convect_to_climlab(FQ)*np.ones_like(self.state['q'])}
-        if 'Ts' in self.state:
-            # for some strange reason self.Ts is breaking tests under Python 3.5 in some configurations
-            tendencies['Ts'] = 0. * self.state['Ts']
-        if 'U' in self.state:
-            tendencies['U'] = _convect_to_climlab(FU) * np.ones_like(self.state['U'])
-        if 'V' in self.state:
-            tendencies['V'] = _convect_to_climlab(FV) * np.ones_like(self.state['V'])
-        self.CBMF = CBMFnew
-        self.PRECIP = PRECIP
-        self.IFLAG = IFLAG
-        return tendencies
+        return IFLAG, FT, FQ, FU, FV, PRECIP, CBMFnew
+
+    def _tendency(self, name, F):
+        #  Field with same shape and domain as the state variable
+        tendency = np.zeros_like(self.state[name])
+        tendency[...] = _convect_to_climlab(F, tendency.shape)
+        return tendency
+
+
+def _saturation_mixing_ratio(T, P):
+    #  Saturation specific humidity with the formulas used by TLIFT in CONVECT
+    TC = T - 273.15
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        ES = np.where(TC >= 0., 6.112 * np.exp(17.67 * TC / (243.5 + TC)),
+                      np.exp(23.33086 - 6111.72784 / T + 0.15215 * np.log(T)))
+    EPS = RD / RV
+    return EPS * ES / (P - ES * (1. - EPS))
+
+
+def _possibly_convecting(T, Q, P, PH, CBMF, MINORIG=0, DTMAX=0.9):
+    '''Conservative test for columns in which moist convection can occur.
+
+    CONVECT only does moist convection if there was convection at the last
+    time step (nonzero cloud base mass flux) or if the parcel lifted from
+    the origin level is buoyant at cloud base (virtual temperature warmer than
+    the environment minus ``DTMAX``), and cloud base is below the top three
+    levels. The origin level must be at or above ``MINORIG``, warmer than 250 K
+    and moist. A column is reported as stable only if no parcel lifted from
+    any such level can be buoyant at any level above it below the top three
+    levels, which is a much weaker condition.
+
+    The test compares the moist static energy of the parcels (as computed by
+    TLIFT, conserved during ascent) with the saturated moist static energy
+    of the environment at the coldest temperature a buoyant parcel can have.
+    Moist static energy of a saturated parcel increases with temperature,
+    so a parcel with less energy than that cannot be buoyant. The energy of
+    the saturated environment is underestimated (neglecting the heat content
+    of the parcel water) and the virtual temperature effect of the parcel
+    water vapor is overestimated (taking its saturation humidity at the
+    environment virtual temperature), so the test errs on the side of
+    calling the Fortran code.
+
+    This is a bound on the CONVECT physics, not a copy of it: it only has to
+    stay on the safe side of the buoyancy test in CONVECT and TLIFT, and
+    ``test_possibly_convecting`` checks that against the Fortran code.
+    If the thermodynamics in convect.f are changed, that test must still pass.
+
+    Input arrays are in the order expected by CONVECT: T, Q with dimensions
+    (NCOL, ND), P and PH with ND and ND+1 elements, from the bottom up,
+    and CBMF with dimension (NCOL,).
+
+    Returns a boolean array with dimension (NCOL,), False for the columns
+    where CONVECT returns zero tendencies and precipitation.
+    '''
+    P = np.ravel(P)
+    PH = np.ravel(PH)
+    ND = T.shape[1]
+    EPS = RD / RV
+    EPSI = 1. / EPS
+    CPVMCL = CL - CPV
+    TV = T * (1. + Q * EPSI - Q)
+    LV = LV0 - CPVMCL * (T - 273.15)
+    #  Geopotential as in CONVECT
+    GZ = np.zeros_like(T)
+    np.cumsum(0.5 * RD * (TV[:, 1:] + TV[:, :-1]) * (P[:-1] - P[1:]) / PH[1:ND],
+              axis=1, out=GZ[:, 1:])
+    #  Energy of a parcel lifted from each level (AH0 in TLIFT)
+    AH0 = (CPD * (1. - Q) + CL * Q) * T + Q * LV + GZ
+    #  CONVECT returns if the origin level is colder than 250 K or dry
+    AH0[(T < 250.) | (Q <= 0.)] = -np.inf
+    AH0[:, :max(MINORIG - 1, 0)] = -np.inf
+    #  Largest parcel energy from all origin levels at or below each level
+    AHmax = np.maximum.accumulate(AH0, axis=1)
+    #  Coldest temperature of a parcel that is buoyant
+    #  (parcel virtual temperature larger than TV - DTMAX)
+    QGmax = _saturation_mixing_ratio(TV, P)
+    QGmax = np.where(QGmax > 0., QGmax, np.inf)
+    RGmax = QGmax / (1. - np.max(Q, axis=1, keepdims=True))
+    Tmin = (TV - DTMAX) / (1. + RGmax * EPSI)
+    #  Energy of a saturated parcel at that temperature (AHG in TLIFT)
+    QG = _saturation_mixing_ratio(Tmin, P)
+    QG = np.where(QG > 0., QG, 0.)
+    AHmin = CPD * Tmin + LV * QG + GZ
+    #  CONVECT returns if cloud base is in the top three levels
+    buoyant = AHmax[:, :ND-4] > AHmin[:, 1:ND-3]
+    return (CBMF != 0.) | np.any(buoyant, axis=1)
@@ -1,6 +1,7 @@
 from __future__ import division
 from builtins import str
 from builtins import object
+import numpy as np
 from climlab.domain.axis import Axis
 from climlab.utils import heat_capacity
 
@@ -60,6 +61,8 @@ class _Domain(object):
                                 tuple given by ``self.ax_index``.
     :ivar array heat_capacity:  the domain's heat capacity over axis specified
                                 in function call of :func:`set_heat_capacity`
+    :ivar array area_weights:   relative area of the grid cells (see
+                                :attr:`area_weights`)
 
     """
     def __str__(self):
@@ -126,6 +129,49 @@ class _Domain(object):
         self.heat_capacity = None
         #  implemented by daughter classes
 
+    @property
+    def area_weights(self):
+        """Relative area of the grid cells, used for area-weighted
+        averages such as :func:`~climlab.domain.field.global_mean`.
+
+        The weights are proportional to :math:`\\cos(\\varphi)` for
+        domains with a latitude axis only, and to the cell area
+        :math:`\\Delta\\lambda \\cos(\\varphi) \\Delta\\varphi`
+        for latitude-longitude domains.
+        They are computed on first access and cached on the domain object.
+
+        :raises: :exc:`ValueError` if the domain has no latitude axis
+        :returns:   array with the number of dimensions of the domain,
+                    with singleton dimensions except along
+                    the ``'lat'`` and ``'lon'`` axes
+        :rtype:     array
+
+        """
+        try:
+            return self._area_weights
+        except AttributeError:
+            self._area_weights = self._compute_area_weights()
+            return self._area_weights
+
+    def _compute_area_weights(self):
+        try:
+            lat = self.axes['lat']
+        except KeyError:
+            raise ValueError('No latitude axis in domain.')
+        coslat = np.cos(np.deg2rad(lat.points))
+        shape = [1] * len(self.shape)
+        shape[self.axis_index['lat']] = lat.num_points
+        if 'lon' in self.axes:
+            #  grid cell area in radians^2
+            lon = self.axes['lon']
+            dy = np.deg2rad(np.diff(lat.bounds))
+            dx = np.deg2rad(np.diff(lon.bounds)) * coslat[:, np.newaxis]
+            weights = dx * dy[:, np.newaxis]
+            shape[self.axis_index['lon']] = lon.num_points
+        else:
+            weights = coslat
+        return weights.reshape(shape)
+
     def _make_axes_dict(self, axes):
         """Makes an axes dictionary.
 
@@ -177,6 +223,9 @@ class _Domain(object):
                     dout.shape = self.heat_capacity[indx].shape
                 except:
                     dout.shape = self.shape
+            elif key == '_area_weights':
+                #  cached weights are not sliced, recompute when needed
+                pass
             else:
                 setattr(dout, key, value)
         return dout
@@ -191,14 +191,29 @@ class Field(np.ndarray):
         return Field_to_xarray(self)
 
 
-def global_mean(field):
-    """Calculates the latitude weighted global mean of a field
+def global_mean(field, axis=None):
+    """Calculates the area weighted global mean of a field
     with latitude dependence.
 
+    The area weights are taken from
+    :attr:`~climlab.domain.domain._Domain.area_weights` of the field's domain,
+    which are computed only once per domain.
+
+    With ``axis=None`` the field is averaged over all its points.
+    Otherwise only the given axes are averaged. The domain axes are aligned
+    with the trailing dimensions of the field, so many fields or ensemble
+    members can be stacked along extra leading dimensions and averaged
+    in one call.
+
     :param Field field: input field
-    :raises: :exc:`ValueError` if input field has no latitude axis
-    :return: latitude weighted global mean of the field
-    :rtype: float
+    :param axis:        axis or axes to average over (default: ``None``,
+                        average over all points)
+    :type axis:         int, tuple of ints or ``None``
+    :raises: :exc:`ValueError` if input field has no latitude axis,
+                                or ``axis`` is given and the shape of the
+                                field does not match its domain
+    :return: area weighted global mean of the field
+    :rtype: array
 
     :Example:
 
@@ -207,37 +222,34 @@ def global_mean(field):
             >>> import climlab
             >>> model = climlab.EBM()
             >>> climlab.global_mean(model.Ts)
-            Field(11.997968598413685)
+            array(11.9979686)
+
+        global mean of an ensemble of temperature fields::
+
+            >>> import numpy as np
+            >>> ensemble = model.Ts + np.arange(3.)[:, None, None]
+            >>> climlab.global_mean(ensemble, axis=(1, 2))
+            array([11.9979686, 12.9979686, 13.9979686])
 
     """
     try:
-        lat = field.domain.lat.points
-    except:
+        weights = field.domain.area_weights
+    except (AttributeError, ValueError):
         raise ValueError('No latitude axis in input field.')
     try:
-        #  Field is 2D latitude / longitude
-        lon = field.domain.lon.points
-        return _global_mean_latlon(field.squeeze())
-    except:
-        #  Field is 1D latitude only (zonal average)
-        lat_radians = np.deg2rad(lat)
-        return _global_mean(field.squeeze(), lat_radians)
-
-
-def _global_mean(array, lat_radians):
+        weights = np.broadcast_to(weights, np.shape(field))
+    except ValueError:
+        #  A slice of a field keeps the domain of the whole field
+        if axis is not None:
+            raise ValueError('Field shape {} does not match domain shape {}.'.format(
+                             np.shape(field), field.domain.shape))
+        #  Latitude weights for a field that depends on latitude only
+        field = np.squeeze(field)
+        weights = np.cos(np.deg2rad(field.domain.lat.points))
     #  Use np.array() here to strip the Field data and return a plain array
     #  (This will be more graceful once we are using xarray.DataArray
     #  for all internal grid info instead of the Field object)
-    return np.array(np.average(array, weights=np.cos(lat_radians)))
-
-
-def _global_mean_latlon(field):
-    dom = field.domain
-    lon, lat = np.meshgrid(dom.lon.points, dom.lat.points)
-    dy = np.deg2rad(np.diff(dom.lat.bounds))
-    dx = np.deg2rad(np.diff(dom.lon.bounds))*np.cos(np.deg2rad(lat))
-    area = dx * dy[:,np.newaxis]  # grid cell area in radians^2
-    return np.array(np.average(field, weights=area))
+    return np.array(np.average(field, axis=axis, weights=weights))
 
 
 def to_latlon(array, domain, axis = 'lon'):
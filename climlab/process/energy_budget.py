@@ -131,9 +131,6 @@ class ExternalEnergySource(EnergyBudget):
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                ext_energy: <class 'climlab.process.energy_budget.ExternalEnergySource'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
     """
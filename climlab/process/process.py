@@ -262,9 +262,6 @@ class Process(object):
                    diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                    LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                    albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                      iceline: <class 'climlab.surface.albedo.Iceline'>
-                      cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                      warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                    insolation: <class 'climlab.radiation.insolation.DailyInsolation'>
 
         """
@@ -302,9 +299,6 @@ class Process(object):
                    diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                    LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                    albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                      iceline: <class 'climlab.surface.albedo.Iceline'>
-                      cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                      warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                    insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
                 >>> model.remove_subprocess('albedo')
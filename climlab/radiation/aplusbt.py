@@ -226,9 +226,6 @@ class AplusBT_CO2(EnergyBudget):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
         ::
@@ -252,9 +249,6 @@ class AplusBT_CO2(EnergyBudget):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT_CO2'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
     """
@@ -86,9 +86,6 @@ class Boltzmann(EnergyBudget):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
         ::
@@ -112,9 +109,6 @@ class Boltzmann(EnergyBudget):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.Boltzmann.Boltzmann'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
     """
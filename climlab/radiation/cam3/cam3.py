@@ -77,14 +77,10 @@ class CAM3(_Radiation_SW, _Radiation_LW):
         super(CAM3, self).__init__(**kwargs)
 
         self.KM = self.lev.size
-        try:
-            self.JM = self.lat.size
-        except:
-            self.JM = 1
-        try:
-            self.IM = self.lon.size
-        except:
-            self.IM = 1
+        #  All horizontal dimensions are flattened into a single column
+        #  dimension, passed to the CAM3 driver as (KM, JM, IM) with IM=1
+        self.JM = self.Tatm.size // self.KM
+        self.IM = 1
         self.do_sw = 1  # '1=do, 0=do not compute SW'
         self.do_lw = 1  # '1=do, 0=do not compute LW'
         self.in_cld = 0 # '1=in-cloud, 0=grid avg cloud water path'
@@ -99,32 +95,60 @@ class CAM3(_Radiation_SW, _Radiation_LW):
             - (JM, KM)
             - (JM, IM, KM)
 
-        (longitude dimension IM not yet implemented here).'''
+        All horizontal dimensions are flattened into JM.
+        The result is a (Fortran-contiguous) view of the input where possible.'''
         if np.isscalar(field):
             return field
-        #  Check to see if column vector needs to be replicated over latitude
-        elif self.JM > 1:
-            if (field.shape == (self.KM,)):
-                return np.tile(field[...,np.newaxis], self.JM)
-            else:
-                return np.squeeze(np.transpose(field))[..., np.newaxis]
-        else:  #  1D vertical model
-            return field[..., np.newaxis, np.newaxis]
-
-    def _cam3_to_climlab(self, field):
+        field = np.asarray(field)
+        if field.shape[-1] == self.KM and field.size == self.KM * self.JM:
+            #  (..., KM)  -->  (KM, JM, 1)
+            return np.reshape(field, (self.JM, self.KM)).T[..., np.newaxis]
+        elif field.shape == (self.KM,):
+            #  column vector replicated over all columns
+            return np.broadcast_to(field[:, np.newaxis, np.newaxis],
+                                   (self.KM, self.JM, self.IM))
+        else:
+            #  surface field (..., 1)  -->  (JM, 1)
+            return np.reshape(field, (self.JM, self.IM))
+
+    def _cam3_to_climlab(self, field, out=None):
         ''' Output is either (KM, JM, 1) or (JM, 1).
-        Transform this to...
-            - (KM,) or (1,)  if JM==1
-            - (KM, JM) or (JM, 1)   if JM>1
-
-        (longitude dimension IM not yet implemented).'''
-        if self.JM > 1:
-            if len(field.shape)==2:
-                return field
-            elif len(field.shape)==3:
-                return np.squeeze(np.transpose(field))
+        Transform this back to the horizontal dimensions of the climlab grid:
+            - (..., KM) for 3D output (also used for KM+1 interface fields)
+            - the shape of Ts for 2D output
+
+        If ``out`` is given, the result is written into it in place.'''
+        if len(field.shape)==3:
+            result = np.reshape(field[..., 0].T, self.Ts.shape[:-1] + field.shape[:1])
+        else:
+            result = np.reshape(field, self.Ts.shape)
+        if out is None:
+            return result
         else:
-            return np.squeeze(field)
+            out[...] = result
+            return out
+
+    def _cam3_buffer(self, name, value, surface=False):
+        '''Write ``value`` into a persistent Fortran-ordered array
+        with the dimensions expected by the CAM3 driver,
+        (KM, JM, IM) or (JM, IM) if ``surface`` is True.
+        Scalar values are broadcast.'''
+        if surface:
+            shape = (self.JM, self.IM)
+            like = self.Ts
+        else:
+            shape = (self.KM, self.JM, self.IM)
+            like = self.Tatm
+        buffers = self.__dict__.setdefault('_cam3_buffers', {})
+        buf = buffers.get(name)
+        if buf is None or buf.shape != shape:
+            buf = np.zeros(shape, order='F')
+            buffers[name] = buf
+        if np.ndim(value) == 0:
+            buf[...] = value
+        else:
+            buf[...] = self._climlab_to_cam3(np.broadcast_to(value, like.shape))
+        return buf
 
     def _prepare_arguments(self):
         # scalar integer arguments
@@ -148,35 +172,31 @@ class CAM3(_Radiation_SW, _Radiation_LW):
         CFC11vmr = self.absorber_vmr['CFC11']
         CFC12vmr = self.absorber_vmr['CFC12']
         # array input
-        Tatm = self._climlab_to_cam3(self.Tatm)
-        Ts = self._climlab_to_cam3(self.Ts)
-        #insolation = self._climlab_to_cam3(self.insolation * np.ones_like(self.Ts))
-        coszen = self._climlab_to_cam3(self.coszen * np.ones_like(self.Ts))
-        aldif = self._climlab_to_cam3(self.aldif * np.ones_like(self.Ts))
-        aldir = self._climlab_to_cam3(self.aldir * np.ones_like(self.Ts))
-        asdif = self._climlab_to_cam3(self.asdif * np.ones_like(self.Ts))
-        asdir = self._climlab_to_cam3(self.asdir * np.ones_like(self.Ts))
+        Tatm = self._cam3_buffer('Tatm', self.Tatm)
+        Ts = self._cam3_buffer('Ts', self.Ts, surface=True)
+        coszen = self._cam3_buffer('coszen', self.coszen, surface=True)
+        aldif = self._cam3_buffer('aldif', self.aldif, surface=True)
+        aldir = self._cam3_buffer('aldir', self.aldir, surface=True)
+        asdif = self._cam3_buffer('asdif', self.asdif, surface=True)
+        asdir = self._cam3_buffer('asdir', self.asdir, surface=True)
         #  surface pressure should correspond to model domain!
-        ps = self._climlab_to_cam3(self.lev_bounds[-1] * np.ones_like(self.Ts))
-        p = self._climlab_to_cam3(self.lev * np.ones_like(self.Tatm))
+        ps = self._cam3_buffer('ps', self.lev_bounds[-1], surface=True)
+        p = self._cam3_buffer('p', self.lev)
         #   why are we passing missing instead of the actual layer thicknesses?
-        dp = np.zeros_like(p) - 99. # set as missing
-        #dp = np.diff(self.lev_bounds)
-        #dp = self._climlab_to_cam3(dp * np.ones_like(self.Tatm))
+        dp = self._cam3_buffer('dp', -99.) # set as missing
         # Surface upwelling LW
-        flus = self._climlab_to_cam3(np.zeros_like(self.Ts) - 99.) # set to missing as default
+        flus = self._cam3_buffer('flus', -99., surface=True) # set to missing as default
         # spatially varying gases
-        q = self._climlab_to_cam3(self.specific_humidity * np.ones_like(self.Tatm))
-        O3vmr = self._climlab_to_cam3(self.absorber_vmr['O3'] * np.ones_like(self.Tatm))
+        q = self._cam3_buffer('q', self.specific_humidity)
         # convert to mass mixing ratio (needed by CAM3 driver)
         #  The conversion factor is m_o3 / m_air = 48.0 g/mol / 28.97 g/mol
-        O3mmr = vmr_to_mmr(O3vmr, gas='O3')
+        O3mmr = self._cam3_buffer('O3mmr', vmr_to_mmr(self.absorber_vmr['O3'], gas='O3'))
         # cloud fields
-        cldfrac = self._climlab_to_cam3(self.cldfrac * np.ones_like(self.Tatm))
-        clwp = self._climlab_to_cam3(self.clwp * np.ones_like(self.Tatm))
-        ciwp = self._climlab_to_cam3(self.ciwp * np.ones_like(self.Tatm))
-        r_liq = self._climlab_to_cam3(self.r_liq * np.ones_like(self.Tatm))
-        r_ice = self._climlab_to_cam3(self.r_ice * np.ones_like(self.Tatm))
+        cldfrac = self._cam3_buffer('cldfrac', self.cldfrac)
+        clwp = self._cam3_buffer('clwp', self.clwp)
+        ciwp = self._cam3_buffer('ciwp', self.ciwp)
+        r_liq = self._cam3_buffer('r_liq', self.r_liq)
+        r_ice = self._cam3_buffer('r_ice', self.r_ice)
         #  The ordered list of input fields needed by the CAM3 driver
         args = [KM, JM, IM, do_sw, do_lw, p, dp, ps, Tatm, Ts,
                 q, O3mmr, cldfrac, clwp, ciwp, in_cld,
@@ -196,16 +216,16 @@ class CAM3(_Radiation_SW, _Radiation_LW):
         # most of these output fields are unnecessary here
         #  we compute everything from the up and downwelling fluxes
         #  Should probably simplify the fortran wrapper
+        #  fluxes at layer interfaces, written in place
+        self._cam3_to_climlab(lwuflx, out=self.LW_flux_up)
+        self._cam3_to_climlab(lwdflx, out=self.LW_flux_down)
+        self._cam3_to_climlab(lwuflxc, out=self.LW_flux_up_clr)
+        self._cam3_to_climlab(lwdflxc, out=self.LW_flux_down_clr)
         #  fluxes at layer interfaces
-        self.LW_flux_up = self._cam3_to_climlab(lwuflx) + 0.*self.LW_flux_up
-        self.LW_flux_down = self._cam3_to_climlab(lwdflx) + 0.*self.LW_flux_down
-        self.LW_flux_up_clr = self._cam3_to_climlab(lwuflxc) + 0.*self.LW_flux_up_clr
-        self.LW_flux_down_clr = self._cam3_to_climlab(lwdflxc) + 0.*self.LW_flux_down_clr
-        #  fluxes at layer interfaces
-        self.SW_flux_up = self._cam3_to_climlab(swuflx) + 0.*self.SW_flux_up
-        self.SW_flux_down = self._cam3_to_climlab(swdflx) + 0.*self.SW_flux_down
-        self.SW_flux_up_clr = self._cam3_to_climlab(swuflxc) + 0.*self.SW_flux_up_clr
-        self.SW_flux_down_clr = self._cam3_to_climlab(swdflxc) + 0.*self.SW_flux_down_clr
+        self._cam3_to_climlab(swuflx, out=self.SW_flux_up)
+        self._cam3_to_climlab(swdflx, out=self.SW_flux_down)
+        self._cam3_to_climlab(swuflxc, out=self.SW_flux_up_clr)
+        self._cam3_to_climlab(swdflxc, out=self.SW_flux_down_clr)
         #  Compute quantities derived from fluxes
         self._compute_SW_flux_diagnostics()
         self._compute_LW_flux_diagnostics()
@@ -1,11 +1,14 @@
 from __future__ import division
+from collections import OrderedDict
 import numpy as np
 from climlab.process.diagnostic import DiagnosticProcess
 from climlab.domain.field import Field
 from climlab.domain.field import to_latlon
 from climlab.utils.legendre import P2
 from climlab import constants as const
-from climlab.solar.insolation import daily_insolation
+from climlab.solar.insolation import (daily_insolation, annual_mean_insolation,
+                                      _declination_distance)
+from climlab.solar.insolation_table import InsolationTable
 
 # REVISE TO MAKE ALL OF THESE CALLABLE WITH NO ARGUMENTS.
 # SET SOME SENSIBLE DEFAULTS FOR DOMAINS
@@ -20,6 +23,44 @@ from climlab.solar.insolation import daily_insolation
 #  should be easy to pass a state variable object or something with the right shape
 #  and have the process gracefully set the correct dimensions
 
+#  Insolation arrays (and tables) are shared by all processes with the same
+#  latitude points, days of year, orbital parameters and solar constant,
+#  e.g. the members of a large EBM ensemble.
+#  At most insolation_cache_size of them are kept, least recently used first out.
+insolation_cache_size = 32
+_insolation_cache = OrderedDict()
+
+
+def _cache_key(*args):
+    """Hashable key for numbers, arrays and dictionaries of them."""
+    key = []
+    for arg in args:
+        if isinstance(arg, dict):
+            key.append(_cache_key(*[(name, arg[name]) for name in sorted(arg)]))
+        elif isinstance(arg, tuple):
+            key.append(_cache_key(*arg))
+        elif isinstance(arg, str):
+            key.append(arg)
+        else:
+            value = np.asarray(arg, dtype=float)
+            key.append((value.shape, value.tobytes()))
+    return tuple(key)
+
+
+def _cached_insolation(key, compute):
+    """Return the cached result for ``key``, calling ``compute()`` if needed.
+    Cached arrays are made read-only since they are shared."""
+    try:
+        value = _insolation_cache.pop(key)
+    except KeyError:
+        value = compute()
+        if isinstance(value, np.ndarray):
+            value.setflags(write=False)
+    _insolation_cache[key] = value
+    while len(_insolation_cache) > max(insolation_cache_size, 0):
+        _insolation_cache.popitem(last=False)
+    return value
+
 
 class _Insolation(DiagnosticProcess):
     """A private parent class for insolation processes.
@@ -254,17 +295,17 @@ class P2Insolation(_Insolation):
 class AnnualMeanInsolation(_Insolation):
     """A class for latitudewise solar insolation averaged over a year.
 
-    This class computes the solar insolation for each day of the year and
+    This class computes the annual mean solar insolation for each
     latitude specified in the domain on the basis of orbital parameters and
     astronomical formulas.
 
-    Therefore it uses the method :func:`~climlab.solar.insolation.daily_insolation`.
+    Therefore it uses the method :func:`~climlab.solar.insolation.annual_mean_insolation`,
+    which integrates over the orbit by quadrature in solar longitude
+    rather than averaging the insolation of each day of the year.
     For details how the solar distribution is dependend on orbital parameters
-    see there.
+    see :func:`~climlab.solar.insolation.daily_insolation`.
 
-    The mean over the year is calculated from data given by
-    :func:`~climlab.solar.insolation.daily_insolation` and stored in the
-    object's attribute ``self.insolation``
+    The mean over the year is stored in the object's attribute ``self.insolation``
 
     **Initialization parameters** \n
 
@@ -317,7 +358,7 @@ class AnnualMeanInsolation(_Insolation):
             >>> print model
 
         .. code-block:: none
-            :emphasize-lines: 12
+            :emphasize-lines: 9
 
             climlab Process of type <class 'climlab.model.ebm.EBM'>.
             State variables and domain shapes:
@@ -327,9 +368,6 @@ class AnnualMeanInsolation(_Insolation):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
         ::
@@ -346,7 +384,7 @@ class AnnualMeanInsolation(_Insolation):
             >>> print model
 
         .. code-block:: none
-            :emphasize-lines: 12
+            :emphasize-lines: 9
 
             climlab Process of type <class 'climlab.model.ebm.EBM'>.
             State variables and domain shapes:
@@ -356,9 +394,6 @@ class AnnualMeanInsolation(_Insolation):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.AnnualMeanInsolation'>
 
     """
@@ -393,17 +428,18 @@ class AnnualMeanInsolation(_Insolation):
         self.param['orb'] = value
         self._compute_fixed()
 
-    def _daily_insolation_array(self):
+    def _annual_mean_insolation(self):
         lat = self.lat
-        days_of_year = self.time['days_of_year']
         orb = self.orb
         S0 = self.S0
-        return daily_insolation(lat, days_of_year, orb=orb, S0=S0)
+        #  shared, read-only array
+        key = _cache_key('annual', lat, orb, S0)
+        return _cached_insolation(key,
+                    lambda: np.reshape(annual_mean_insolation(lat, orb=orb, S0=S0), np.shape(lat)))
 
     def _compute_fixed(self):
         try:
-            temp_array = self._daily_insolation_array()
-            insolation = np.mean(temp_array, axis=1)
+            insolation = self._annual_mean_insolation()
             # make sure that the diagnostic has the correct field dimensions.
             dom = self.domains['default']
             try:
@@ -452,6 +488,14 @@ class DailyInsolation(AnnualMeanInsolation):
                             * unit: degrees
                             * default value: ``23.446``
 
+    :param bool tabulated:  if ``True``, insolation is interpolated from an
+                            :class:`~climlab.solar.insolation_table.InsolationTable`
+                            built once for the latitudes and days of the domain,
+                            so that changes to ``orb`` are much cheaper, e.g. in
+                            :class:`~climlab.solar.orbital_cycles.OrbitalCycles`.
+                            Values differ from the exact formula by about 0.003 W/m2.
+                            (default: ``False``)
+
     **Object attributes** \n
 
     Additional to the parent class :class:`~climlab.radiation.insolation._Insolation`
@@ -480,7 +524,7 @@ class DailyInsolation(AnnualMeanInsolation):
             >>> print model
 
         .. code-block:: none
-            :emphasize-lines: 12
+            :emphasize-lines: 9
 
             climlab Process of type <class 'climlab.model.ebm.EBM'>.
             State variables and domain shapes:
@@ -490,9 +534,6 @@ class DailyInsolation(AnnualMeanInsolation):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
         ::
@@ -506,7 +547,7 @@ class DailyInsolation(AnnualMeanInsolation):
             >>> print model
 
         .. code-block:: none
-            :emphasize-lines: 12
+            :emphasize-lines: 9
 
             climlab Process of type <class 'climlab.model.ebm.EBM'>.
             State variables and domain shapes:
@@ -516,12 +557,29 @@ class DailyInsolation(AnnualMeanInsolation):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.DailyInsolation'>
 
     """
+    def __init__(self, S0=const.S0, orb=const.orb_present, tabulated=False, **kwargs):
+        #  needed by _compute_fixed(), which is called during initialization
+        self.tabulated = tabulated
+        super(DailyInsolation, self).__init__(S0=S0, orb=orb, **kwargs)
+        self.param['tabulated'] = tabulated
+
+    def _daily_insolation_array(self):
+        lat = self.lat
+        days_of_year = self.time['days_of_year']
+        orb = self.orb
+        S0 = self.S0
+        #  shared, read-only array
+        if self.tabulated:
+            table = _cached_insolation(_cache_key('table', lat, days_of_year),
+                        lambda: InsolationTable(lat, days_of_year))
+            compute = lambda: table(orb, S0=S0)
+        else:
+            compute = lambda: daily_insolation(lat, days_of_year, orb=orb, S0=S0)
+        key = _cache_key('insolation', lat, days_of_year, orb, S0, self.tabulated)
+        return _cached_insolation(key, compute)
 
     def _compute_fixed(self):
         try:
@@ -538,3 +596,117 @@ class DailyInsolation(AnnualMeanInsolation):
         insolation = insolation_array[..., time_index]
         self.insolation[:] = Field(insolation, domain=dom)
         self.coszen[:] = self._coszen_from_insolation()
+
+
+class DiurnalInsolation(AnnualMeanInsolation):
+    """A class to compute instantaneous solar insolation including the
+    diurnal cycle, for any domain with latitude and longitude axes.
+
+    At every timestep the cosine of the solar zenith angle is
+
+    .. math::
+
+        \\cos \\theta_z = \\sin \\varphi \\sin \\delta + \\cos \\varphi \\cos \\delta \\cos h
+
+    (zero when the sun is below the horizon), where :math:`\\delta` is the solar
+    declination and :math:`h` the local hour angle, which depends on longitude
+    and the time of day (local noon at longitude 0 is at the middle of each day).
+    Insolation is :math:`S_0` times :math:`\\cos \\theta_z` times the Earth-Sun
+    distance factor.
+
+    Declination and distance factor are computed from the orbital parameters once
+    per calendar day and cached together with the latitude-dependent terms,
+    so each timestep only needs the hour angle for each longitude.
+
+    Time is taken from ``self.time['days_elapsed']``, so the process should be
+    stepped forward with the same timestep as the model it belongs to.
+    The timestep must be shorter than a day to resolve the diurnal cycle.
+
+    **Initialization parameters** \n
+
+    :param float S0:    solar constant                              \n
+                        - unit: :math:`\\frac{\\textrm{W}}{\\textrm{m}^2}`   \n
+                        - default value: ``1365.2``
+
+    :param dict orb:    a dictionary with orbital parameters
+                        (see :class:`AnnualMeanInsolation`)
+
+    :param float lat:   latitude (degrees) used if the domain has no
+                        latitude axis, e.g. for a single column (default: 0.)
+
+    :param float lon:   longitude (degrees) used if the domain has no
+                        longitude axis (default: 0.)
+
+    **Object attributes** \n
+
+    Additional to the parent class :class:`~climlab.radiation.insolation._Insolation`
+    following object attributes are generated and updated during initialization:
+
+    :ivar insolation:       Current insolation in W/m2
+    :vartype insolation:    Field
+
+    :ivar coszen:           Cosine of the current solar zenith angle
+    :vartype coszen:        Field
+
+    :ivar dict orb:         initialized with given argument ``orb``
+
+    :Example:
+
+        Single column with a diurnal cycle at 45N::
+
+            >>> import climlab
+            >>> from climlab.radiation import DiurnalInsolation
+
+            >>> state = climlab.column_state(num_lev=30)
+            >>> sun = DiurnalInsolation(lat=45., domains=state['Ts'].domain,
+            ...                         timestep=3600.)
+            >>> sun.step_forward()
+            >>> print(sun.coszen)
+
+    """
+    def __init__(self, S0=const.S0, orb=const.orb_present, lat=0., lon=0., **kwargs):
+        self._point_lat = lat
+        self._point_lon = lon
+        super(DiurnalInsolation, self).__init__(S0=S0, orb=orb, **kwargs)
+
+    def _domain_coordinate(self, axis, default):
+        """Coordinate points in radians shaped to broadcast against ``self.insolation``."""
+        domain = self.insolation.domain
+        if axis not in domain.axis_index:
+            return np.deg2rad(default)
+        shape = [1] * len(domain.shape)
+        shape[domain.axis_index[axis]] = domain.axes[axis].num_points
+        return np.deg2rad(np.reshape(domain.axes[axis].points, shape))
+
+    def _compute_fixed(self):
+        #  orbit or solar constant changed: forget the cached calendar day
+        self._diurnal_day = None
+        try:
+            self._get_current_insolation()
+        except AttributeError:
+            pass
+
+    def _diurnal_terms(self, day):
+        """Terms of the zenith angle that are fixed for a calendar day."""
+        if self.__dict__.get('_diurnal_day') != day:
+            phi = self._domain_coordinate('lat', self._point_lat)
+            delta, distance = _declination_distance(np.array([day]),
+                    np.ravel(self.orb['ecc']), np.ravel(self.orb['long_peri']),
+                    np.ravel(self.orb['obliquity']))
+            delta = delta.item()
+            self._sinterm = np.sin(phi) * np.sin(delta)
+            self._costerm = np.cos(phi) * np.cos(delta)
+            self._flux = self.S0 * distance.item()
+            self._diurnal_day = day
+        return self._sinterm, self._costerm, self._flux
+
+    def _get_current_insolation(self):
+        days = self.time['days_elapsed'] % const.days_per_year
+        day = np.floor(days)
+        sinterm, costerm, flux = self._diurnal_terms(day)
+        #  hour angle, zero at local noon
+        lon = self._domain_coordinate('lon', self._point_lon)
+        hour_angle = 2. * np.pi * (days - day) + lon - np.pi
+        coszen = np.maximum(sinterm + costerm * np.cos(hour_angle), 0.)
+        self.coszen[:] = coszen
+        self.insolation[:] = flux * coszen
@@ -152,6 +152,10 @@ def default_absorbers(Tatm,
             lat = Tatm.domain.axes['lat'].points
             f2d = interp2d(ozone_lat, ozone_lev, ozone_zon)
             absorber_vmr['O3'] = f2d(lat, lev).transpose()
+            #  zonally uniform ozone on lat-lon grids
+            if 'lon' in Tatm.domain.axes:
+                absorber_vmr['O3'] = np.expand_dims(absorber_vmr['O3'],
+                                        axis=Tatm.domain.axis_index['lon'])
         except:
             print('Interpolation of ozone data failed.')
             print('Reverting to default O3.')
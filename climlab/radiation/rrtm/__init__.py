@@ -35,3 +35,4 @@ from .rrtmg import RRTMG
 from .rrtmg_lw import RRTMG_LW
 from .rrtmg_sw import RRTMG_SW
 from .utils import _climlab_to_rrtm, _rrtm_to_climlab
+from .kernels import radiative_kernels
@@ -0,0 +1,180 @@
+'''Temperature and water vapor radiative kernels from RRTMG.
+
+A radiative kernel is the Jacobian of the radiative fluxes with respect
+to the state of the column. Here the kernels are computed by finite differences,
+but rather than looping over perturbations and calling the radiation code
+once per perturbed profile, all perturbed profiles are stacked as extra
+columns of the RRTMG ``ncol`` dimension and the Fortran driver is called once.
+
+The McICA cloud subcolumns are generated once for the unperturbed columns
+and reused for every perturbation, so the kernels are not contaminated by
+sampling noise in cloudy columns.
+
+    :Example:
+
+        ::
+
+            import climlab
+            from climlab.radiation.rrtm import radiative_kernels
+            state = climlab.column_state(num_lev=30)
+            h2o = climlab.radiation.ManabeWaterVapor(state=state)
+            rad = climlab.radiation.RRTMG(state=state, specific_humidity=h2o.q)
+            kernels = radiative_kernels(rad)
+            #  sensitivity of TOA net downward flux to atmospheric temperature
+            print(kernels['Tatm'][..., 0])
+
+'''
+from __future__ import division
+import numpy as np
+from climlab.utils.attr_dict import AttrDict
+from .rrtmg_lw import RRTMG_LW
+from .rrtmg_sw import RRTMG_SW
+from .utils import _rrtm_to_climlab, _interface_stencil, _interface_temperature_rrtm
+
+
+#  Names of the arguments returned by RRTMG_LW._prepare_lw_arguments()
+_lw_argnames = ['ncol', 'nlay', 'icld', 'permuteseed', 'irng', 'idrv', 'cp',
+                'play', 'plev', 'tlay', 'tlev', 'tsfc',
+                'h2ovmr', 'o3vmr', 'co2vmr', 'ch4vmr', 'n2ovmr', 'o2vmr',
+                'cfc11vmr', 'cfc12vmr', 'cfc22vmr', 'ccl4vmr', 'emis',
+                'inflglw', 'iceflglw', 'liqflglw',
+                'cldfrac', 'ciwp', 'clwp', 'reic', 'relq', 'tauc', 'tauaer']
+#  Names of the arguments returned by RRTMG_SW._prepare_sw_arguments()
+_sw_argnames = ['ncol', 'nlay', 'icld', 'iaer', 'permuteseed', 'irng',
+                'play', 'plev', 'tlay', 'tlev', 'tsfc',
+                'h2ovmr', 'o3vmr', 'co2vmr', 'ch4vmr', 'n2ovmr', 'o2vmr',
+                'aldif', 'aldir', 'asdif', 'asdir', 'coszen', 'adjes',
+                'dyofyr', 'scon', 'isolvar', 'indsolvar', 'bndsolvar',
+                'solcycfrac', 'inflgsw', 'iceflgsw', 'liqflgsw',
+                'cldfrac', 'ciwp', 'clwp', 'reic', 'relq',
+                'tauc', 'ssac', 'asmc', 'fsfc',
+                'tauaer', 'ssaaer', 'asmaer', 'ecaer']
+#  Arrays dimensioned (nbnd, ncol, nlay)
+_band_first = ['tauc', 'ssac', 'asmc', 'fsfc']
+#  Arrays without a column dimension
+_no_columns = ['indsolvar', 'bndsolvar']
+
+
+def radiative_kernels(rad, dT=1., dlnq=0.1):
+    '''Compute temperature and water vapor radiative kernels for RRTMG
+    with a single call to the radiation code.
+
+    The kernels are the derivatives of the net downward flux
+    (all-sky and clear-sky) at every layer interface with respect to
+    air temperature at each level, surface temperature,
+    and the logarithm of specific humidity at each level.
+    They are computed by one-sided finite differences.
+
+    Longwave and shortwave contributions are summed if ``rad`` is an
+    :class:`~climlab.radiation.rrtm.RRTMG` container.
+    The state of ``rad`` is not modified.
+
+    **Function-call argument** \n
+
+    :param rad:         radiation process
+    :type rad:          :class:`~climlab.radiation.rrtm.RRTMG`,
+                        :class:`~climlab.radiation.rrtm.RRTMG_LW` or
+                        :class:`~climlab.radiation.rrtm.RRTMG_SW`
+    :param float dT:    temperature perturbation [K]     (default: 1.)
+    :param float dlnq:  perturbation in the natural logarithm of
+                        specific humidity                (default: 0.1)
+    :raises: :exc:`ValueError`  if ``rad`` is not an RRTMG process.
+    :returns:           dictionary with keys ``'Tatm'``, ``'Ts'``, ``'q'``
+                        and their clear-sky counterparts
+                        ``'Tatm_clr'``, ``'Ts_clr'``, ``'q_clr'``.
+                        ``kernels['Tatm'][..., k, j]`` is the change in
+                        net downward flux at interface ``j`` per unit change
+                        in ``Tatm`` at level ``k`` [W/m2/K].
+                        ``kernels['Ts']`` has the horizontal dimensions of ``Ts``
+                        followed by the interface dimension.
+                        ``kernels['q']`` has the same layout as ``kernels['Tatm']``,
+                        in units of W/m2 per unit change in ln(q).
+    :rtype:             dict
+
+    '''
+    if isinstance(rad, (RRTMG_LW, RRTMG_SW)):
+        procs = [rad]
+    else:
+        procs = [proc for proc in rad.subprocess.values()
+                 if isinstance(proc, (RRTMG_LW, RRTMG_SW))]
+        if not procs:
+            raise ValueError('rad must be an RRTMG, RRTMG_LW or RRTMG_SW process.')
+    kernels = None
+    for proc in procs:
+        this = _rrtmg_kernels(proc, dT, dlnq)
+        if kernels is None:
+            kernels = this
+        else:
+            for name in kernels:
+                kernels[name] = kernels[name] + this[name]
+    return kernels
+
+
+def _rrtmg_kernels(proc, dT, dlnq):
+    '''Batched finite-difference kernels for a single RRTMG_LW or RRTMG_SW process.'''
+    if isinstance(proc, RRTMG_LW):
+        args = proc._prepare_lw_arguments()
+        names = _lw_argnames
+        driver = proc._call_rrtmg_lw
+    else:
+        args = proc._prepare_sw_arguments()
+        names = _sw_argnames
+        driver = proc._call_rrtmg_sw
+    #  Cloud subcolumns for the unperturbed columns only
+    mcica = proc._mcica_subcol(args)
+    argdict = dict(zip(names, args))
+    ncol = argdict['ncol']
+    nlay = argdict['nlay']
+    #  Perturbations: unperturbed, Tatm at each level, Ts, q at each level
+    npert = 2*nlay + 2
+    Tslice = slice(1, nlay+1)
+    qslice = slice(nlay+2, 2*nlay+2)
+    #  Stack all perturbed profiles along the column dimension,
+    #  column index is  ipert*ncol + icol
+    stacked = []
+    for name, value in zip(names, args):
+        if np.ndim(value) == 0 or name in _no_columns:
+            stacked.append(value)
+        else:
+            axis = 1 if name in _band_first else 0
+            stacked.append(np.concatenate([value]*npert, axis=axis))
+    stacked[names.index('ncol')] = ncol * npert
+    mcica = [np.concatenate([value]*npert, axis=np.ndim(value)-2) for value in mcica]
+    #  Temperature perturbations in RRTM order (surface first)
+    dtlay = np.zeros((npert, nlay))
+    dtlay[Tslice] = dT * np.eye(nlay)[:, ::-1]
+    dtsfc = np.zeros(npert)
+    dtsfc[nlay+1] = dT
+    #  Interface temperature is linear in layer and surface temperatures
+    dtlev = _interface_temperature_rrtm(dtlay, dtsfc,
+                _interface_stencil(proc.lev, proc.lev_bounds))
+    #  Water vapor perturbations
+    factor = np.ones((npert, nlay))
+    factor[qslice] = np.exp(dlnq * np.eye(nlay)[:, ::-1])
+    for name, delta in [('tlay', dtlay), ('tlev', dtlev), ('tsfc', dtsfc)]:
+        i = names.index(name)
+        shape = stacked[i].shape
+        stacked[i] = (stacked[i].reshape((npert, ncol) + shape[1:])
+                      + delta[:, np.newaxis, ...]).reshape(shape)
+    i = names.index('h2ovmr')
+    stacked[i] = (stacked[i].reshape(npert, ncol, nlay)
+                  * factor[:, np.newaxis, :]).reshape(npert*ncol, nlay)
+    #  One call to the radiation code for all perturbations
+    output = driver(stacked, mcica)
+    (uflx, dflx) = output[0:2]
+    (uflxc, dflxc) = output[3:5]
+    kernels = AttrDict()
+    for suffix, up, down in [('', uflx, dflx), ('_clr', uflxc, dflxc)]:
+        #  net downward flux, shape (npert, ncol, nlay+1) in RRTM order
+        net = (down - up).reshape(npert, ncol, nlay+1)
+        diff = net - net[0]
+        Tatm_kernel = diff[Tslice] / dT
+        Ts_kernel = diff[nlay+1] / dT
+        q_kernel = diff[qslice] / dlnq
+        #  Back to climlab order with the perturbed level after the horizontal dimensions
+        kernels['Tatm'+suffix] = _rrtm_to_climlab(np.moveaxis(Tatm_kernel, 0, 1),
+                                                  proc.Tatm.shape + (nlay+1,))
+        kernels['Ts'+suffix] = _rrtm_to_climlab(Ts_kernel, proc.Ts.shape[:-1] + (nlay+1,))
+        kernels['q'+suffix] = _rrtm_to_climlab(np.moveaxis(q_kernel, 0, 1),
+                                               proc.Tatm.shape + (nlay+1,))
+    return kernels
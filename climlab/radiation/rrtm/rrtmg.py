@@ -118,6 +118,12 @@ class RRTMG(_Radiation_SW, _Radiation_LW):
                                           # or Mg and SB indices (isolvar=2)
             bndsolvar = np.zeros(nbndsw), # Solar variability scale factors for each shortwave band
             solcycfrac = 0.,              # Fraction of averaged solar cycle (0-1) at current time (isolvar=1)
+            reuse_mcica = False,  # reuse McICA cloud subcolumns until cloud inputs change
+            radiation_interval = 1,  # number of timesteps between full radiation calculations
+                        # In between, LW upward fluxes are corrected for changes in surface temperature
+                        # and SW fluxes are scaled with the incoming solar radiation in each column
+                        # (so they follow a diurnal cycle in coszen, but not the change in
+                        # atmospheric path length).
 
             **kwargs):
         super(RRTMG, self).__init__(**kwargs)
@@ -147,6 +153,8 @@ class RRTMG(_Radiation_SW, _Radiation_LW):
                      liqflglw = liqflglw,
                      tauc = tauc_lw,
                      tauaer = tauaer_lw,
+                     reuse_mcica = reuse_mcica,
+                     radiation_interval = radiation_interval,
                      **kwargs)
         SW = RRTMG_SW(absorber_vmr = self.absorber_vmr,
                      cldfrac = self.cldfrac,
@@ -180,6 +188,8 @@ class RRTMG(_Radiation_SW, _Radiation_LW):
                      indsolvar = indsolvar,
                      bndsolvar = bndsolvar,
                      solcycfrac = solcycfrac,
+                     reuse_mcica = reuse_mcica,
+                     radiation_interval = radiation_interval,
                      **kwargs)
         self.add_subprocess('SW', SW)
         self.add_subprocess('LW', LW )
@@ -210,3 +220,5 @@ class RRTMG(_Radiation_SW, _Radiation_LW):
         self.add_input('indsolvar', indsolvar)
         self.add_input('bndsolvar', bndsolvar)
         self.add_input('solcycfrac', solcycfrac)
+        self.add_input('reuse_mcica', reuse_mcica)
+        self.add_input('radiation_interval', radiation_interval)
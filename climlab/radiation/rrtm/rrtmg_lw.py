@@ -4,7 +4,8 @@ from __future__ import absolute_import
 import numpy as np
 from climlab import constants as const
 from climlab.radiation.radiation import _Radiation_LW
-from .utils import _prepare_general_arguments
+from .utils import _prepare_general_arguments, _cached_argument
+from .utils import _rrtm_buffer, _arguments_equal, _full_radiation_step
 from .utils import _climlab_to_rrtm, _climlab_to_rrtm_sfc, _rrtm_to_climlab
 # These values will get overridden by reading from Fortran extension
 nbndlw = 1; ngptlw = 1;
@@ -31,6 +32,8 @@ class RRTMG_LW(_Radiation_LW):
             liqflglw = 1,
             tauc = 0.,  # in-cloud optical depth
             tauaer = 0.,   # Aerosol optical depth at mid-point of LW spectral bands
+            reuse_mcica = False,  # reuse McICA subcolumns until cloud inputs change
+            radiation_interval = 1,  # number of timesteps between full radiation calculations
             **kwargs):
         super(RRTMG_LW, self).__init__(**kwargs)
         #  define INPUTS
@@ -43,6 +46,8 @@ class RRTMG_LW(_Radiation_LW):
         self.add_input('liqflglw', liqflglw)
         self.add_input('tauc', tauc)
         self.add_input('tauaer', tauaer)
+        self.add_input('reuse_mcica', reuse_mcica)
+        self.add_input('radiation_interval', radiation_interval)
 
     def _prepare_lw_arguments(self):
         #  scalar integer arguments
@@ -59,16 +64,16 @@ class RRTMG_LW(_Radiation_LW):
         cfc12vmr, cfc12vmr, cfc22vmr, ccl4vmr,
         cldfrac, ciwp, clwp, relq, reic) = _prepare_general_arguments(self)
         # surface emissivity
-        emis = self.emissivity * np.ones((ncol,nbndlw))
+        emis = _cached_argument(self, 'emis', self.emissivity,
+            lambda x: _climlab_to_rrtm_sfc(x * np.ones_like(self.Ts))[:, np.newaxis] * np.ones((ncol,nbndlw)))
         #  These arrays have an extra dimension for number of bands
-        # in-cloud optical depth [nbndlw,ncol,nlay]
-        tauc = _climlab_to_rrtm(self.tauc * np.ones_like(self.Tatm))
-        #  broadcast to get [nbndlw,ncol,nlay]
-        tauc = tauc * np.ones([nbndlw,ncol,nlay])
-        # Aerosol optical depth at mid-point of LW spectral bands [ncol,nlay,nbndlw]
-        tauaer = _climlab_to_rrtm(self.tauaer * np.ones_like(self.Tatm))
+        # in-cloud optical depth, broadcast to get [nbndlw,ncol,nlay]
+        tauc = _cached_argument(self, 'tauc', self.tauc,
+            lambda x: _climlab_to_rrtm(x * np.ones_like(self.Tatm)) * np.ones([nbndlw,ncol,nlay]))
+        # Aerosol optical depth at mid-point of LW spectral bands
         #  broadcast and transpose to get [ncol,nlay,nbndlw]
-        tauaer = np.transpose(tauaer * np.ones([nbndlw,ncol,nlay]), (1,2,0))
+        tauaer = _cached_argument(self, 'tauaer', self.tauaer,
+            lambda x: np.transpose(_climlab_to_rrtm(x * np.ones_like(self.Tatm)) * np.ones([nbndlw,ncol,nlay]), (1,2,0)))
         args = [ncol, nlay, icld, permuteseed, irng, idrv, const.cp,
                 play, plev, tlay, tlev, tsfc,
                 h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
@@ -80,48 +85,87 @@ class RRTMG_LW(_Radiation_LW):
     def _compute_heating_rates(self):
         '''Prepare arguments and call the RRTGM_LW driver to calculate
         radiative fluxes and heating rates'''
+        if _full_radiation_step(self):
+            args = self._prepare_lw_arguments()
+            if self.radiation_interval > 1:
+                #  need flux derivatives with respect to surface temperature
+                args[5] = 1  # idrv
+            mcica = self._mcica_subcol(args)
+            (uflx, dflx, hr, uflxc, dflxc, hrc, duflx_dt, duflxc_dt) = \
+                self._call_rrtmg_lw(args, mcica)
+            tsfc = np.array(args[11])
+            self._rrtm_fluxes = (uflx, dflx, uflxc, dflxc, duflx_dt, duflxc_dt, tsfc)
+        else:
+            #  Between full calculations, correct the upward fluxes
+            #  for the change in surface temperature since the last full calculation
+            (uflx, dflx, uflxc, dflxc, duflx_dt, duflxc_dt, tsfc) = self._rrtm_fluxes
+            dTs = (_climlab_to_rrtm_sfc(self.Ts) - tsfc)[:, np.newaxis]
+            uflx = uflx + duflx_dt * dTs
+            uflxc = uflxc + duflxc_dt * dTs
+        #  Output is all (ncol,nlay+1) or (ncol,nlay)
+        self.LW_flux_up = _rrtm_to_climlab(uflx, self.LW_flux_up.shape) + 0.*self.LW_flux_up
+        self.LW_flux_down = _rrtm_to_climlab(dflx, self.LW_flux_down.shape) + 0.*self.LW_flux_down
+        self.LW_flux_up_clr = _rrtm_to_climlab(uflxc, self.LW_flux_up_clr.shape) + 0.*self.LW_flux_up_clr
+        self.LW_flux_down_clr = _rrtm_to_climlab(dflxc, self.LW_flux_down_clr.shape) + 0.*self.LW_flux_down_clr
+        #  Compute quantities derived from fluxes, including OLR
+        self._compute_LW_flux_diagnostics()
+        #  calculate heating rates from flux divergence
+        LWheating_Wm2 = np.array(np.diff(self.LW_flux_net, axis=-1)) + 0.*self.Tatm
+        LWheating_clr_Wm2 = np.array(np.diff(self.LW_flux_net_clr, axis=-1)) + 0.*self.Tatm
+        self.heating_rate['Ts'] = np.array(-self.LW_flux_net[..., -1, np.newaxis]) + 0.*self.Ts
+        self.heating_rate['Tatm'] = LWheating_Wm2
+        #  Convert to K / day
+        Catm = self.Tatm.domain.heat_capacity
+        self.TdotLW = LWheating_Wm2 / Catm * const.seconds_per_day
+        self.TdotLW_clr = LWheating_clr_Wm2 / Catm * const.seconds_per_day
+
+    def _mcica_subcol(self, args):
+        '''Generate the stochastic cloud subcolumns needed by the RRTMG_LW driver
+        from the list of arguments returned by :func:`_prepare_lw_arguments`.
+
+        For clear-sky calculations (``icld == 0``) the same cached zero arrays
+        are returned every time. If ``reuse_mcica`` is True, the subcolumns
+        are stored and returned again until any of the cloud inputs change.'''
         (ncol, nlay, icld, permuteseed, irng, idrv, cp,
                 play, plev, tlay, tlev, tsfc,
                 h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
                 cfc11vmr, cfc12vmr, cfc22vmr, ccl4vmr, emis,
                 inflglw, iceflglw, liqflglw,
-                cldfrac, ciwp, clwp, reic, relq, tauc, tauaer,) = self._prepare_lw_arguments()
+                cldfrac, ciwp, clwp, reic, relq, tauc, tauaer,) = args
         if icld == 0:  # clear-sky only
-            cldfmcl = np.zeros((ngptlw,ncol,nlay))
-            ciwpmcl = np.zeros((ngptlw,ncol,nlay))
-            clwpmcl = np.zeros((ngptlw,ncol,nlay))
-            reicmcl = np.zeros((ncol,nlay))
-            relqmcl = np.zeros((ncol,nlay))
-            taucmcl = np.zeros((ngptlw,ncol,nlay))
-        else:
-            #  Call the Monte Carlo Independent Column Approximation (McICA, Pincus et al., JC, 2003)
-            (cldfmcl, ciwpmcl, clwpmcl, reicmcl, relqmcl, taucmcl) = \
-                _rrtmg_lw.climlab_mcica_subcol_lw(
+            #  These are never modified, so the same zero arrays can be passed every time
+            zeros = _rrtm_buffer(self, 'mcica_zeros', (ngptlw,ncol,nlay))
+            zeros2d = _rrtm_buffer(self, 'mcica_zeros2d', (ncol,nlay))
+            return (zeros, zeros, zeros, zeros2d, zeros2d, zeros)
+        cloud_inputs = (icld, permuteseed, irng, play,
+                        cldfrac, ciwp, clwp, reic, relq, tauc)
+        if self.reuse_mcica and '_mcica_inputs' in self.__dict__:
+            if _arguments_equal(self._mcica_inputs, cloud_inputs):
+                return self._mcica_subcolumns
+        #  Call the Monte Carlo Independent Column Approximation (McICA, Pincus et al., JC, 2003)
+        subcolumns = _rrtmg_lw.climlab_mcica_subcol_lw(
                             ncol, nlay, icld,
                             permuteseed, irng, play,
                             cldfrac, ciwp, clwp, reic, relq, tauc)
-            #  Call the RRTMG_LW driver to compute radiative fluxes
-        (uflx, dflx, hr, uflxc, dflxc, hrc, duflx_dt, duflxc_dt) = \
-            _rrtmg_lw.climlab_rrtmg_lw(ncol, nlay, icld, idrv,
+        if self.reuse_mcica:
+            self._mcica_inputs = [np.array(x, copy=True) for x in cloud_inputs]
+            self._mcica_subcolumns = subcolumns
+        return subcolumns
+
+    def _call_rrtmg_lw(self, args, mcica):
+        '''Call the RRTMG_LW driver to compute radiative fluxes,
+        given the prepared arguments and the McICA subcolumns.'''
+        (ncol, nlay, icld, permuteseed, irng, idrv, cp,
+                play, plev, tlay, tlev, tsfc,
+                h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
+                cfc11vmr, cfc12vmr, cfc22vmr, ccl4vmr, emis,
+                inflglw, iceflglw, liqflglw,
+                cldfrac, ciwp, clwp, reic, relq, tauc, tauaer,) = args
+        (cldfmcl, ciwpmcl, clwpmcl, reicmcl, relqmcl, taucmcl) = mcica
+        return _rrtmg_lw.climlab_rrtmg_lw(ncol, nlay, icld, idrv,
                  play, plev, tlay, tlev, tsfc,
                  h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
                  cfc11vmr, cfc12vmr, cfc22vmr, ccl4vmr, emis,
                  inflglw, iceflglw, liqflglw, cldfmcl,
                  taucmcl, ciwpmcl, clwpmcl, reicmcl, relqmcl,
                  tauaer)
-        #  Output is all (ncol,nlay+1) or (ncol,nlay)
-        self.LW_flux_up = _rrtm_to_climlab(uflx) + 0.*self.LW_flux_up
-        self.LW_flux_down = _rrtm_to_climlab(dflx) + 0.*self.LW_flux_down
-        self.LW_flux_up_clr = _rrtm_to_climlab(uflxc) + 0.*self.LW_flux_up_clr
-        self.LW_flux_down_clr = _rrtm_to_climlab(dflxc) + 0.*self.LW_flux_down_clr
-        #  Compute quantities derived from fluxes, including OLR
-        self._compute_LW_flux_diagnostics()
-        #  calculate heating rates from flux divergence
-        LWheating_Wm2 = np.array(np.diff(self.LW_flux_net, axis=-1)) + 0.*self.Tatm
-        LWheating_clr_Wm2 = np.array(np.diff(self.LW_flux_net_clr, axis=-1)) + 0.*self.Tatm
-        self.heating_rate['Ts'] = np.array(-self.LW_flux_net[..., -1, np.newaxis]) + 0.*self.Ts
-        self.heating_rate['Tatm'] = LWheating_Wm2
-        #  Convert to K / day
-        Catm = self.Tatm.domain.heat_capacity
-        self.TdotLW = LWheating_Wm2 / Catm * const.seconds_per_day
-        self.TdotLW_clr = LWheating_clr_Wm2 / Catm * const.seconds_per_day
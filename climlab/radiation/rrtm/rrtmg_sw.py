@@ -2,7 +2,8 @@ from __future__ import division, print_function, absolute_import
 import numpy as np
 from climlab import constants as const
 from climlab.radiation.radiation import _Radiation_SW
-from .utils import _prepare_general_arguments
+from .utils import _prepare_general_arguments, _cached_argument
+from .utils import _rrtm_buffer, _arguments_equal, _full_radiation_step
 from .utils import _climlab_to_rrtm, _climlab_to_rrtm_sfc, _rrtm_to_climlab
 # These values will get overridden by reading from Fortran extension
 nbndsw = 1; naerec = 1; ngptsw = 1;
@@ -84,6 +85,12 @@ class RRTMG_SW(_Radiation_SW):
                                          # or Mg and SB indices (isolvar=2)
             bndsolvar = np.ones(nbndsw), # Solar variability scale factors for each shortwave band
             solcycfrac = 1.,              # Fraction of averaged solar cycle (0-1) at current time (isolvar=1)
+            reuse_mcica = False,  # reuse McICA subcolumns until cloud inputs change
+            radiation_interval = 1,  # number of timesteps between full radiation calculations
+                        # In between, fluxes are scaled with the incoming solar radiation
+                        # (S0 * eccentricity_factor * coszen) in each column, which neglects
+                        # the change in atmospheric path length with the zenith angle.
+                        # A full calculation is done as soon as the sun rises in any column.
             **kwargs):
         super(RRTMG_SW, self).__init__(**kwargs)
         #  define INPUTS
@@ -107,6 +114,8 @@ class RRTMG_SW(_Radiation_SW):
         self.add_input('indsolvar', indsolvar)
         self.add_input('bndsolvar', bndsolvar)
         self.add_input('solcycfrac', solcycfrac)
+        self.add_input('reuse_mcica', reuse_mcica)
+        self.add_input('radiation_interval', radiation_interval)
 
     def _prepare_sw_arguments(self):
         #  prepare insolation
@@ -142,32 +151,37 @@ class RRTMG_SW(_Radiation_SW):
         cfc12vmr, cfc12vmr, cfc22vmr, ccl4vmr,
         cldfrac, ciwp, clwp, relq, reic) = _prepare_general_arguments(self)
 
-        aldif = _climlab_to_rrtm_sfc(self.aldif * np.ones_like(self.Ts))
-        aldir = _climlab_to_rrtm_sfc(self.aldir * np.ones_like(self.Ts))
-        asdif = _climlab_to_rrtm_sfc(self.asdif * np.ones_like(self.Ts))
-        asdir = _climlab_to_rrtm_sfc(self.asdir * np.ones_like(self.Ts))
-        coszen = _climlab_to_rrtm_sfc(self.coszen * np.ones_like(self.Ts))
+        def surface(x):
+            return _climlab_to_rrtm_sfc(x * np.ones_like(self.Ts))
+        def bands(x, nbnd=nbndsw):
+            #  broadcast to get [nbnd,ncol,nlay]
+            return _climlab_to_rrtm(x * np.ones_like(self.Tatm)) * np.ones([nbnd,ncol,nlay])
+        def bands_last(x, nbnd=nbndsw):
+            #  broadcast and transpose to get [ncol,nlay,nbnd]
+            return np.transpose(bands(x, nbnd), (1,2,0))
+        aldif = _cached_argument(self, 'aldif', self.aldif, surface)
+        aldir = _cached_argument(self, 'aldir', self.aldir, surface)
+        asdif = _cached_argument(self, 'asdif', self.asdif, surface)
+        asdir = _cached_argument(self, 'asdir', self.asdir, surface)
+        coszen = _cached_argument(self, 'coszen', self.coszen, surface)
         #  These arrays have an extra dimension for number of bands
         # in-cloud optical depth [nbndsw,ncol,nlay]
-        tauc = _climlab_to_rrtm(self.tauc * np.ones_like(self.Tatm))
-        #  broadcast to get [nbndsw,ncol,nlay]
-        tauc = tauc * np.ones([nbndsw,ncol,nlay])
+        tauc = _cached_argument(self, 'tauc', self.tauc, bands)
         # In-cloud single scattering albedo, same operation
-        ssac = _climlab_to_rrtm(self.ssac * np.ones_like(self.Tatm)) * np.ones([nbndsw,ncol,nlay])
+        ssac = _cached_argument(self, 'ssac', self.ssac, bands)
         # In-cloud asymmetry parameter
-        asmc = _climlab_to_rrtm(self.asmc * np.ones_like(self.Tatm)) * np.ones([nbndsw,ncol,nlay])
+        asmc = _cached_argument(self, 'asmc', self.asmc, bands)
         # In-cloud forward scattering fraction (delta function pointing forward "forward peaked scattering")
-        fsfc = _climlab_to_rrtm(self.fsfc * np.ones_like(self.Tatm)) * np.ones([nbndsw,ncol,nlay])
+        fsfc = _cached_argument(self, 'fsfc', self.fsfc, bands)
         # Aerosol optical depth (iaer=10 only), (ncol,nlay,nbndsw)] #  (non-delta scaled)
-        tauaer = _climlab_to_rrtm(self.tauaer * np.ones_like(self.Tatm))
-        #  broadcast and transpose to get [ncol,nlay,nbndsw]
-        tauaer = np.transpose(tauaer * np.ones([nbndsw,ncol,nlay]), (1,2,0))
+        tauaer = _cached_argument(self, 'tauaer', self.tauaer, bands_last)
         # Aerosol single scattering albedo (iaer=10 only), Dimensions,  (ncol,nlay,nbndsw)] #  (non-delta scaled)
-        ssaaer = np.transpose(_climlab_to_rrtm(self.ssaaer * np.ones_like(self.Tatm)) * np.ones([nbndsw,ncol,nlay]), (1,2,0))
+        ssaaer = _cached_argument(self, 'ssaaer', self.ssaaer, bands_last)
         # Aerosol asymmetry parameter (iaer=10 only), Dimensions,  (ncol,nlay,nbndsw)] #  (non-delta scaled)
-        asmaer = np.transpose(_climlab_to_rrtm(self.asmaer * np.ones_like(self.Tatm)) * np.ones([nbndsw,ncol,nlay]), (1,2,0))
+        asmaer = _cached_argument(self, 'asmaer', self.asmaer, bands_last)
         # Aerosol optical depth at 0.55 micron (iaer=6 only), Dimensions,  (ncol,nlay,naerec)] #  (non-delta scaled)
-        ecaer = np.transpose(_climlab_to_rrtm(self.ecaer * np.ones_like(self.Tatm)) * np.ones([naerec,ncol,nlay]), (1,2,0))
+        ecaer = _cached_argument(self, 'ecaer', self.ecaer,
+                                 lambda x: bands_last(x, naerec))
 
         args = [ncol, nlay, icld, iaer, permuteseed, irng,
                 play, plev, tlay, tlev, tsfc,
@@ -183,6 +197,54 @@ class RRTMG_SW(_Radiation_SW):
     def _compute_heating_rates(self):
         '''Prepare arguments and call the RRTGM_SW driver to calculate
         radiative fluxes and heating rates'''
+        incoming = self._incoming_sw()
+        full_step = _full_radiation_step(self)
+        if not full_step:
+            #  the sun has risen in some column since the last full calculation
+            full_step = np.any((self._rrtm_incoming == 0.) & (incoming > 0.))
+        if full_step:
+            args = self._prepare_sw_arguments()
+            mcica = self._mcica_subcol(args)
+            (swuflx, swdflx, swhr, swuflxc, swdflxc, swhrc) = \
+                self._call_rrtmg_sw(args, mcica)
+            self._rrtm_fluxes = (swuflx, swdflx, swuflxc, swdflxc)
+            self._rrtm_incoming = incoming
+        else:
+            #  Between full calculations, shortwave fluxes are scaled
+            #  with the incoming solar radiation in each column
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(self._rrtm_incoming > 0.,
+                                 incoming / self._rrtm_incoming, 0.)[:, np.newaxis]
+            (swuflx, swdflx, swuflxc, swdflxc) = [flux * ratio for flux in self._rrtm_fluxes]
+        #  Output is all (ncol,nlay+1) or (ncol,nlay)
+        self.SW_flux_up = _rrtm_to_climlab(swuflx, self.SW_flux_up.shape) + 0.*self.SW_flux_up
+        self.SW_flux_down = _rrtm_to_climlab(swdflx, self.SW_flux_down.shape) + 0.*self.SW_flux_down
+        self.SW_flux_up_clr = _rrtm_to_climlab(swuflxc, self.SW_flux_up_clr.shape) + 0.*self.SW_flux_up_clr
+        self.SW_flux_down_clr = _rrtm_to_climlab(swdflxc, self.SW_flux_down_clr.shape) + 0.*self.SW_flux_down_clr
+        #  Compute quantities derived from fluxes, including ASR
+        self._compute_SW_flux_diagnostics()
+        #  calculate heating rates from flux divergence
+        SWheating_Wm2 = np.array(-np.diff(self.SW_flux_net, axis=-1)) + 0.*self.Tatm
+        SWheating_clr_Wm2 = np.array(-np.diff(self.SW_flux_net_clr, axis=-1)) + 0.*self.Tatm
+        self.heating_rate['Ts'] = np.array(self.SW_flux_net[..., -1, np.newaxis]) + 0.*self.Ts
+        self.heating_rate['Tatm'] = SWheating_Wm2
+        #  Convert to K / day
+        Catm = self.Tatm.domain.heat_capacity
+        self.TdotSW = SWheating_Wm2 / Catm * const.seconds_per_day
+        self.TdotSW_clr = SWheating_clr_Wm2 / Catm * const.seconds_per_day
+
+    def _incoming_sw(self):
+        '''Incoming solar radiation at the top of each column, with dimension (ncol,).'''
+        incoming = self.S0 * self.eccentricity_factor * self.coszen * np.ones_like(self.Ts)
+        return np.array(_climlab_to_rrtm_sfc(incoming), dtype=float)
+
+    def _mcica_subcol(self, args):
+        '''Generate the stochastic cloud subcolumns needed by the RRTMG_SW driver
+        from the list of arguments returned by :func:`_prepare_sw_arguments`.
+
+        For clear-sky calculations (``icld == 0``) the same cached zero arrays
+        are returned every time. If ``reuse_mcica`` is True, the subcolumns
+        are stored and returned again until any of the cloud inputs change.'''
         (ncol, nlay, icld, iaer, permuteseed, irng,
          play, plev, tlay, tlev, tsfc,
          h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
@@ -190,26 +252,41 @@ class RRTMG_SW(_Radiation_SW):
          indsolvar, bndsolvar, solcycfrac,
          inflgsw, iceflgsw, liqflgsw,
          cldfrac, ciwp, clwp, reic, relq, tauc, ssac, asmc, fsfc,
-         tauaer, ssaaer, asmaer, ecaer,) = self._prepare_sw_arguments()
+         tauaer, ssaaer, asmaer, ecaer,) = args
         if icld == 0:  # clear-sky only
-            cldfmcl = np.zeros((ngptsw,ncol,nlay))
-            ciwpmcl = np.zeros((ngptsw,ncol,nlay))
-            clwpmcl = np.zeros((ngptsw,ncol,nlay))
-            reicmcl = np.zeros((ncol,nlay))
-            relqmcl = np.zeros((ncol,nlay))
-            taucmcl = np.zeros((ngptsw,ncol,nlay))
-            ssacmcl = np.zeros((ngptsw,ncol,nlay))
-            asmcmcl = np.zeros((ngptsw,ncol,nlay))
-            fsfcmcl = np.zeros((ngptsw,ncol,nlay))
-        else:
-            #  Call the Monte Carlo Independent Column Approximation (McICA, Pincus et al., JC, 2003)
-            (cldfmcl, ciwpmcl, clwpmcl, reicmcl, relqmcl, taucmcl,
-            ssacmcl, asmcmcl, fsfcmcl) = _rrtmg_sw.climlab_mcica_subcol_sw(
+            #  These are never modified, so the same zero arrays can be passed every time
+            zeros = _rrtm_buffer(self, 'mcica_zeros', (ngptsw,ncol,nlay))
+            zeros2d = _rrtm_buffer(self, 'mcica_zeros2d', (ncol,nlay))
+            return (zeros, zeros, zeros, zeros2d, zeros2d, zeros,
+                    zeros, zeros, zeros)
+        cloud_inputs = (icld, permuteseed, irng, play,
+                        cldfrac, ciwp, clwp, reic, relq, tauc, ssac, asmc, fsfc)
+        if self.reuse_mcica and '_mcica_inputs' in self.__dict__:
+            if _arguments_equal(self._mcica_inputs, cloud_inputs):
+                return self._mcica_subcolumns
+        #  Call the Monte Carlo Independent Column Approximation (McICA, Pincus et al., JC, 2003)
+        subcolumns = _rrtmg_sw.climlab_mcica_subcol_sw(
                             ncol, nlay, icld, permuteseed, irng, play,
                             cldfrac, ciwp, clwp, reic, relq, tauc, ssac, asmc, fsfc)
-        #  Call the RRTMG_SW driver to compute radiative fluxes
-        (swuflx, swdflx, swhr, swuflxc, swdflxc, swhrc) = \
-            _rrtmg_sw.climlab_rrtmg_sw(ncol, nlay, icld, iaer,
+        if self.reuse_mcica:
+            self._mcica_inputs = [np.array(x, copy=True) for x in cloud_inputs]
+            self._mcica_subcolumns = subcolumns
+        return subcolumns
+
+    def _call_rrtmg_sw(self, args, mcica):
+        '''Call the RRTMG_SW driver to compute radiative fluxes,
+        given the prepared arguments and the McICA subcolumns.'''
+        (ncol, nlay, icld, iaer, permuteseed, irng,
+         play, plev, tlay, tlev, tsfc,
+         h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
+         aldif, aldir, asdif, asdir, coszen, adjes, dyofyr, scon, isolvar,
+         indsolvar, bndsolvar, solcycfrac,
+         inflgsw, iceflgsw, liqflgsw,
+         cldfrac, ciwp, clwp, reic, relq, tauc, ssac, asmc, fsfc,
+         tauaer, ssaaer, asmaer, ecaer,) = args
+        (cldfmcl, ciwpmcl, clwpmcl, reicmcl, relqmcl, taucmcl,
+         ssacmcl, asmcmcl, fsfcmcl) = mcica
+        return _rrtmg_sw.climlab_rrtmg_sw(ncol, nlay, icld, iaer,
                 play, plev, tlay, tlev, tsfc,
                 h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr,
                 asdir, asdif, aldir, aldif,
@@ -219,19 +296,3 @@ class RRTMG_SW(_Radiation_SW):
                 ciwpmcl, clwpmcl, reicmcl, relqmcl,
                 tauaer, ssaaer, asmaer, ecaer,
                 bndsolvar, indsolvar, solcycfrac)
-        #  Output is all (ncol,nlay+1) or (ncol,nlay)
-        self.SW_flux_up = _rrtm_to_climlab(swuflx) + 0.*self.SW_flux_up
-        self.SW_flux_down = _rrtm_to_climlab(swdflx) + 0.*self.SW_flux_down
-        self.SW_flux_up_clr = _rrtm_to_climlab(swuflxc) + 0.*self.SW_flux_up_clr
-        self.SW_flux_down_clr = _rrtm_to_climlab(swdflxc) + 0.*self.SW_flux_down_clr
-        #  Compute quantities derived from fluxes, including ASR
-        self._compute_SW_flux_diagnostics()
-        #  calculate heating rates from flux divergence
-        SWheating_Wm2 = np.array(-np.diff(self.SW_flux_net, axis=-1)) + 0.*self.Tatm
-        SWheating_clr_Wm2 = np.array(-np.diff(self.SW_flux_net_clr, axis=-1)) + 0.*self.Tatm
-        self.heating_rate['Ts'] = np.array(self.SW_flux_net[..., -1, np.newaxis]) + 0.*self.Ts
-        self.heating_rate['Tatm'] = SWheating_Wm2
-        #  Convert to K / day
-        Catm = self.Tatm.domain.heat_capacity
-        self.TdotSW = SWheating_Wm2 / Catm * const.seconds_per_day
-        self.TdotSW_clr = SWheating_clr_Wm2 / Catm * const.seconds_per_day
@@ -5,38 +5,134 @@ from climlab.utils.thermo import mmr_to_vmr
 
 
 def _prepare_general_arguments(RRTMGobject):
-    '''Prepare arguments needed for both RRTMG_SW and RRTMG_LW with correct dimensions.'''
-    tlay = _climlab_to_rrtm(RRTMGobject.Tatm)
-    tlev = _climlab_to_rrtm(interface_temperature(**RRTMGobject.state))
-    play = _climlab_to_rrtm(RRTMGobject.lev * np.ones_like(tlay))
-    plev = _climlab_to_rrtm(RRTMGobject.lev_bounds * np.ones_like(tlev))
-    ncol, nlay = tlay.shape
-    tsfc = _climlab_to_rrtm_sfc(RRTMGobject.Ts)
+    '''Prepare arguments needed for both RRTMG_SW and RRTMG_LW with correct dimensions.
+
+    Arrays are written into persistent Fortran-ordered buffers held by
+    ``RRTMGobject``. Inputs that have not changed since the previous call
+    are not converted again (see :func:`_cached_argument`).'''
+    Tatm = RRTMGobject.Tatm
+    nlay = Tatm.shape[-1]
+    ncol = Tatm.size // nlay
+    lev = RRTMGobject.lev
+    lev_bounds = RRTMGobject.lev_bounds
+    if RRTMGobject.__dict__.get('_rrtm_shape') != Tatm.shape:
+        #  new grid, discard all cached arguments
+        RRTMGobject._rrtm_inputs = {}
+        RRTMGobject._rrtm_shape = Tatm.shape
+    #  Pressure and the interpolation stencil only change with the vertical axis
+    play = _cached_argument(RRTMGobject, 'play', lev,
+                lambda x: _climlab_to_rrtm(x * np.ones_like(Tatm)))
+    plev = _cached_argument(RRTMGobject, 'plev', lev_bounds,
+                lambda x: _climlab_to_rrtm(x * np.ones(Tatm.shape[:-1] + (nlay+1,))))
+    weights = _cached_argument(RRTMGobject, 'tlev_weights',
+                np.concatenate((lev, lev_bounds)),
+                lambda x: _interface_stencil(lev, lev_bounds))
+    #  Temperatures change every timestep
+    tlay = _rrtm_buffer(RRTMGobject, 'tlay', (ncol, nlay))
+    tlay[:] = _climlab_to_rrtm(Tatm)
+    tsfc = _rrtm_buffer(RRTMGobject, 'tsfc', (ncol,))
+    tsfc[:] = _climlab_to_rrtm_sfc(RRTMGobject.Ts)
+    tlev = _rrtm_buffer(RRTMGobject, 'tlev', (ncol, nlay+1))
+    _interface_temperature_rrtm(tlay, tsfc, weights, out=tlev)
     # GASES -- put them in proper dimensions and units
-    vapor_mixing_ratio = mmr_to_vmr(RRTMGobject.specific_humidity, gas='H2O')
-    h2ovmr   = _climlab_to_rrtm(vapor_mixing_ratio * np.ones_like(RRTMGobject.Tatm))
-    o3vmr    = _climlab_to_rrtm(RRTMGobject.absorber_vmr['O3'] * np.ones_like(RRTMGobject.Tatm))
-    co2vmr   = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CO2'] * np.ones_like(RRTMGobject.Tatm))
-    ch4vmr   = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CH4'] * np.ones_like(RRTMGobject.Tatm))
-    n2ovmr   = _climlab_to_rrtm(RRTMGobject.absorber_vmr['N2O'] * np.ones_like(RRTMGobject.Tatm))
-    o2vmr    = _climlab_to_rrtm(RRTMGobject.absorber_vmr['O2'] * np.ones_like(RRTMGobject.Tatm))
-    cfc11vmr = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CFC11'] * np.ones_like(RRTMGobject.Tatm))
-    cfc12vmr = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CFC12'] * np.ones_like(RRTMGobject.Tatm))
-    cfc22vmr = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CFC22'] * np.ones_like(RRTMGobject.Tatm))
-    ccl4vmr  = _climlab_to_rrtm(RRTMGobject.absorber_vmr['CCL4'] * np.ones_like(RRTMGobject.Tatm))
+    def column(x):
+        return _climlab_to_rrtm(x * np.ones_like(Tatm))
+    h2ovmr   = _cached_argument(RRTMGobject, 'h2ovmr', RRTMGobject.specific_humidity,
+                    lambda x: column(mmr_to_vmr(x, gas='H2O')))
+    o3vmr    = _cached_argument(RRTMGobject, 'o3vmr', RRTMGobject.absorber_vmr['O3'], column)
+    co2vmr   = _cached_argument(RRTMGobject, 'co2vmr', RRTMGobject.absorber_vmr['CO2'], column)
+    ch4vmr   = _cached_argument(RRTMGobject, 'ch4vmr', RRTMGobject.absorber_vmr['CH4'], column)
+    n2ovmr   = _cached_argument(RRTMGobject, 'n2ovmr', RRTMGobject.absorber_vmr['N2O'], column)
+    o2vmr    = _cached_argument(RRTMGobject, 'o2vmr', RRTMGobject.absorber_vmr['O2'], column)
+    cfc11vmr = _cached_argument(RRTMGobject, 'cfc11vmr', RRTMGobject.absorber_vmr['CFC11'], column)
+    cfc12vmr = _cached_argument(RRTMGobject, 'cfc12vmr', RRTMGobject.absorber_vmr['CFC12'], column)
+    cfc22vmr = _cached_argument(RRTMGobject, 'cfc22vmr', RRTMGobject.absorber_vmr['CFC22'], column)
+    ccl4vmr  = _cached_argument(RRTMGobject, 'ccl4vmr', RRTMGobject.absorber_vmr['CCL4'], column)
     #  Cloud parameters
-    cldfrac = _climlab_to_rrtm(RRTMGobject.cldfrac * np.ones_like(RRTMGobject.Tatm))
-    ciwp = _climlab_to_rrtm(RRTMGobject.ciwp * np.ones_like(RRTMGobject.Tatm))
-    clwp = _climlab_to_rrtm(RRTMGobject.clwp * np.ones_like(RRTMGobject.Tatm))
-    relq = _climlab_to_rrtm(RRTMGobject.r_liq * np.ones_like(RRTMGobject.Tatm))
-    reic = _climlab_to_rrtm(RRTMGobject.r_ice * np.ones_like(RRTMGobject.Tatm))
+    cldfrac = _cached_argument(RRTMGobject, 'cldfrac', RRTMGobject.cldfrac, column)
+    ciwp = _cached_argument(RRTMGobject, 'ciwp', RRTMGobject.ciwp, column)
+    clwp = _cached_argument(RRTMGobject, 'clwp', RRTMGobject.clwp, column)
+    relq = _cached_argument(RRTMGobject, 'relq', RRTMGobject.r_liq, column)
+    reic = _cached_argument(RRTMGobject, 'reic', RRTMGobject.r_ice, column)
 
     return (ncol, nlay, play, plev, tlay, tlev, tsfc,
             h2ovmr, o3vmr, co2vmr, ch4vmr, n2ovmr, o2vmr, cfc11vmr,
             cfc12vmr, cfc12vmr, cfc22vmr, ccl4vmr,
             cldfrac, ciwp, clwp, relq, reic)
 
+def _rrtm_buffer(RRTMGobject, key, shape):
+    '''Persistent Fortran-ordered array of given shape used to pass
+    argument ``key`` to the RRTMG drivers. It is reallocated only if
+    the shape changes.'''
+    buffers = RRTMGobject.__dict__.setdefault('_rrtm_buffers', {})
+    shape = tuple(shape)
+    buf = buffers.get(key)
+    if buf is None or buf.shape != shape:
+        buf = np.zeros(shape, order='F')
+        buffers[key] = buf
+    return buf
+
+def _cached_argument(RRTMGobject, key, value, convert):
+    '''Return ``convert(value)`` stored in a persistent Fortran-ordered buffer.
+
+    The conversion is skipped and the buffer returned as is
+    if ``value`` is equal to the value used in the previous call.'''
+    inputs = RRTMGobject.__dict__.setdefault('_rrtm_inputs', {})
+    last = inputs.get(key)
+    if (last is not None and last.shape == np.shape(value)
+            and np.array_equal(last, value)):
+        return RRTMGobject._rrtm_buffers[key]
+    new = convert(value)
+    buf = _rrtm_buffer(RRTMGobject, key, np.shape(new))
+    buf[...] = new
+    inputs[key] = np.array(value, copy=True)
+    return buf
+
+def _full_radiation_step(RRTMGobject):
+    '''True if the full radiation code needs to be called at the current timestep.
+
+    With ``radiation_interval = N > 1``, full calculations are done every
+    ``N`` steps of ``RRTMGobject`` and fluxes from the previous full calculation
+    are reused in between, with LW fluxes corrected for changes in surface
+    temperature and SW fluxes scaled with the incoming solar radiation.'''
+    interval = RRTMGobject.radiation_interval
+    return (interval <= 1
+            or '_rrtm_fluxes' not in RRTMGobject.__dict__
+            or RRTMGobject.time['steps'] % interval == 0)
+
+def _arguments_equal(old, new):
+    '''True if two sequences of scalar or array arguments are element-wise equal.'''
+    return all(np.shape(a) == np.shape(b) and np.array_equal(a, b)
+               for a, b in zip(old, new))
+
+def _interface_stencil(lev, lev_bounds):
+    '''Weights for linear interpolation of layer temperatures to the
+    interior layer interfaces, in RRTM order (surface first).
+
+    The interface temperature between RRTM layers ``i-1`` and ``i`` is
+    ``tlay[:,i] + w[i-1] * (tlay[:,i-1] - tlay[:,i])``.'''
+    lev = np.asarray(lev)
+    lev_bounds = np.asarray(lev_bounds)
+    w = (lev_bounds[1:-1] - lev[:-1]) / (lev[1:] - lev[:-1])
+    return w[::-1]
 
+def _interface_temperature_rrtm(tlay, tsfc, weights, out=None):
+    '''Compute temperature at layer interfaces from RRTM-ordered layer
+    temperatures ``tlay`` (ncol, nlay) and surface temperature ``tsfc`` (ncol,).
+
+    Equivalent to :func:`interface_temperature` but uses a precomputed
+    stencil from :func:`_interface_stencil`.'''
+    ncol, nlay = tlay.shape
+    if out is None:
+        out = np.zeros((ncol, nlay+1), order='F')
+    #  Assume surface temperature at bottom boundary
+    out[:, 0] = tsfc
+    np.subtract(tlay[:, :-1], tlay[:, 1:], out=out[:, 1:-1])
+    out[:, 1:-1] *= weights
+    out[:, 1:-1] += tlay[:, 1:]
+    #  TOA value is the top layer temperature
+    out[:, -1] = tlay[:, -1]
+    return out
 
 def interface_temperature(Ts, Tatm, **kwargs):
     '''Compute temperature at model layer interfaces.'''
@@ -61,12 +157,11 @@ def _climlab_to_rrtm(field):
         - (num_lat, num_lev)  --> (num_lat, num_lev)
         - (num_lat, num_lon, num_lev)  -->  (num_lat*num_lon, num_lev)
 
-        But lat-lon grids not yet supported here!
-
-    Case single column
+    Any number of horizontal dimensions is flattened into the
+    column dimension. This is a reshape of a view and does not copy
+    the data unless the input array is not contiguous in the
+    horizontal dimensions.
     '''
-    # Make this work just with 1D (KM,) arrays
-    #  (KM,)  -->  (1, nlay)
     try:
         #  Flip along the last axis to reverse the pressure order
         field = field[..., ::-1]
@@ -75,18 +170,16 @@ def _climlab_to_rrtm(field):
             return field
         else:
             raise ValueError('field must be array_like or scalar.')
-    shape = field.shape
-    if len(shape)==1:  #  (num_lev)
-        #  Need to append an extra dimension for singleton horizontal ncol
-        return field[np.newaxis, ...]
-    elif len(shape)==2:  # (num_lat, num_lev)
-        return field
-    elif len(shape) > 2:
-        raise ValueError('lat-lon grids not yet supported here.')
-    #elif len(shape)==3:  # (num_lat, num_lon, num_lev)
-        #  Need to reshape this array
-
-def _rrtm_to_climlab(field):
+    #  (..., num_lev)  -->  (ncol, num_lev)
+    return np.reshape(field, (-1, field.shape[-1]))
+
+def _rrtm_to_climlab(field, shape=None):
+    '''Convert a field with dimensions (ncol, nlay) back to climlab order.
+
+    If ``shape`` is given, the column dimension is unflattened to the
+    horizontal dimensions ``shape[:-1]`` (e.g. the shape of the diagnostic
+    that will hold the result). Otherwise singleton dimensions are squeezed.
+    '''
     try:
         #  Flip along the last axis to reverse the pressure order
         field = field[..., ::-1]
@@ -95,12 +188,19 @@ def _rrtm_to_climlab(field):
             return field
         else:
             raise ValueError('field must be array_like or scalar.')
-    return np.squeeze(field)
+    if shape is None:
+        return np.squeeze(field)
+    else:
+        return np.reshape(field, tuple(shape[:-1]) + field.shape[-1:])
 
 def _climlab_to_rrtm_sfc(field):
+    '''Prepare surface field with dimensions (ncol,)
+
+    climlab surface fields (..., 1) are flattened into the column dimension.
+    '''
     if len(field.shape)==1:
         return field  #  single column
-    elif len(field.shape)==2:
-        return np.squeeze(field)  # should handle case with num_lat > 1
+    elif len(field.shape) > 1:
+        return np.reshape(field, -1)  # flatten all horizontal dimensions
     else:
         raise ValueError('Mix up with dimensions of surface field')
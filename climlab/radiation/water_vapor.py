@@ -31,16 +31,17 @@ class FixedRelativeHumidity(DiagnosticProcess):
         self._compute()
 
     def _compute(self):
-        es = clausius_clapeyron(self.Tatm)
-        e = self.RH_profile * es
+        #  work with plain arrays in place, much cheaper than Field arithmetic
+        es = clausius_clapeyron(np.asarray(self.Tatm))
+        e = np.multiply(np.asarray(self.RH_profile), es, out=es)
         # convert to specific humidity (assume dilute)
-        qH2O = e/self.lev * const.Rd / const.Rv
+        qH2O = np.divide(e, np.asarray(self.lev), out=e)
+        qH2O *= const.Rd / const.Rv
         #  mixing ratio can't be smaller than qStrat
         #  (need some water in the stratosphere!)
-        q = np.maximum(self.qStrat, qH2O)
+        q = np.maximum(self.qStrat, qH2O, out=qH2O)
         #  Just set this directly here
-        q_adjustment = q - self.q
-        self.q += q_adjustment
+        self.q[...] = q
         return {}
 
 
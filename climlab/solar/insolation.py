@@ -1,7 +1,8 @@
 """This module contains general-purpose routines for computing incoming
 solar radiation at the top of the atmosphere.
 
-Currently, only daily average insolation is computed.
+Daily average insolation is computed by :func:`daily_insolation`
+and annual mean insolation by :func:`annual_mean_insolation`.
 
 .. note::
 
@@ -25,7 +26,8 @@ import numpy as np
 from climlab import constants as const
 
 
-def daily_insolation(lat, day, orb=const.orb_present, S0=None, day_type=1):
+def daily_insolation(lat, day, orb=const.orb_present, S0=None, day_type=1,
+                     out=None, chunk_size=None):
     """Compute daily average insolation given latitude, time of year and orbital parameters.
 
     Orbital parameters can be computed for any time in the last 5 Myears with
@@ -71,12 +73,25 @@ def daily_insolation(lat, day, orb=const.orb_present, S0=None, day_type=1):
                              equinox (21 March). Note that calendar days and solar longitude are
                              not linearly related because, by Kepler's Second Law, Earth's
                              angular velocity varies according to its distance from the sun.
+    :param array out:       array to hold the result (optional), e.g. a
+                            :class:`numpy.memmap`. Must be contiguous with
+                            ``lat.size * day.size * ecc.size`` elements.
+    :param int chunk_size:  maximum number of orbital parameter sets
+                            processed at once (optional). Bounds the size of
+                            temporary arrays to about
+                            ``lat.size * day.size * chunk_size`` elements.
+                            Default is to process all at once.
     :raises: :exc:`ValueError`
                             if day_type is neither 1 nor 2
+    :raises: :exc:`ValueError`
+                            if ``out`` does not have the right size or cannot
+                            be reshaped without a copy
     :returns:               Daily average solar radiation in unit
                             :math:`\\textrm{W}/\\textrm{m}^2`.
 
                             Dimensions of output are ``(lat.size, day.size, ecc.size)``
+                            with singleton dimensions removed.
+                            If ``out`` is given, it is returned.
     :rtype:                 array
 
 
@@ -104,6 +119,14 @@ def daily_insolation(lat, day, orb=const.orb_present, S0=None, day_type=1):
             # insolation values for past 5 Myears at 65N at summer solstice
             S65 = daily_insolation( 65, 172, orb )
 
+        To compute the same for all latitudes and days of the year
+        without holding all intermediate arrays in memory at once::
+
+            lat = np.linspace(-90, 90, 181)
+            days = np.arange(365.)
+            Q = np.zeros((lat.size, days.size, years.size))
+            daily_insolation(lat, days, orb, out=Q, chunk_size=100)
+
         For more information about computation of solar insolation see the
         :ref:`Tutorial` chapter.
 
@@ -112,51 +135,235 @@ def daily_insolation(lat, day, orb=const.orb_present, S0=None, day_type=1):
     # If input argument S0 is not given, use the standard Earth value
     if S0 is None:
         S0 = const.S0
+    lat, day, ecc, long_peri, obliquity = _insolation_arguments(lat, day, orb)
+    if day_type not in (1, 2):
+        raise ValueError('Invalid day_type.')
+    shape = (lat.size, day.size, ecc.size)
+    if out is None:
+        if chunk_size is None:
+            Fsw = _daily_insolation(lat, day, ecc, long_peri, obliquity, S0, day_type)
+            #  Remove singleton dimensions and return
+            return np.squeeze( Fsw )
+        Fsw = np.empty(shape)
+        result = Fsw
+    else:
+        if np.size(out) != np.prod(shape):
+            raise ValueError('out must have {} elements.'.format(np.prod(shape)))
+        Fsw = np.reshape(out, shape)
+        if not np.may_share_memory(Fsw, out):
+            raise ValueError('out must be a contiguous array.')
+        result = out
+    for orbits, block in daily_insolation_chunks(lat, day, orb, S0, day_type,
+                                                 chunk_size=chunk_size):
+        Fsw[:, :, orbits] = block
+    if out is None:
+        return np.squeeze( result )
+    return result
+
+
+def daily_insolation_chunks(lat, day, orb=const.orb_present, S0=None,
+                            day_type=1, chunk_size=None):
+    """Generator of daily average insolation over chunks of orbital parameters.
+
+    Arguments are as for :func:`daily_insolation`.
+    At each iteration, yields a tuple ``(orbits, Fsw)`` where ``orbits`` is a
+    slice into the orbital parameter arrays and ``Fsw`` is the insolation for
+    those orbital parameters with dimensions ``(lat.size, day.size, n)``.
+    Singleton dimensions are not removed.
+
+    Memory use is bounded by ``chunk_size``, so this can stream insolation
+    for long orbital time series (e.g. every kyear of
+    :class:`~climlab.solar.orbital.LongOrbitalTable`) to disk.
+
+    :Example:
+
+        ::
+
+            from climlab.solar.orbital import OrbitalTable
+            from climlab.solar.insolation import daily_insolation_chunks
+
+            orb = OrbitalTable().lookup_parameters(np.arange(-5000., 1.))
+            lat = np.linspace(-90., 90., 181)
+            days = np.arange(365.)
+            for orbits, Q in daily_insolation_chunks(lat, days, orb, chunk_size=500):
+                np.save('insolation_{}.npy'.format(orbits.start), Q)
+
+    """
+    if S0 is None:
+        S0 = const.S0
+    lat, day, ecc, long_peri, obliquity = _insolation_arguments(lat, day, orb)
+    if day_type not in (1, 2):
+        raise ValueError('Invalid day_type.')
+    if chunk_size is None:
+        chunk_size = max(ecc.size, 1)
+    for start in range(0, ecc.size, chunk_size):
+        orbits = slice(start, min(start + chunk_size, ecc.size))
+        yield orbits, _daily_insolation(lat, day, ecc[orbits], long_peri[orbits],
+                                        obliquity[orbits], S0, day_type)
+
+
+#  Gauss-Legendre nodes and weights by number of nodes
+_gauss_legendre = {}
+
+
+def annual_mean_insolation(lat, orb=const.orb_present, S0=None, tol=1E-4):
+    """Compute annual mean insolation given latitude and orbital parameters.
+
+    Time is changed to solar longitude :math:`\\lambda` as the variable of
+    integration. By Kepler's Second Law the time spent per unit solar longitude
+    is proportional to the square of the Earth-Sun distance, which cancels the
+    inverse square law, so that
+
+    .. math::
+
+        \\overline{Q} = \\frac{S_0}{2 \\pi^2 \\sqrt{1-e^2}}
+        \\int_0^{2\\pi} C(\\varphi, \\delta(\\lambda)) d\\lambda
+
+    where :math:`C` is the integral of the cosine of the solar zenith angle
+    from sunrise to sunset and :math:`\\sin \\delta = \\sin \\varepsilon \\sin \\lambda`.
+    Annual mean insolation does not depend on the longitude of perihelion.
+
+    The integral is computed with Gauss-Legendre quadrature over a quarter orbit
+    (the integrand is symmetric about the solstices and the hour angles for
+    :math:`\\pm\\delta` add up to :math:`\\pi`), splitting the interval where
+    polar day or night begins so that the integrand is smooth on each piece.
+    The number of nodes is doubled until successive estimates agree to within
+    ``tol``; usually 16 nodes per piece are enough. This is cheaper than
+    averaging :func:`daily_insolation` over all days of the year, and
+    much more accurate.
+
+    **Function-call arguments** \n
+
+    :param array lat:       Latitude in degrees (-90 to 90).
+    :param dict orb:        a dictionary with three members (as provided by
+                            :class:`~climlab.solar.orbital.OrbitalTable`).
+                            ``'long_peri'`` is not used.
+    :param float S0:        solar constant                                  \n
+                            - unit: :math:`\\textrm{W}/\\textrm{m}^2`       \n
+                            - default value: ``1365.2``
+    :param float tol:       absolute tolerance of the result in
+                            :math:`\\textrm{W}/\\textrm{m}^2` (default: ``1E-4``)
+    :returns:               Annual mean solar radiation in unit
+                            :math:`\\textrm{W}/\\textrm{m}^2`.
+
+                            Dimensions of output are ``(lat.size, ecc.size)``
+                            with singleton dimensions removed.
+    :rtype:                 array
+
+    :Example:
+
+        ::
+
+            lat = np.linspace(-90., 90., 181)
+            Qann = annual_mean_insolation(lat)
+
+    """
+    if S0 is None:
+        S0 = const.S0
+    #  the annual mean does not depend on the longitude of perihelion
+    lat = np.ravel( lat )
+    ecc = np.ravel( orb['ecc'] )
+    obliquity = np.ravel( orb['obliquity'] )
+    # dimensions (lat.size, nodes, ecc.size)
+    phi = np.deg2rad( lat )[:, np.newaxis, np.newaxis]
+    sin_obliquity = np.sin( np.deg2rad(obliquity) )
+    #  solar longitude where polar day / night begins (pi/2 if never)
+    with np.errstate(divide='ignore'):
+        lambda_kink = np.arcsin( np.minimum(1., np.cos(phi) / abs(sin_obliquity)) )
+    factor = S0 / np.pi**2 / np.sqrt(1. - ecc**2)
+
+    def quadrature(num):
+        if num not in _gauss_legendre:
+            _gauss_legendre[num] = np.polynomial.legendre.leggauss(num)
+        nodes, weights = _gauss_legendre[num]
+        nodes = nodes[:, np.newaxis]
+        weights = weights[:, np.newaxis]
+        #  integrate over 0 <= lambda <= pi/2 using the symmetries of C
+        total = 0.
+        for (a, b) in [(0., lambda_kink), (lambda_kink, np.pi / 2.)]:
+            half = 0.5 * (b - a)
+            lambda_long = half * nodes + 0.5 * (a + b)
+            delta = np.arcsin( sin_obliquity * np.sin( lambda_long ) )
+            #  C(phi, delta) + C(phi, -delta), using Ho(-delta) = pi - Ho(delta)
+            with np.errstate(invalid='ignore'):
+                Ho = np.where( abs( delta ) - np.pi / 2. + abs( phi ) < 0.,
+                              np.arccos( -np.tan( phi ) * np.tan( delta ) ),
+                        np.where( phi * delta > 0. , np.pi, 0. ) )
+            integrand = ((2.*Ho - np.pi)*np.sin(phi)*np.sin(delta) +
+                         2.*np.cos(phi)*np.cos(delta)*np.sin(Ho))
+            total = total + np.sum(half * weights * integrand, axis=1)
+        return factor * total
+
+    num = 8
+    Fsw = quadrature(num)
+    while True:
+        num *= 2
+        previous, Fsw = Fsw, quadrature(num)
+        if np.max(np.abs(Fsw - previous)) < tol or num >= 1024:
+            break
+    return np.squeeze( Fsw )
 
-    # Inputs can be scalar or vector. If scalar, convert to 0d numpy arrays
-    lat = np.array( lat )
-    day = np.array( day )
-    ecc = np.array( orb['ecc'] )
-    long_peri = np.array( orb['long_peri'] )
-    obliquity = np.array( orb['obliquity'] )
 
-    # Convert precession angle and latitude to radians
-    phi = np.deg2rad( lat )
+def _insolation_arguments(lat, day, orb):
+    """Flatten latitude, day and orbital parameters to 1D arrays."""
+    lat = np.ravel( lat )
+    day = np.ravel( day )
+    ecc = np.ravel( orb['ecc'] )
+    long_peri = np.ravel( orb['long_peri'] )
+    obliquity = np.ravel( orb['obliquity'] )
+    return lat, day, ecc, long_peri, obliquity
+
+
+def _daily_insolation(lat, day, ecc, long_peri, obliquity, S0, day_type):
+    """Daily average insolation with dimensions ``(lat.size, day.size, ecc.size)``
+    from 1D input arrays. Uses broadcasting, so only the output and a few
+    temporaries of the full size are allocated."""
+    delta, distance = _declination_distance(day, ecc, long_peri, obliquity, day_type)
+    # broadcast all the arrays to dimensions (lat.size, day.size, ecc.size)
+    phi = np.deg2rad( lat )[:, np.newaxis, np.newaxis]
+    delta = delta[np.newaxis, ...]
+    coszen = _coszen_integral(phi, delta)
+    # Compute insolation: Berger 1978 eq (10)
+    #  in place to avoid further full-size temporaries
+    Fsw = np.multiply(coszen, distance, out=coszen)
+    Fsw = np.multiply(S0/np.pi, Fsw, out=Fsw)
+    return Fsw
 
+
+def _declination_distance(day, ecc, long_peri, obliquity, day_type=1):
+    """Solar declination (radians) and Earth-Sun distance factor
+    with dimensions ``(day.size, ecc.size)`` from 1D input arrays."""
+    orb = {'ecc': ecc, 'long_peri': long_peri, 'obliquity': obliquity}
     # lambda_long (solar longitude) is the angular distance along Earth's orbit measured from spring equinox (21 March)
+    #  dimensions (day.size, ecc.size) or (day.size, 1)
     if day_type==1: # calendar days
         lambda_long = solar_longitude( day, orb )
-    elif day_type==2: #solar longitude (1-360) is specified in input, no need to convert days to longitude
-        lambda_long = np.tile( np.expand_dims( np.deg2rad( day ), axis=1 ), [1, ecc.size] )
-    else:
-        raise ValueError('Invalid day_type.')
+    else: #solar longitude (1-360) is specified in input, no need to convert days to longitude
+        lambda_long = np.deg2rad( day )[:, np.newaxis]
 
     # Compute declination angle of the sun
-    delta = np.array( np.arcsin( np.sin( np.deg2rad(obliquity) ) * np.sin( lambda_long ) ) )
+    delta = np.arcsin( np.sin( np.deg2rad(obliquity) ) * np.sin( lambda_long ) )
+    # Earth-Sun distance factor, Berger 1978 eq (10)
+    distance = ((1. + ecc*np.cos(lambda_long - np.deg2rad(long_peri)))**2
+                / (1. - ecc**2)**2)
+    return delta, distance
 
-    # recast all the arrays to dimensions (lat.size, day.size, ecc.size)
-    delta_big = np.tile( delta, [ lat.size, 1, 1 ] )
-    lambda_long_big = np.tile( lambda_long, [ lat.size, 1, 1 ] )
-    phi_day = np.tile( np.expand_dims( phi, axis=1 ), [1, day.size] )
-    phi_big = np.tile( np.expand_dims( phi_day, axis=2 ), [1, 1, ecc.size] )
 
+def _coszen_integral(phi, delta):
+    """Integral from sunrise to sunset of the cosine of the solar zenith angle
+    (with respect to hour angle) at latitude ``phi`` for solar declination
+    ``delta`` (both in radians). Arguments are broadcast against each other."""
     #  suppress warning message generated by arccos here!
-    oldsettings = np.seterr(invalid='ignore')
-    # Compute Ho, the hour angle at sunrise / sunset
-    #  Check for no sunrise or no sunset: Berger 1978 eqn (8),(9)
-    Ho = np.where( abs( delta_big ) - np.math.pi / 2. + abs( phi_big ) < 0.,
-                  np.arccos( -np.tan( phi_big ) * np.tan( delta_big ) ),
-            np.where( phi_big * delta_big > 0. , np.math.pi, 0. ) )
+    with np.errstate(invalid='ignore'):
+        # Compute Ho, the hour angle at sunrise / sunset
+        #  Check for no sunrise or no sunset: Berger 1978 eqn (8),(9)
+        Ho = np.where( abs( delta ) - np.pi / 2. + abs( phi ) < 0.,
+                      np.arccos( -np.tan( phi ) * np.tan( delta ) ),
+                np.where( phi * delta > 0. , np.pi, 0. ) )
     # this is not really the daily average cosine of the zenith angle...
     #  it's the integral from sunrise to sunset of that quantity...
-    coszen = (Ho*np.sin(phi_big)*np.sin(delta_big) +
-              np.cos(phi_big)*np.cos(delta_big)*np.sin(Ho))
-    # Compute insolation: Berger 1978 eq (10)
-    Fsw = S0/np.math.pi*( (1. + ecc*np.cos(lambda_long_big -
-          np.deg2rad(long_peri)))**2 / (1. - ecc**2)**2 * coszen)
-
-    #  Remove singleton dimensions and return
-    return np.squeeze( Fsw )
+    return (Ho*np.sin(phi)*np.sin(delta) +
+            np.cos(phi)*np.cos(delta)*np.sin(Ho))
 
 
 def solar_longitude( day, orb=const.orb_present, days_per_year = None ):
@@ -202,16 +409,16 @@ def solar_longitude( day, orb=const.orb_present, days_per_year = None ):
     if days_per_year is None:
         days_per_year = const.days_per_year
 
-    day = np.array(day)
-    ecc = np.array(orb['ecc'])
-    long_peri_rad = np.deg2rad( np.array(orb['long_peri']) )
-    delta_lambda_long_m = ( ( np.tile( np.expand_dims( day, axis=1 ), [1, ecc.size]) - 80. ) * 2. *
-        np.math.pi / days_per_year )
+    day = np.ravel(day)[:, np.newaxis]
+    ecc = np.ravel(orb['ecc'])
+    long_peri_rad = np.deg2rad( np.ravel(orb['long_peri']) )
+    delta_lambda_long_m = ( day - 80. ) * 2. * np.pi / days_per_year
     beta = ( 1 - ecc**2 )**(1./2.)
     lambda_long_m0 = ( -2. * ( (1./2. * ecc + 1./8. * ecc**3 ) * (1. + beta) * np.sin(-long_peri_rad) -
         1./4.* (ecc**2) * ( 1./2. + beta ) * np.sin( -2. * long_peri_rad ) + 1./8. * (ecc**3) *
         (1./3. + beta) * ( np.sin(-3. * long_peri_rad) ) ) )
-    lambda_long_m = np.tile( lambda_long_m0, [day.size, 1] ) + delta_lambda_long_m
+    #  broadcast to dimensions (day.size, ecc.size)
+    lambda_long_m = lambda_long_m0 + delta_lambda_long_m
     lambda_long = ( lambda_long_m + ( 2*ecc - 1/4. * (ecc**3)) * np.sin(lambda_long_m - long_peri_rad) +
         (5./4.) * (ecc**2) * np.sin(2 * ( lambda_long_m - long_peri_rad )) + (13./12.) * (ecc**3)
         * np.sin(3*( lambda_long_m - long_peri_rad )) )
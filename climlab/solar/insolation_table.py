@@ -0,0 +1,169 @@
+"""This module defines the class :class:`InsolationTable` which computes
+daily average insolation for many different sets of orbital parameters
+on a fixed grid of latitudes and days, much faster than repeated calls to
+:func:`~climlab.solar.insolation.daily_insolation`.
+
+Daily average insolation (:cite:`Berger_1978` eq (10)) factors as
+
+.. math::
+
+    Q = \\frac{S_0}{\\pi} \\rho(\\lambda; e, \\varpi) \\, C(\\varphi, \\delta)
+
+where :math:`\\rho` is the Earth-Sun distance factor, which depends only on
+solar longitude :math:`\\lambda`, eccentricity :math:`e` and longitude of
+perihelion :math:`\\varpi`, and :math:`C` is the integral of the cosine
+of the solar zenith angle from sunrise to sunset, which depends only on
+latitude :math:`\\varphi` and solar declination :math:`\\delta`.
+All the expensive trigonometry (sunrise and sunset hour angles) is in
+:math:`C`, so it is tabulated once on a fine grid of declination for every
+latitude. Computing insolation for a new orbit then only needs
+:math:`\\lambda`, :math:`\\delta` and :math:`\\rho` for each day,
+and a linear interpolation in the table.
+
+**Accuracy** \n
+
+The only approximation is the linear interpolation of :math:`C` in
+declination. Where :math:`C` is smooth, its error is largest very close to
+midway between table points. :math:`C` is not smooth where polar day or
+night begins (:math:`|\\delta| = 90^{\\circ} - |\\varphi|`), and
+near these declinations the error can be larger. On creation, the table
+evaluates :math:`C` exactly at all midpoints, and on a fine grid (and
+exactly at the polar day and night declinations) in the intervals that
+contain them. The largest error found is stored as
+:attr:`InsolationTable.max_error`. The error in insolation is then at
+most about ``max_error`` times the largest distance factor
+:math:`(1+e)^2/(1-e^2)^2` (less than 1.13 for all eccentricities of the
+past 50 Myears). This is an accurate estimate, but not a strict bound.
+With the default resolution of 0.02 degrees in declination
+``max_error`` is about 0.003 W/m2.
+
+"""
+from __future__ import division
+import numpy as np
+from climlab import constants as const
+from climlab.solar.insolation import (_insolation_arguments,
+                                      _declination_distance, _coszen_integral)
+
+
+class InsolationTable(object):
+    """Tabulated daily average insolation for a fixed grid of
+    latitudes and days.
+
+    **Initialization parameters** \n
+
+    :param array lat:           Latitude in degrees (-90 to 90).
+    :param array day:           Indicator of time of year. See argument
+                                ``day_type`` of
+                                :func:`~climlab.solar.insolation.daily_insolation`
+                                for details about the format.
+    :param float S0:            solar constant                      \n
+                                - unit: :math:`\\textrm{W}/\\textrm{m}^2`       \n
+                                - default value: ``1365.2``
+    :param int day_type:        Convention for specifying time of year (+/- 1,2) [optional].
+                                As for :func:`~climlab.solar.insolation.daily_insolation`.
+    :param float max_obliquity: largest obliquity (degrees) that can be looked up
+                                (default: 30.)
+    :param float resolution:    spacing of the declination grid (degrees)
+                                (default: 0.02)
+
+    **Object attributes** \n
+
+    :ivar array lat:            latitude of the table (degrees)
+    :ivar array day:            time of year of the table
+    :ivar float S0:             solar constant
+    :ivar float max_error:      estimated largest error of the interpolated values of
+                                :math:`S_0 C / \\pi` (see module documentation)
+                                (*unit:* :math:`\\textrm{W}/\\textrm{m}^2`)
+
+    :Example:
+
+        ::
+
+            import numpy as np
+            from climlab.solar.orbital import OrbitalTable
+            from climlab.solar.insolation_table import InsolationTable
+
+            lat = np.linspace(-90., 90., 181)
+            days = np.arange(365.)
+            table = InsolationTable(lat, days)
+            orbtable = OrbitalTable.instance()
+            for kyear in np.arange(-500., 1.):
+                Q = table(orbtable.lookup_parameters(kyear))
+
+    """
+    def __init__(self, lat, day, S0=const.S0, day_type=1,
+                 max_obliquity=30., resolution=0.02):
+        if day_type not in (1, 2):
+            raise ValueError('Invalid day_type.')
+        self.lat = np.ravel(lat)
+        self.day = np.ravel(day)
+        self.S0 = S0
+        self.day_type = day_type
+        self.max_obliquity = max_obliquity
+        num = int(np.ceil(2. * max_obliquity / resolution)) + 1
+        self._delta = np.deg2rad(np.linspace(-max_obliquity, max_obliquity, num))
+        self._ddelta = self._delta[1] - self._delta[0]
+        phi = np.deg2rad(self.lat)[np.newaxis, :]
+        #  table of C(phi, delta) and its increments, dimensions (num, lat.size)
+        #  so that the lookup gathers contiguous rows
+        table = _coszen_integral(phi, self._delta[:, np.newaxis])
+        self._table = table[:-1]
+        self._increment = np.diff(table, axis=0)
+        #  interpolation error is largest midway between table points
+        #  where C is smooth
+        midpoints = 0.5 * (self._delta[1:] + self._delta[:-1])
+        exact = _coszen_integral(phi, midpoints[:, np.newaxis])
+        interpolated = self._table + 0.5 * self._increment
+        error = np.max(np.abs(interpolated - exact))
+        #  C is not smooth where polar day or night begins,
+        #  check the intervals that contain these declinations on a fine grid
+        column = np.arange(self.lat.size)
+        for kink in [np.abs(phi) - np.pi / 2., np.pi / 2. - np.abs(phi)]:
+            index = np.floor((kink - self._delta[0]) / self._ddelta).astype(int)
+            inside = (index >= 0) & (index < num - 1)
+            index = np.clip(index, 0, num - 2)
+            delta = np.concatenate([self._delta[index] +
+                                    np.linspace(0., 1., 65)[:, np.newaxis] * self._ddelta,
+                                    kink])
+            exact = _coszen_integral(phi, delta)
+            interpolated = (self._table[index, column] + self._increment[index, column] *
+                            (delta - self._delta[index]) / self._ddelta)
+            error = max(error, np.max(np.where(inside, np.abs(interpolated - exact), 0.)))
+        self.max_error = S0 / np.pi * error
+
+    def __call__(self, orb=const.orb_present, S0=None):
+        """Daily average insolation for given orbital parameters.
+
+        :param dict orb:    a dictionary with three orbital parameters
+                            (as for :func:`~climlab.solar.insolation.daily_insolation`)
+        :param float S0:    solar constant (default: ``self.S0``)
+        :raises: :exc:`ValueError`
+                            if the obliquity is larger than ``max_obliquity``
+        :returns:           Daily average solar radiation in unit
+                            :math:`\\textrm{W}/\\textrm{m}^2`.
+
+                            Dimensions of output are ``(lat.size, day.size, ecc.size)``
+                            with singleton dimensions removed.
+        :rtype:             array
+
+        """
+        if S0 is None:
+            S0 = self.S0
+        lat, day, ecc, long_peri, obliquity = _insolation_arguments(self.lat,
+                                                                    self.day, orb)
+        if np.any(np.abs(obliquity) > self.max_obliquity):
+            raise ValueError('Obliquity must not exceed {} degrees.'.format(
+                             self.max_obliquity))
+        #  dimensions (day.size, ecc.size)
+        delta, distance = _declination_distance(day, ecc, long_peri, obliquity,
+                                                self.day_type)
+        #  linear interpolation in declination
+        position = (delta - self._delta[0]) / self._ddelta
+        index = np.clip(np.floor(position).astype(int), 0, self._delta.size - 2)
+        weight = (position - index)[..., np.newaxis]
+        #  dimensions (day.size, ecc.size, lat.size) -> (lat.size, day.size, ecc.size)
+        coszen = self._table[index] + self._increment[index] * weight
+        coszen = np.moveaxis(coszen, -1, 0)
+        Fsw = np.multiply(coszen, distance, out=coszen)
+        Fsw = np.multiply(S0/np.pi, Fsw, out=Fsw)
+        return np.squeeze(Fsw)
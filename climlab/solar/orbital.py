@@ -15,13 +15,24 @@ A subclass :class:`LongOrbitalTable()` works with La2004 orbital data for
 -51 to +21 Myears as calculated by :cite:`Laskar_2004`.
 See http://vo.imcce.fr/insola/earth/online/earth/La2004/README.TXT
 
+The text data are parsed only once per table instance. If a cache directory
+:data:`cache_dir` is set (by the environment variable ``CLIMLAB_CACHE_DIR``,
+or by assigning ``climlab.solar.orbital.cache_dir``), the parsed table is also
+stored there as a binary ``.npy`` file and memory-mapped on subsequent loads,
+also by other processes. By default there is no disk cache and nothing is
+written to disk.
+If :data:`offline` is ``True`` (environment variable ``CLIMLAB_OFFLINE``),
+no attempt is made to download data that are not available locally.
+
+Since the tables never change, a single instance of each table class can be
+shared across the whole process with :func:`OrbitalTable.instance()`.
+
 """
 from __future__ import division, print_function
 from future import standard_library
 standard_library.install_aliases()
-from builtins import zip, range, object
+from builtins import object
 import numpy as np
-from scipy import interpolate
 import os
 try:
     # This should work in Python 3.x
@@ -30,9 +41,16 @@ except:
     # Fallback for Python 2.7
     from urllib2 import urlopen
 
+#  Directory for binary caches of the orbital data tables (None: no disk cache)
+cache_dir = os.environ.get('CLIMLAB_CACHE_DIR') or None
+#  If True, never try to access orbital data remotely
+offline = os.environ.get('CLIMLAB_OFFLINE', '0').lower() not in ('', '0', 'false', 'no')
+#  Shared instances of the table classes, see OrbitalTable.instance()
+_instances = {}
+
 class OrbitalTable(object):
     """Invoking OrbitalTable() will load 5 million years of orbital data
-    from :cite:`Berger_1991` and compute linear interpolants.
+    from :cite:`Berger_1991` and prepare it for linear interpolation.
 
     The data can be accessed through the method :func:`lookup_parameters()`.
 
@@ -57,11 +75,28 @@ class OrbitalTable(object):
         self.obliquity = None
         #  call a method that reads data from a file and populates the arrays
         self._get_data()
-        self._compute_interpolants()
-        # find and store min and max years. lookup_parameters should throw an exception
-        # if you ask for something outside this range -- not yet implemented.
+        # find and store min and max years. lookup_parameters throws an exception
+        # if you ask for something outside this range.
         self.kyear_max = np.max(self.kyear)
         self.kyear_min = np.min(self.kyear)
+        self._compute_interpolants()
+
+    @classmethod
+    def instance(cls):
+        """Return an instance of this table class that is shared across
+        the process. The data are loaded on the first call only.
+
+        :Example:
+
+            ::
+
+                from climlab.solar.orbital import OrbitalTable
+                orb = OrbitalTable.instance().lookup_parameters(-21.)
+
+        """
+        if cls not in _instances:
+            _instances[cls] = cls()
+        return _instances[cls]
 
     def lookup_parameters( self, kyear = 0 ):
         """Look up orbital parameters for given kyear measured from present.
@@ -77,6 +112,9 @@ class OrbitalTable(object):
                                 Will handle scalar or vector input (for multiple years).
                                 [default: 0]
 
+        :raises: :exc:`ValueError`
+                                if any ``kyear`` is not finite or outside the range
+                                of the table (``kyear_min`` to ``kyear_max``)
         :returns:               a three-member dictionary of orbital parameters:
 
                                     * ``'ecc'``: eccentricity (dimensionless)
@@ -88,35 +126,107 @@ class OrbitalTable(object):
         :rtype:                 dict
 
         """
+        kyear = np.asarray(kyear, dtype=float)
+        if not np.all(np.isfinite(kyear)):
+            raise ValueError('kyear must be finite.')
+        if (kyear < self.kyear_min).any() or (kyear > self.kyear_max).any():
+            raise ValueError('kyear must be between {} and {}.'.format(
+                             self.kyear_min, self.kyear_max))
         #  linear interpolation:
-        this_ecc = self.f_ecc(kyear)
-        this_obliquity = self.f_obliquity(kyear)
-        this_long_peri = self.f_long_peri(kyear)
+        #  index of the table entry just below each kyear and the weight of the next one
+        if self._dkyear is None:
+            index = np.searchsorted(self._kyear, kyear, side='right') - 1
+            index = np.minimum(index, self._kyear.size - 2)
+            weight = ((kyear - self._kyear[index]) /
+                      (self._kyear[index+1] - self._kyear[index]))
+        else:
+            #  uniform grid: direct index arithmetic
+            position = (kyear - self._kyear[0]) / self._dkyear
+            #  (position >= 0 after the bounds check; the last point is kyear_max)
+            index = np.minimum(np.floor(position).astype(int), self._kyear.size - 2)
+            weight = position - index
+        weight = weight[..., np.newaxis]
+        values = self._values[index] * (1. - weight) + self._values[index+1] * weight
+        this_ecc = values[..., 0]
+        this_long_peri = values[..., 1]
+        this_obliquity = values[..., 2]
         #  convert long_peri to an angle (in degrees) between 0 and 360
         long_peri_converted = this_long_peri % 360.
         # Build a dictionary of all the parameters
         orb = {'ecc':this_ecc, 'long_peri':long_peri_converted, 'obliquity':this_obliquity}
         return orb
 
+    #  Name of the binary cache file in cache_dir
+    _cache_file = 'orbit91.npy'
+
     def _get_data(self):
+        """Populate the data arrays from the binary cache if possible,
+        otherwise from the text data (and then write the cache)."""
+        data = self._read_cache()
+        if data is None:
+            data = self._read_data()
+            self._write_cache(data)
+        (self.kyear, self.ecc, self.long_peri, self.obliquity) = data
+
+    def _source_files(self):
+        """Local text files the cache is derived from."""
+        return [os.path.join(os.path.dirname(__file__), 'orbit91')]
+
+    def _cache_path(self):
+        if cache_dir is None:
+            return None
+        return os.path.join(cache_dir, self._cache_file)
+
+    def _read_cache(self):
+        """Memory-map the cached table with rows ``kyear, ecc, long_peri, obliquity``.
+        Returns ``None`` if there is no valid cache."""
+        path = self._cache_path()
+        if path is None:
+            return None
+        try:
+            mtime = os.path.getmtime(path)
+            #  rebuild if any local source file is newer than the cache
+            for source in self._source_files():
+                if os.path.exists(source) and os.path.getmtime(source) > mtime:
+                    return None
+            data = np.load(path, mmap_mode='r')
+        except (IOError, OSError, ValueError):
+            return None
+        if data.ndim != 2 or data.shape[0] != 4:
+            return None
+        return data
+
+    def _write_cache(self, data):
+        """Store the table in cache_dir, if set. Failure to write is not an error."""
+        path = self._cache_path()
+        if path is None:
+            return
+        tmppath = path + '.{}.tmp'.format(os.getpid())
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            with open(tmppath, 'wb') as f:
+                np.save(f, np.asarray(data, dtype=float))
+            #  atomic, so concurrent processes never see a partial file
+            os.rename(tmppath, path)
+        except (IOError, OSError):
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+    def _read_data(self):
+        """Parse the Berger and Loutre (1991) text file.
+        Returns an array with rows ``kyear, ecc, long_peri, obliquity``."""
         past_file = 'orbit91'
         base_url = 'ftp://ftp.ncdc.noaa.gov/pub/data/paleo/insolation/'
-        #  This gives the full path to the data file, assuming it's in the same directory
-        local_path = os.path.dirname(__file__)
-        fullfilename = os.path.join(local_path, past_file)
-
-        num_lines_past = 5001
-        self.kyear = np.empty(num_lines_past)
-        self.ecc = np.empty_like(self.kyear)
-        self.long_peri = np.empty_like(self.kyear)
-        self.obliquity = np.empty_like(self.kyear)
-
         #  This gives the full path to the data file, assuming it's in the same directory
         fullfilename = os.path.join(os.path.dirname(__file__), past_file)
         try:
             record = open(fullfilename,'r')
             print('Loading Berger and Loutre (1991) orbital parameter data from file ' + fullfilename)
         except:
+            if offline:
+                raise IOError('Orbital data file ' + fullfilename +
+                              ' not found and remote access is disabled (offline mode).')
             print('Failed to load orbital locally, trying to access it via remote ftp.')
             try:
                 record = urlopen( base_url + past_file )
@@ -124,30 +234,28 @@ class OrbitalTable(object):
                 print('Reading file ' + past_file)
             except:
                 raise Exception('Failed to load the data via remote ftp.')
-
-        #  loop through each line of the file, read it into numpy array
         #  skip first three lines of header
-        toskip = 3
-        for i in range(toskip):
-            record.readline()
-        for index,line in enumerate(record):
-            str1 = line.rstrip()  # remove newline character
-            thisdata = np.fromstring(str1, sep=' ')
-            # ignore after the 4th column
-            self.kyear[index] = thisdata[0]
-            self.ecc[index] = thisdata[1]
-            self.long_peri[index] = thisdata[2]
-            self.obliquity[index] = thisdata[3]
+        data = _parse_table(record, skip=3)
         record.close()
+        # ignore after the 4th column
+        return data[:, :4].T
 
     def _compute_interpolants(self):
         # add 180 degrees to long_peri (see lambda definition, Berger 1978 Appendix)
         long_peri0rad = np.deg2rad(self.long_peri + 180.)
         long_peri0 = np.rad2deg( np.unwrap( long_peri0rad ) ) # remove discontinuities (360 degree jumps)
-        #  calculate linear interpolants
-        self.f_ecc = interpolate.interp1d(self.kyear, self.ecc)
-        self.f_long_peri = interpolate.interp1d(self.kyear, long_peri0)
-        self.f_obliquity = interpolate.interp1d(self.kyear, self.obliquity)
+        #  sort the table by increasing kyear
+        order = np.argsort(self.kyear, kind='mergesort')
+        self._kyear = np.array(self.kyear[order])
+        #  table of values to interpolate, dimensions (kyear.size, 3)
+        self._values = np.column_stack((self.ecc[order], long_peri0[order],
+                                        self.obliquity[order]))
+        #  grid spacing if the table is uniformly spaced in time, otherwise None
+        spacing = np.diff(self._kyear)
+        if np.allclose(spacing, spacing[0]):
+            self._dkyear = (self._kyear[-1] - self._kyear[0]) / (self._kyear.size - 1)
+        else:
+            self._dkyear = None
 
 
 class LongOrbitalTable(OrbitalTable):
@@ -158,38 +266,55 @@ class LongOrbitalTable(OrbitalTable):
 
     Usage is identical to parent class :class:`OrbitalTable()`.
 
+    If :data:`cache_dir` is set, the data are downloaded only once
+    and then read from the binary cache there.
+
     """
-    def _get_data(self):
+    _cache_file = 'La2004.npy'
+
+    def _source_files(self):
+        return []
+
+    def _read_data(self):
         base_url = 'http://vo.imcce.fr/insola/earth/online/earth/La2004/'
         past_file = 'INSOLN.LA2004.BTL.ASC'
         future_file = 'INSOLP.LA2004.BTL.ASC'
 
-        num_lines_past = 51001
-        num_lines_future = 21001
-        num_columns = 4
-        data_past = np.empty((num_lines_past,num_columns))
-        data_future = np.empty((num_lines_future, num_columns))
-
+        if offline:
+            raise IOError('La2004 orbital data not found in cache directory ' +
+                          str(cache_dir) + ' and remote access is disabled (offline mode).')
         print('Attempting to access La2004 orbital data from ' + base_url)
-        #  loop through each line of the file, read it into numpy array
-        for (data,filename) in zip((data_past,data_future),
-                            (past_file,future_file)):
+        tables = []
+        for filename in (past_file, future_file):
             print('Reading file ' + filename)
             record = urlopen( base_url + filename )
-            for index,line in enumerate(record):
-                str1 = line.rstrip()  # remove newline character
-                try:
-                    str2 = str1.replace('D','E')  # put string into numpy format
-                except:
-                    #  in Python 3 we need to convert from bytes object first
-                    str2 = (str(str1,'utf-8')).replace('D','E')
-                data[index,:] = np.fromstring(str2, sep=' ')
+            tables.append(_parse_table(record, exponent='D'))
             record.close()
+        (data_past, data_future) = tables
         #  need to flip it so the data runs from past to present
         data_past = np.flipud(data_past)
         # and expunge the first line of the future data because it repeats year 0
         data = np.concatenate((data_past,data_future[1:,:]), axis=0)
-        self.kyear = data[:,0]
-        self.ecc = data[:,1]
-        self.obliquity = np.rad2deg(data[:,2])
-        self.long_peri = np.rad2deg(data[:,3])
+        return np.array([data[:,0], data[:,1],
+                         np.rad2deg(data[:,3]), np.rad2deg(data[:,2])])
+
+
+def _parse_table(record, skip=0, exponent=None):
+    """Read a whitespace-delimited numeric table from an open file or url
+    in one pass. Returns a 2D array with one row per line.
+
+    :param int skip:        number of header lines to skip
+    :param str exponent:    character used for the exponent instead of
+                            ``'E'`` (e.g. ``'D'`` for Fortran output)
+    """
+    text = record.read()
+    if not isinstance(text, str):
+        #  in Python 3 we need to convert from bytes object first
+        text = text.decode('utf-8')
+    lines = text.splitlines()[skip:]
+    lines = [line for line in lines if line.strip()]
+    text = ' '.join(lines)
+    if exponent is not None:
+        text = text.replace(exponent, 'E')
+    values = np.array(text.split(), dtype=float)
+    return values.reshape(len(lines), -1)
@@ -3,8 +3,10 @@ from __future__ import print_function
 from builtins import str
 from builtins import range
 from builtins import object
+import os
 import numpy as np
 from climlab import constants as const
+from climlab.utils import walk
 from climlab.solar.orbital import OrbitalTable
 from climlab.domain.field import global_mean
 
@@ -16,7 +18,14 @@ class OrbitalCycles(object):
                  kyear_stop=0.,
                  segment_length_years=100.,
                  orbital_year_factor=1.,
-                 verbose=True ):
+                 verbose=True,
+                 output=None,
+                 checkpoint=None,
+                 integrate=True,
+                 adaptive=False,
+                 tolerance=0.01,
+                 min_years=2.,
+                 extrapolate=False):
         """Automatically integrates a process through changes in orbital parameters.
 
         OrbitalCycles is a module for setting up long integrations of climlab
@@ -67,6 +76,43 @@ class OrbitalCycles(object):
         :param bool verbose:                prints product of calculation and
                                             information about computation progress
                                             [default: True]
+        :param str output:                  where to write the results of each segment
+                                            as soon as it is completed [optional].
+                                            A filename ending in ``.nc`` is a netCDF
+                                            file with an unlimited ``segment``
+                                            dimension (requires netCDF4). Anything else
+                                            is a directory with one ``.npz`` file per
+                                            segment. Results of a previous run are
+                                            overwritten, unless the integration
+                                            resumes from ``checkpoint``.
+                                            [default: None]
+        :param str checkpoint:              ``.npz`` file where the model state and
+                                            the progress of the integration are saved
+                                            after every segment [optional].
+                                            If the file exists, the integration
+                                            resumes from the saved segment.
+                                            [default: None]
+        :param bool integrate:              if ``True``, the whole integration is
+                                            done during initialization. Otherwise
+                                            call :func:`run()`. [default: True]
+        :param bool adaptive:               if ``True``, each segment is integrated
+                                            one year at a time only until the
+                                            annual mean ``Ts`` changes by less than
+                                            ``tolerance`` everywhere from one year
+                                            to the next, but for at least
+                                            ``min_years`` and at most
+                                            ``segment_length_years`` years.
+                                            Orbital time still advances by the full
+                                            segment. [default: False]
+        :param float tolerance:             convergence criterion for adaptive
+                                            segments (*unit:* K) [default: 0.01]
+        :param float min_years:             minimum length of adaptive segments
+                                            (*unit:* years) [default: 2.]
+        :param bool extrapolate:            if ``True``, at the start of each segment
+                                            ``Ts`` is shifted by the change in annual
+                                            mean ``Ts`` over the previous segment,
+                                            a linear extrapolation of the
+                                            equilibrium response. [default: False]
 
         **Object attributes** \n
 
@@ -96,6 +142,9 @@ class OrbitalCycles(object):
                                             dimension: (size(Ts), num_segments)
         :ivar array orb_kyear:              integration start time of all segments
         :ivar dict orb:                     orbital parameters for last integrated segment
+        :ivar int segment:                  number of segments completed so far
+        :ivar array segment_years:          number of model years integrated
+                                            in each segment
 
         :Example:
 
@@ -117,6 +166,15 @@ class OrbitalCycles(object):
                 experiment = OrbitalCycles(ebm, kyear_start=-20, kyear_stop=-10,
                                                         orbital_year_factor=10.)
 
+            A long integration that saves its results as it goes and can be
+            restarted (with a freshly created model) if it is interrupted::
+
+                experiment = OrbitalCycles(ebm, kyear_start=-500, kyear_stop=0,
+                                           output='orbital_run.nc',
+                                           checkpoint='orbital_run_checkpoint.npz',
+                                           integrate=False)
+                experiment.run()
+
         """
         self.model = model
         self.kyear_start = kyear_start
@@ -126,28 +184,62 @@ class OrbitalCycles(object):
         self.verbose = verbose
         self.num_segments = int(-(kyear_start - kyear_stop) * 1000. /
                                 segment_length_years / orbital_year_factor)
-
-        kyear_before_present = kyear_start
-
-        if verbose:
-            print("---------  OrbitalCycles  START ----------")
-            print("Beginning integration for the model from " + str(kyear_start) + " to " +
-                str(kyear_stop) + " kyears before present.")
-            print("Integration time for each set of orbital parameters is " +
-                str(segment_length_years) + " years.")
-            print("Orbital cycles will be sped up by a factor " + str(orbital_year_factor))
-            print("Total number of segments is " + str(self.num_segments))
+        self.output = output
+        self.checkpoint = checkpoint
+        self.adaptive = adaptive
+        self.tolerance = tolerance
+        self.min_years = min_years
+        self.extrapolate = extrapolate
 
         # initialize storage arrays
         self.T_segments_global = np.empty( self.num_segments )
         self.T_segments = np.empty( (self.model.Ts.size, self.num_segments) )
         self.T_segments_annual = np.empty_like( self.T_segments )
         self.orb_kyear = np.empty( self.num_segments )
+        self.segment_years = np.zeros( self.num_segments )
+        self.segment = 0
+        #  existing output is only added to when resuming from a checkpoint
+        self._append_output = False
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            self._read_checkpoint()
+        if integrate:
+            self.run()
+
+    def _segment_kyear(self, n):
+        """Orbital time (kyears) at the start of segment ``n``."""
+        return (self.kyear_start +
+                n * self.segment_length_years / 1000. * self.orbital_year_factor)
+
+    def run(self, num_segments=None):
+        """Integrate the model through the remaining segments.
+
+        Results of each segment are stored in the object's storage arrays,
+        written to ``output`` and checkpointed as soon as it is completed.
+
+        :param int num_segments:    integrate at most this many segments
+                                    (default: all remaining segments)
+
+        """
+        verbose = self.verbose
+        stop = self.num_segments
+        if num_segments is not None:
+            stop = min(stop, self.segment + num_segments)
+        if verbose and self.segment < stop:
+            print("---------  OrbitalCycles  START ----------")
+            print("Beginning integration for the model from " +
+                str(self._segment_kyear(self.segment)) + " to " +
+                str(self.kyear_stop) + " kyears before present.")
+            print("Integration time for each set of orbital parameters is " +
+                str(self.segment_length_years) + " years.")
+            print("Orbital cycles will be sped up by a factor " + str(self.orbital_year_factor))
+            print("Total number of segments is " + str(self.num_segments))
 
         # Get orbital data table
-        orbtable = OrbitalTable()
+        orbtable = OrbitalTable.instance()
 
-        for n in range(self.num_segments):
+        for n in range(self.segment, stop):
+            kyear_before_present = self._segment_kyear(n)
             if verbose:
                 print("-------------------------")
                 print("Segment " + str(n) + " out of " + str(self.num_segments) )
@@ -155,16 +247,144 @@ class OrbitalCycles(object):
             self.orb = orbtable.lookup_parameters(kyear_before_present)
             #self.model.make_insolation_array( orb )
             self.model.subprocess['insolation'].orb = self.orb
-            self.model.integrate_years(segment_length_years-1., verbose=False)
-            #  Run one final year to characterize the current equilibrated state
-            self.model.integrate_years(1.0, verbose=False)
+            if self.extrapolate and n >= 2:
+                #  expect the same change in equilibrium as over the last segment
+                change = self.T_segments_annual[:, n-1] - self.T_segments_annual[:, n-2]
+                self.model.Ts += np.reshape(change, self.model.Ts.shape)
+            if self.adaptive:
+                self.segment_years[n] = self._integrate_adaptive()
+            else:
+                self.model.integrate_years(self.segment_length_years-1., verbose=False)
+                #  Run one final year to characterize the current equilibrated state
+                self.model.integrate_years(1.0, verbose=False)
+                self.segment_years[n] = self.segment_length_years
             self.T_segments_annual[:, n] = np.squeeze(self.model.timeave['Ts'])
             self.T_segments[:, n] = np.squeeze(self.model.Ts)
             self.T_segments_global[n] = global_mean(self.model.timeave['Ts'])
             self.orb_kyear[n] = kyear_before_present
-            kyear_before_present += segment_length_years / 1000. * orbital_year_factor
+            self.segment = n + 1
+            if self.output is not None:
+                self._write_segment(n)
+            if self.checkpoint is not None:
+                self._write_checkpoint()
             if verbose:
+                if self.adaptive:
+                    print( "Integrated for " + str(self.segment_years[n]) + " years." )
                 print( "Global mean temperature from the final year of integration is " +
                     str(self.T_segments_global[n]) + " degrees C." )
-        if verbose:
+        if verbose and self.segment == self.num_segments:
             print("---------  OrbitalCycles  END ----------")
+
+    def _integrate_adaptive(self):
+        """Integrate one year at a time until annual mean ``Ts`` has converged.
+        Returns the number of years integrated."""
+        years = 0
+        previous = None
+        while years < self.segment_length_years:
+            self.model.integrate_years(1.0, verbose=False)
+            years += 1
+            current = np.array(self.model.timeave['Ts'])
+            if (previous is not None and years >= self.min_years and
+                    np.max(np.abs(current - previous)) < self.tolerance):
+                break
+            previous = current
+        return years
+
+    def _segment_results(self, n):
+        """Dictionary of the results of segment ``n``."""
+        return {'kyear': self.orb_kyear[n],
+                'ecc': np.squeeze(self.orb['ecc']),
+                'long_peri': np.squeeze(self.orb['long_peri']),
+                'obliquity': np.squeeze(self.orb['obliquity']),
+                'T_global': self.T_segments_global[n],
+                'T': self.T_segments[:, n],
+                'T_annual': self.T_segments_annual[:, n],
+                'years': self.segment_years[n]}
+
+    def _write_segment(self, n):
+        """Write the results of segment ``n`` to ``self.output``."""
+        results = self._segment_results(n)
+        append = self._append_output
+        self._append_output = True
+        if self.output.endswith('.nc'):
+            import netCDF4 as nc
+            if append and os.path.exists(self.output):
+                dataset = nc.Dataset(self.output, 'a')
+            else:
+                #  a new run overwrites the results of any previous run
+                dataset = nc.Dataset(self.output, 'w')
+                dataset.createDimension('segment', None)
+                dataset.createDimension('point', self.model.Ts.size)
+                for name, value in results.items():
+                    if np.ndim(value) == 0:
+                        dataset.createVariable(name, 'f8', ('segment',))
+                    else:
+                        dataset.createVariable(name, 'f8', ('segment', 'point'))
+            for name, value in results.items():
+                dataset.variables[name][n] = value
+            dataset.close()
+        else:
+            if not os.path.isdir(self.output):
+                os.makedirs(self.output)
+            elif not append:
+                #  a new run removes the segments of any previous run
+                for name in os.listdir(self.output):
+                    if name.startswith('segment_') and name.endswith('.npz'):
+                        os.remove(os.path.join(self.output, name))
+            filename = os.path.join(self.output, 'segment_{:05d}.npz'.format(n))
+            np.savez(filename, **results)
+
+    def _write_checkpoint(self):
+        """Save model state, model time and results so far to ``self.checkpoint``."""
+        data = {'segment': self.segment,
+                'setup': self._setup(),
+                'T_segments_global': self.T_segments_global,
+                'T_segments': self.T_segments,
+                'T_segments_annual': self.T_segments_annual,
+                'orb_kyear': self.orb_kyear,
+                'segment_years': self.segment_years}
+        for name, value in self.model.state.items():
+            data['state_' + name] = value
+        for i, (name, proc, level) in enumerate(walk.walk_processes(self.model, ignoreFlag=True)):
+            for key in _time_counters:
+                data['time{}_{}'.format(i, key)] = proc.time[key]
+        #  write to a temporary file first so an interruption never
+        #  leaves a corrupted checkpoint
+        tmpname = self.checkpoint + '.tmp.npz'
+        np.savez(tmpname, **data)
+        os.rename(tmpname, self.checkpoint)
+
+    def _read_checkpoint(self):
+        """Restore model state, model time and results from ``self.checkpoint``."""
+        with np.load(self.checkpoint) as data:
+            setup = self._setup()
+            if (data['setup'].shape != setup.shape or
+                    not np.allclose(data['setup'], setup)):
+                raise ValueError('Checkpoint ' + self.checkpoint +
+                                 ' was written for a different OrbitalCycles setup.')
+            self.segment = int(data['segment'])
+            self.T_segments_global[:] = data['T_segments_global']
+            self.T_segments[:] = data['T_segments']
+            self.T_segments_annual[:] = data['T_segments_annual']
+            self.orb_kyear[:] = data['orb_kyear']
+            self.segment_years[:] = data['segment_years']
+            for name, value in self.model.state.items():
+                value[:] = data['state_' + name]
+            for i, (name, proc, level) in enumerate(walk.walk_processes(self.model, ignoreFlag=True)):
+                for key in _time_counters:
+                    proc.time[key] = data['time{}_{}'.format(i, key)].item()
+        self._append_output = True
+        if self.verbose:
+            print('Resuming from checkpoint ' + self.checkpoint + ' after segment ' +
+                  str(self.segment) + ' out of ' + str(self.num_segments))
+
+    def _setup(self):
+        """Parameters that a checkpoint must match."""
+        return np.array([self.kyear_start, self.kyear_stop, self.segment_length_years,
+                         self.orbital_year_factor, self.num_segments, self.model.Ts.size,
+                         self.adaptive, self.tolerance, self.min_years, self.extrapolate],
+                        dtype=float)
+
+
+#  Time counters of each process saved in checkpoints
+_time_counters = ['steps', 'days_elapsed', 'years_elapsed', 'day_of_year_index']
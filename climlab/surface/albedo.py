@@ -3,7 +3,7 @@ from builtins import next
 import numpy as np
 from climlab.process.diagnostic import DiagnosticProcess
 from climlab.utils.legendre import P2
-from climlab.domain.field import Field, global_mean
+from climlab.domain.field import Field
 
 
 class ConstantAlbedo(DiagnosticProcess):
@@ -208,6 +208,10 @@ class Iceline(DiagnosticProcess):
                         surface is covered with ice                     \n
                         - unit: :math:`^{\circ} \\textrm{C}`            \n
                         - default value: ``-10``
+    :param bool interpolate:    if ``True``, the ice edges are found by linear
+                                interpolation of surface temperature between
+                                grid points, otherwise they are at the
+                                boundaries of grid cells [default: False]
 
     **Object attributes** \n
 
@@ -216,7 +220,8 @@ class Iceline(DiagnosticProcess):
     following object attributes are generated and updated during initialization:
 
     :ivar dict param:           The parameter dictionary is updated with the
-                                input argument ``'Tf'``.
+                                input arguments ``'Tf'`` and ``'interpolate'``.
+    :ivar bool interpolate:     input argument ``interpolate``
     :ivar dict diagnostics:     keys ``'icelat'`` and ``'ice_area'`` initialized
     :ivar array icelat:         the subprocess attribute ``self.icelat`` is
                                 created
@@ -225,9 +230,13 @@ class Iceline(DiagnosticProcess):
 
 
     """
-    def __init__(self, Tf=-10., **kwargs):
+    def __init__(self, Tf=-10., interpolate=False, **kwargs):
         super(DiagnosticProcess, self).__init__(**kwargs)
         self.param['Tf'] = Tf
+        self.param['interpolate'] = interpolate
+        self.interpolate = interpolate
+        #  ice masks, updated in place
+        self._allocate_masks()
         self.add_diagnostic('icelat')
         self.add_diagnostic('ice_area')
         #  Set diagnostics based on initial conditions
@@ -247,8 +256,11 @@ class Iceline(DiagnosticProcess):
                                 :math:`T_s \\ge T_f`
         :ivar Field ice:        a Field of booleans which are ``True`` where
                                 :math:`T_s < T_f`
-        :ivar array icelat:     an array with two elements indicating the
-                                ice-edge latitudes
+        :ivar array icelat:     the southern and northern ice-edge latitudes
+                                (see :func:`ice_edge_latitudes`), an array
+                                with two elements for a single latitude profile,
+                                or with dimensions ``(..., 2)`` for each
+                                longitude or ensemble member
         :ivar float ice_area:   fractional area covered by ice (0 - 1)
         :ivar dict diagnostics: keys ``'icelat'`` and ``'ice_area'`` are updated
 
@@ -256,77 +268,119 @@ class Iceline(DiagnosticProcess):
         Tf = self.param['Tf']
         Ts = self.state['Ts']
         lat_bounds = self.domains['Ts'].axes['lat'].bounds
-        self.noice = np.where(Ts >= Tf, True, False)
-        self.ice = np.where(Ts < Tf, True, False)
+        if self.ice.shape != Ts.shape:
+            self._allocate_masks()
+        np.less(Ts, Tf, out=self.ice)
+        np.logical_not(self.ice, out=self.noice)
         #  Ice cover in fractional area
-        self.ice_area = global_mean(self.ice * np.ones_like(self.Ts))
+        self.ice_area = np.array(np.dot(self._area_weights, self.ice.ravel()))
         #  Express ice cover in terms of ice edge latitudes
-        if self.ice.all():
-            # 100% ice cover
-            self.icelat = np.array([-0., 0.])
-        elif self.noice.all():
-            # zero ice cover
-            self.icelat = np.array([-90., 90.])
-        else:  # there is some ice edge
-            # Taking np.diff of a boolean array gives True at the boundaries between True and False
-            boundary_indices = np.where(np.diff(self.ice.squeeze()))[0]+1
-            # check for asymmetry case: [-90,x] or [x,90]
-            #  -> boundary_indices hold only one value for icelat
-            if boundary_indices.size == 1:
-                if self.ice[0] == True:   # case: [x,90]
-                    # extend indice array by missing value for northpole
-                    boundary_indices = np.append(boundary_indices, self.ice.size)
-                elif  self.ice[-1] == True:   # case: [-90,x]
-                    # extend indice array by missing value for northpole
-                    boundary_indices = np.insert(boundary_indices,0 ,0)
-            # check for asymmetry case: [-90,x] or [x,90]
-            #  -> boundary_indices hold only one value for icelat
-            if boundary_indices.size == 1:
-                if self.ice[0] == True:   # case: [x,90]
-                    # extend indice array by missing value for northpole
-                    boundary_indices = np.append(boundary_indices, self.ice.size)
-                elif  self.ice[-1] == True:   # case: [-90,x]
-                    # extend indice array by missing value for northpole
-                    boundary_indices = np.insert(boundary_indices,0 ,0)
-            self.icelat = lat_bounds[boundary_indices]  # an array of boundary latitudes
+        dom = self.domains['Ts']
+        edges = ice_edge_latitudes(Ts, Tf, dom.axes['lat'].points, lat_bounds,
+                                   axis=dom.axis_index['lat'],
+                                   interpolate=self.interpolate)
+        #  drop singleton dimensions, e.g. (2,) for a single latitude profile
+        self.icelat = np.reshape(edges, tuple(n for n in edges.shape[:-1] if n > 1) + (2,))
+
+    def _allocate_masks(self):
+        shape = self.state['Ts'].shape
+        self.ice = np.zeros(shape, dtype=bool)
+        self.noice = np.ones(shape, dtype=bool)
+        #  normalized area weights, the ice area is their sum over the ice mask
+        weights = np.broadcast_to(self.domains['Ts'].area_weights, shape)
+        self._area_weights = np.ravel(weights / np.sum(weights))
 
     def _compute(self):
         self.find_icelines()
         return {}
 
 
-class StepFunctionAlbedo(DiagnosticProcess):
-    """A step function albedo suprocess.
+def ice_edge_latitudes(Ts, Tf, lat, lat_bounds, axis=0, interpolate=False):
+    """Latitudes of the edges of the polar ice caps.
+
+    Surface is ice covered where :math:`T_s < T_f`.
+    The southern ice edge is the northern boundary of the ice cap
+    that starts at the first latitude point (the south pole),
+    and the northern ice edge is the southern boundary of the ice cap
+    that ends at the last latitude point.
+    Without ice at the poles the edges are at -90 and 90 degrees,
+    and with ice everywhere both edges are at the equator.
+
+    All profiles along the latitude axis are processed at once.
+
+    :param array Ts:            surface temperature, any number of dimensions
+    :param float Tf:            freezing temperature
+    :param array lat:           latitude points (degrees)
+    :param array lat_bounds:    latitude bounds (degrees)
+    :param int axis:            latitude axis of ``Ts`` [default: 0]
+    :param bool interpolate:    if ``True``, the edges are found by linear
+                                interpolation of ``Ts`` between latitude points,
+                                otherwise they are latitude bounds [default: False]
+    :returns:                   southern and northern ice edge latitudes,
+                                with dimensions of ``Ts`` without the latitude
+                                axis, plus a last dimension of size 2
+    :rtype:                     array
 
-    This class itself defines three subprocesses that are created during
-    initialization:
+    """
+    Ts = np.moveaxis(np.asarray(Ts), axis, -1)
+    lat = np.asarray(lat)
+    lat_bounds = np.asarray(lat_bounds)
+    ice = Ts < Tf
+    num_lat = ice.shape[-1]
+    #  number of ice points at the southern end,
+    #  and index of the first ice point of the northern ice cap
+    south = np.argmin(ice, axis=-1)
+    north = num_lat - np.argmin(ice[..., ::-1], axis=-1)
+    boundaries = np.stack([south, north], axis=-1)
+    edges = lat_bounds[boundaries]
+    if interpolate:
+        #  the edge lies between points boundaries-1 and boundaries
+        inside = (boundaries > 0) & (boundaries < num_lat)
+        upper = np.clip(boundaries, 1, num_lat-1)
+        T1 = np.take_along_axis(Ts, upper-1, axis=-1)
+        T2 = np.take_along_axis(Ts, upper, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.clip((Tf - T1) / (T2 - T1), 0., 1.)
+        interpolated = lat[upper-1] + frac * (lat[upper] - lat[upper-1])
+        edges = np.where(inside, interpolated, edges)
+    #  100% ice cover
+    edges[np.all(ice, axis=-1)] = [-0., 0.]
+    return edges
+
+
+class StepFunctionAlbedo(Iceline):
+    """A step function albedo suprocess.
 
-        * ``'iceline'`` - :class:`Iceline`
-        * ``'warm_albedo'`` - :class:`P2Albedo`
-        * ``'cold_albedo'`` - :class:`ConstantAlbedo`
+    The surface is ice covered where :math:`T_s < T_f` (as for
+    :class:`Iceline`, from which this class inherits the ice masks and the
+    ``icelat`` and ``ice_area`` diagnostics). The albedo is ``ai`` over ice,
+    and :math:`a_0 + a_2 P_2(\\sin\\varphi)` (as for :class:`P2Albedo`)
+    elsewhere. Both are computed directly at each step and the albedo is
+    updated in place, without any subprocesses.
 
     **Initialization parameters** \n
 
-    :param float Tf:    freezing temperature for Iceline subprocess     \n
+    :param float Tf:    freezing temperature                            \n
                         - unit: :math:`^{\circ} \\textrm{C}`            \n
                         - default value: ``-10``
-    :param float a0:    basic parameter for P2Albedo subprocess [default: 0.3]
-    :param float a2:    factor for second legendre polynominal term in P2Albedo
-                        subprocess [default: 0.078]
-    :param float ai:    ice albedo value for ConstantAlbedo subprocess
-                        [default: 0.62]
+    :param float a0:    basic parameter for the ice-free albedo [default: 0.3]
+    :param float a2:    factor for second legendre polynominal term in the
+                        ice-free albedo [default: 0.078]
+    :param float ai:    ice albedo value [default: 0.62]
+    :param bool interpolate:    if ``True``, the ice edges are found by linear
+                                interpolation of surface temperature between
+                                grid points (see :class:`Iceline`) [default: False]
 
     Additional to the parent class
-    :class:`~climlab.process.diagnostic.DiagnosticProcess`
+    :class:`~climlab.surface.albedo.Iceline`
     following object attributes are generated/updated during initialization:
 
     :ivar dict param:               The parameter dictionary is updated with
                                     a couple of the initatilzation input
                                     arguments, namely ``'Tf'``, ``'a0'``,
-                                    ``'a2'`` and ``'ai'``.
-    :ivar bool topdown:             is set to ``False`` to call subprocess
-                                    compute method first
-    :ivar dict diagnostics:         key ``'albedo'`` initialized
+                                    ``'a2'``, ``'ai'`` and ``'interpolate'``.
+    :ivar dict diagnostics:         keys ``'albedo'``, ``'icelat'`` and
+                                    ``'ice_area'`` initialized
     :ivar Field albedo:             the subprocess attribute ``self.albedo`` is
                                     created
 
@@ -347,33 +401,46 @@ class StepFunctionAlbedo(DiagnosticProcess):
               Ts: (90, 1)
             The subprocess tree:
             top: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-               iceline: <class 'climlab.surface.albedo.Iceline'>
-               cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-               warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
 
     """
-    def __init__(self, Tf=-10., a0=0.3, a2=0.078, ai=0.62, **kwargs):
-        super(DiagnosticProcess, self).__init__(**kwargs)
-        self.param['Tf'] = Tf
+    def __init__(self, Tf=-10., a0=0.3, a2=0.078, ai=0.62, interpolate=False, **kwargs):
+        super(StepFunctionAlbedo, self).__init__(Tf=Tf, interpolate=interpolate, **kwargs)
         self.param['a0'] = a0
         self.param['a2'] = a2
         self.param['ai'] = ai
-        sfc = self.domains['Ts']
-        self.add_subprocess('iceline', Iceline(Tf=Tf, state=self.state, timestep=self.timestep))
-        self.add_subprocess('warm_albedo', P2Albedo(a0=a0, a2=a2, domains=sfc, timestep=self.timestep))
-        self.add_subprocess('cold_albedo', ConstantAlbedo(albedo=ai, domains=sfc, timestep=self.timestep))
-        self.topdown = False  # call subprocess compute methods first
         self.add_diagnostic('albedo', self._get_current_albedo())
 
-    def _get_current_albedo(self):
-        '''Simple step-function albedo based on ice line at temperature Tf.'''
-        ice = self.subprocess['iceline'].ice
-        # noice = self.subprocess['iceline'].diagnostics['noice']
-        cold_albedo = self.subprocess['cold_albedo'].albedo
-        warm_albedo = self.subprocess['warm_albedo'].albedo
-        albedo = Field(np.where(ice, cold_albedo, warm_albedo), domain=self.domains['Ts'])
-        return albedo
+    def _warm_albedo(self):
+        '''Albedo of the ice-free surface, broadcastable to the shape of Ts.
+        It is only computed again if ``a0`` or ``a2`` have changed.'''
+        key = (self.param['a0'], self.param['a2'])
+        if getattr(self, '_warm_albedo_key', None) != key:
+            dom = self.domains['Ts']
+            shape = [1] * len(dom.shape)
+            lat = dom.axes['lat'].points
+            shape[dom.axis_index['lat']] = lat.size
+            phi = np.deg2rad(np.reshape(lat, shape))
+            self._warm_albedo_value = key[0] + key[1] * P2(np.sin(phi))
+            self._warm_albedo_key = key
+        return self._warm_albedo_value
+
+    def _get_current_albedo(self, out=None):
+        '''Simple step-function albedo based on ice line at temperature Tf.
+
+        If ``out`` is given, the albedo is written into it
+        instead of a newly created Field.
+        '''
+        if out is None:
+            out = Field(np.zeros(self.ice.shape), domain=self.domains['Ts'])
+        np.copyto(out, self._warm_albedo())
+        np.copyto(out, self.param['ai'], where=self.ice)
+        return out
 
     def _compute(self):
-        self.albedo = self._get_current_albedo()
+        #  ice masks and ice edges, then the albedo in place
+        self.find_icelines()
+        if self.albedo.shape != self.ice.shape:
+            self.albedo = self._get_current_albedo()
+        else:
+            self._get_current_albedo(out=self.albedo)
         return {}
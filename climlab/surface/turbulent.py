@@ -52,13 +52,14 @@ class LatentHeatFlux(SurfaceFlux):
     def _compute_flux(self):
         #  specific humidity at lowest model level
         #  assumes pressure is the last axis
-        q = Field(self.q[..., -1, np.newaxis], domain=self.Ts.domain)
-        Ta = Field(self.Tatm[..., -1, np.newaxis], domain=self.Ts.domain)
-        qs = qsat(self.Ts, self.ps)
-        Deltaq = Field(qs - q, domain=self.Ts.domain)
+        #  (plain arrays, much cheaper than Field arithmetic)
+        q = np.asarray(self.q)[..., -1, np.newaxis]
+        Ta = np.asarray(self.Tatm)[..., -1, np.newaxis]
+        Deltaq = qsat(np.asarray(self.Ts), self.ps) - q
         rho = self._air_density(Ta)
         #  flux from bulk formula
-        self._flux = const.Lhvap * rho * self.Cd * self.U * Deltaq
+        self._flux = Field(const.Lhvap * rho * self.Cd * np.asarray(self.U) * Deltaq,
+                           domain=self.Ts.domain)
         self.LHF = self._flux
 
     def _compute(self):
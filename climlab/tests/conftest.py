@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_orbital_disk_cache(monkeypatch):
+    '''Tests never write orbital data caches outside of their own
+    temporary directories, whatever CLIMLAB_CACHE_DIR is set to.'''
+    from climlab.solar import orbital
+    monkeypatch.setattr(orbital, 'cache_dir', None)
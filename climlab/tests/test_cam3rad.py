@@ -66,3 +66,33 @@ def test_cam3_multidim():
     # Can we integrate?
     rad.step_forward()
     assert rad.OLR.shape == rad.Ts.shape
+
+@pytest.mark.fast
+def test_cam3_latlon():
+    '''CAM3 on a lat-lon grid should reproduce the single-latitude columns.'''
+    from climlab.domain.axis import Axis
+    from climlab.domain.domain import Atmosphere, SlabOcean
+    from climlab.domain.field import Field
+    from climlab.utils.attr_dict import AttrDict
+    latax = Axis(axis_type='lat', num_points=3)
+    lonax = Axis(axis_type='lon', num_points=4)
+    levax = Axis(axis_type='lev', num_points=num_lev)
+    depthax = Axis(axis_type='depth', bounds=[0., 5.])
+    sfc = SlabOcean(axes={'lat': latax, 'lon': lonax, 'depth': depthax})
+    atm = Atmosphere(axes={'lat': latax, 'lon': lonax, 'lev': levax})
+    zonal = climlab.column_state(num_lev=num_lev, num_lat=3, water_depth=5.)
+    state = AttrDict()
+    state['Ts'] = Field(zonal.Ts[:, np.newaxis, :] * np.ones(sfc.shape), domain=sfc)
+    state['Tatm'] = Field(zonal.Tatm[:, np.newaxis, :] * np.ones(atm.shape), domain=atm)
+    state.Ts[:, 2] += 5.
+    rad = climlab.radiation.CAM3(state=state)
+    LW_flux_up = rad.LW_flux_up
+    rad.compute_diagnostics()
+    #  output is written in place
+    assert rad.LW_flux_up is LW_flux_up
+    assert rad.OLR.shape == rad.Ts.shape
+    assert np.all(rad.OLR[:, 2] > rad.OLR[:, 0])
+    radzon = climlab.radiation.CAM3(state=zonal)
+    radzon.compute_diagnostics()
+    assert np.allclose(rad.OLR[:, 1], radzon.OLR)
+    assert np.allclose(rad.TdotSW[:, 3], radzon.TdotSW)
@@ -36,3 +36,41 @@ def test_2D_insolation():
     m.add_subprocess('insolation',
         climlab.radiation.P2Insolation(domains=sfc, **m.param))
     assert np.mean(m.subprocess['insolation'].insolation) == 300.34399999999999
+
+@pytest.mark.fast
+def test_global_mean_axis():
+    '''Area weights are cached on the domain and global_mean can average
+    a stack of fields in one call.'''
+    state = climlab.surface_state(num_lat=30, num_lon=40)
+    dom = state.Ts.domain
+    weights = dom.area_weights
+    assert weights is dom.area_weights
+    assert weights.shape == (30, 40, 1)
+    #  exact area of each grid cell on the unit sphere
+    area = (np.deg2rad(np.diff(dom.lon.bounds))[np.newaxis, :] *
+            np.diff(np.sin(np.deg2rad(dom.lat.bounds)))[:, np.newaxis])
+    T = climlab.Field(np.random.rand(30, 40, 1), domain=dom)
+    assert np.isclose(climlab.global_mean(T),
+                      np.sum(area*T[..., 0]) / np.sum(area), rtol=1E-4)
+    ensemble = T + np.arange(3.)[:, np.newaxis, np.newaxis, np.newaxis]
+    means = climlab.global_mean(ensemble, axis=(1, 2, 3))
+    assert means.shape == (3,)
+    assert np.allclose(means, climlab.global_mean(T) + np.arange(3.))
+    #  zonal mean domain
+    ebm = climlab.EBM(num_lat=45)
+    assert ebm.Ts.domain.area_weights.shape == (45, 1)
+    assert np.isclose(climlab.global_mean(ebm.Ts),
+        np.average(ebm.Ts[:, 0], weights=np.cos(np.deg2rad(ebm.lat))))
+
+@pytest.mark.fast
+def test_global_mean_lon_slice():
+    '''A longitude slice of a 2D field keeps the 2D domain,
+    its global mean uses latitude weights.'''
+    state = climlab.surface_state(num_lat=18, num_lon=4)
+    Ts = state.Ts[:, 0]
+    assert Ts.domain.shape == (18, 4, 1)
+    coslat = np.cos(np.deg2rad(state.Ts.domain.lat.points))
+    assert np.isclose(climlab.global_mean(Ts),
+                      np.average(np.squeeze(Ts), weights=coslat))
+    with pytest.raises(ValueError):
+        climlab.global_mean(Ts, axis=0)
@@ -91,9 +91,72 @@ def test_albedo():
     m.add_subprocess('albedo', climlab.surface.StepFunctionAlbedo(state=m.state, **m.param))
     m.integrate_years(1)
     assert np.all(m.icelat == np.array([-70.,  70.]))
-    assert np.all(m.icelat == m.subprocess.albedo.subprocess.iceline.icelat)
+    assert np.all(m.icelat == m.subprocess.albedo.icelat)
     #  What is the expected behavior if we swap out a subprocess for another
     #  and they have different diagnostics???
     #m.add_subprocess('albedo', albedo.ConstantAlbedo(state=m.state, **m.param))
     #m.integrate_years(1)
     #assert m.icelat == None
+
+@pytest.mark.fast
+def test_step_function_albedo():
+    '''The step function albedo is computed without subprocesses,
+    updated in place, and matches its ice mask.'''
+    m = climlab.EBM()
+    alb = m.subprocess['albedo']
+    assert len(alb.subprocess) == 0
+    albedo = alb.albedo
+    ice = alb.ice
+    m.Ts[:] = np.linspace(-30., 30., m.Ts.size).reshape(m.Ts.shape)
+    m.step_forward()
+    assert alb.albedo is albedo
+    assert alb.ice is ice
+    warm = climlab.surface.P2Albedo(a0=alb.param['a0'], a2=alb.param['a2'],
+                                    domains=m.domains['Ts']).albedo
+    expected = np.where(alb.ice, alb.param['ai'], warm)
+    assert np.all(alb.albedo == expected)
+    assert np.any(alb.ice) and np.any(alb.noice)
+    assert np.all(alb.noice == ~alb.ice)
+    weights = np.cos(np.deg2rad(m.lat))
+    assert np.isclose(alb.ice_area, np.average(np.squeeze(alb.ice), weights=weights))
+    assert np.isclose(m.ice_area, alb.ice_area)
+    #  same ice diagnostics as the Iceline process
+    iceline = climlab.surface.Iceline(Tf=alb.param['Tf'], state=m.state)
+    assert np.all(alb.icelat == iceline.icelat)
+    assert np.all(alb.ice == iceline.ice)
+    #  a change of parameters is used at the next step
+    alb.param['a0'] += 0.1
+    alb.param['ai'] = 0.7
+    m.step_forward()
+    assert np.allclose(alb.albedo, np.where(alb.ice, 0.7, warm + 0.1))
+
+@pytest.mark.fast
+def test_ice_edge_latitudes():
+    from climlab.surface.albedo import ice_edge_latitudes
+    lat_bounds = np.linspace(-90., 90., 19)
+    lat = 0.5 * (lat_bounds[1:] + lat_bounds[:-1])
+    #  columns with: polar caps, no ice, ice everywhere, southern cap only
+    Ts = np.array([30. - 60.*np.abs(np.sin(np.deg2rad(lat))),
+                   np.full_like(lat, 20.),
+                   np.full_like(lat, -20.),
+                   np.where(lat < -40., -20., 20.)])
+    expected = np.array([[-30., 30.], [-90., 90.], [-0., 0.], [-40., 90.]])
+    edges = ice_edge_latitudes(Ts, -0., lat, lat_bounds, axis=1)
+    assert np.all(edges == expected)
+    #  any number of dimensions, latitude on any axis
+    edges = ice_edge_latitudes(np.moveaxis(np.tile(Ts, (3, 1, 1)), 2, 0),
+                               -0., lat, lat_bounds)
+    assert edges.shape == (3, 4, 2)
+    assert np.all(edges == expected)
+    #  sub-grid interpolation of a temperature linear in latitude
+    Ts = 20. - np.abs(lat)
+    edges = ice_edge_latitudes(Ts, -32., lat, lat_bounds, interpolate=True)
+    assert np.allclose(edges, [-52., 52.])
+    #  the iceline process gives one pair of edges per longitude
+    sfc = climlab.domain.surface_2D(num_lat=18, num_lon=4)
+    Ts = climlab.Field(np.zeros(sfc.shape), domain=sfc)
+    Ts[...] = 30. - 60.*np.abs(np.sin(np.deg2rad(lat)))[:, np.newaxis, np.newaxis]
+    iceline = climlab.surface.albedo.Iceline(Tf=-0., state={'Ts': Ts})
+    assert iceline.icelat.shape == (4, 2)
+    assert np.all(iceline.icelat == [-30., 30.])
+    assert iceline.param['interpolate'] is False
@@ -2,6 +2,7 @@ from __future__ import division
 import numpy as np
 import climlab
 from climlab.convection import emanuel_convection
+from climlab.utils.thermo import qsat, pseudoadiabat_profile
 from climlab.tests.xarray_test import to_xarray
 import pytest
 
@@ -141,3 +142,104 @@ def test_rcm_emanuel():
         model.add_subprocess(proc.name, proc)
     model.step_forward()
     to_xarray(model)
+
+@pytest.mark.fast
+def test_column_options():
+    #  Same results when the Fortran code is only called for convecting columns
+    #  and when the columns are computed in parallel threads
+    num_lat = 30
+    state = climlab.column_state(num_lev=num_lev, num_lat=num_lat)
+    noise = np.random.RandomState(0)
+    shift = np.linspace(-40., 10., num_lat)
+    state.Tatm[:] = T + shift[:, np.newaxis] + noise.normal(0., 1., state.Tatm.shape)
+    state['q'] = state.Tatm * 0. + Q * noise.uniform(0.1, 1.5, (num_lat, 1))
+    results = []
+    options = [{}, {'skip_stable_columns': True}, {'num_threads': 4},
+               {'skip_stable_columns': True, 'num_threads': 4}]
+    for option in options:
+        this_state = {name: value.copy() for name, value in state.items()}
+        conv = emanuel_convection.EmanuelConvection(state=this_state, timestep=DELT,
+                                                    **option)
+        output = []
+        for n in range(5):
+            conv.step_forward()
+            #  skipped columns have IFLAG = -1 instead of the reason
+            #  CONVECT would have given for returning early
+            if option.get('skip_stable_columns'):
+                assert np.all(np.isin(conv.IFLAG, [-1, 0, 1, 2, 3, 4]))
+            else:
+                assert np.all(np.isin(conv.IFLAG, [0, 1, 2, 3, 4]))
+            output += [conv.tendencies['Tatm'], conv.tendencies['q'],
+                       conv.CBMF, conv.PRECIP, np.isin(conv.IFLAG, [1, 4])]
+        results.append(output)
+    #  some columns convect and some don't
+    assert np.any(conv.IFLAG == 1)
+    assert np.any(conv.IFLAG != 1)
+    #  some stable columns are skipped
+    to_convect = emanuel_convection._climlab_to_convect
+    lev = conv.Tatm.domain.lev
+    active = emanuel_convection._possibly_convecting(
+        to_convect(conv.Tatm), to_convect(conv.q), to_convect(lev.points),
+        to_convect(lev.bounds), np.ravel(conv.CBMF))
+    assert not np.all(active)
+    assert np.all(active[np.ravel(conv.IFLAG) == 1])
+    assert np.all(conv.IFLAG[~active] == -1)
+    for output in results[1:]:
+        for field, reference in zip(output, results[0]):
+            assert np.array_equal(field, reference)
+
+@pytest.mark.fast
+def test_thread_pool():
+    #  One thread pool is reused across time steps and replaced
+    #  when the number of threads changes
+    state = climlab.column_state(num_lev=num_lev, num_lat=8)
+    state.Tatm[:] = T
+    state['q'] = state.Tatm * 0. + Q
+    conv = emanuel_convection.EmanuelConvection(state=state, timestep=DELT,
+                                                num_threads=2)
+    conv.step_forward()
+    executor = conv._executor
+    assert executor is not None
+    conv.step_forward()
+    assert conv._executor is executor
+    assert conv.input['num_threads'] == 2
+    conv.num_threads = 3
+    conv.step_forward()
+    assert conv._executor is not executor
+    assert conv._executor._max_workers == 3
+    #  processes with a thread pool can still be copied
+    climlab.process_like(conv).step_forward()
+
+@pytest.mark.fast
+def test_possibly_convecting():
+    #  The test used to skip stable columns never skips a column
+    #  in which the Fortran code does moist convection
+    num_col = 2000
+    state = climlab.column_state(num_lev=num_lev)
+    lev = state.Tatm.domain.lev
+    noise = np.random.RandomState(1)
+    #  perturbed moist adiabats, some of them close to neutral
+    T0 = noise.uniform(250., 310., num_col)
+    Tatm = np.maximum(pseudoadiabat_profile(T0, lev.points, p0=1000.), 190.)
+    Tatm += (noise.uniform(-3., 3., (num_col, 1))
+             + noise.normal(0., 0.3, (num_col, num_lev)))
+    q = noise.uniform(0.3, 1., (num_col, 1)) * qsat(Tatm, lev.points)
+    to_convect = emanuel_convection._climlab_to_convect
+    T = to_convect(Tatm)
+    Q = to_convect(q)
+    P = to_convect(lev.points)
+    PH = to_convect(lev.bounds)
+    CBMF = np.zeros(num_col)
+    conv = emanuel_convection.EmanuelConvection(state=state, timestep=DELT)
+    IFLAG, FT, FQ, FU, FV, PRECIP, CBMFnew = conv._convect(
+        T, Q, qsat(T, P), 0.*T, 0.*T, CBMF, P, PH, DELT)
+    convecting = (np.isin(IFLAG, [1, 4]) | np.any(FT != 0., axis=1)
+                  | np.any(FQ != 0., axis=1) | (PRECIP != 0.) | (CBMFnew != 0.))
+    active = emanuel_convection._possibly_convecting(T, Q, P, PH, CBMF)
+    #  both stable and convecting columns in the sample
+    assert np.any(convecting) and not np.all(convecting)
+    assert not np.all(active)
+    assert np.all(active[convecting])
+    #  columns with convection at the last time step are never skipped
+    assert np.all(emanuel_convection._possibly_convecting(
+        T, Q, P, PH, np.ones(num_col)))
@@ -2,7 +2,9 @@ from __future__ import division
 from __future__ import print_function
 import numpy as np
 from climlab import constants as const
-from climlab.solar.insolation import daily_insolation
+from climlab.solar.insolation import (daily_insolation, daily_insolation_chunks,
+                                      annual_mean_insolation)
+from climlab.solar.insolation_table import InsolationTable
 from climlab.solar.orbital import OrbitalTable, LongOrbitalTable
 from climlab import EBM_seasonal
 from climlab.solar.orbital_cycles import OrbitalCycles
@@ -25,6 +27,117 @@ def test_daily_insolation():
                   np.sum(np.cos(np.deg2rad(lat))) )
     np.testing.assert_almost_equal(Q_area_int, 341.384184481)
 
+@pytest.mark.fast
+def test_daily_insolation_chunks():
+    lat = np.linspace( -90., 90., 37 )
+    days = np.arange( 0., 365., 5. )
+    orb = OrbitalTable().lookup_parameters(np.arange(-20., 1.))
+    Q = daily_insolation(lat, days, orb)
+    assert Q.shape == (lat.size, days.size, 21)
+    #  same result one orbit at a time
+    for n in [0, 10, 20]:
+        orb_n = {key: orb[key][n] for key in orb}
+        assert np.array_equal(Q[..., n], daily_insolation(lat, days, orb_n))
+    #  chunked evaluation into a preallocated array
+    out = np.zeros_like(Q)
+    result = daily_insolation(lat, days, orb, out=out, chunk_size=4)
+    assert result is out
+    assert np.array_equal(out, Q)
+    #  generator yields blocks of at most chunk_size orbits
+    for orbits, block in daily_insolation_chunks(lat, days, orb, chunk_size=8):
+        assert block.shape[-1] <= 8
+        assert np.array_equal(block, Q[..., orbits])
+    with pytest.raises(ValueError):
+        daily_insolation(lat, days, orb, out=np.zeros(10))
+
+@pytest.mark.fast
+def test_annual_mean_insolation():
+    lat = np.linspace( -89.5, 89.5, 180 )
+    days = np.linspace(0., const.days_per_year, 10000, endpoint=False)
+    orb = OrbitalTable().lookup_parameters(np.array([-120., -10., 0.]))
+    Qann = annual_mean_insolation(lat, orb)
+    assert Qann.shape == (lat.size, 3)
+    np.testing.assert_allclose(Qann, np.mean(daily_insolation(lat, days, orb), axis=1),
+                               atol=1E-3)
+    #  independent of precession
+    orb = {'ecc': 0.05, 'long_peri': 0., 'obliquity': 23.}
+    Q0 = annual_mean_insolation(lat, orb)
+    orb['long_peri'] = 137.
+    np.testing.assert_allclose(annual_mean_insolation(lat, orb), Q0, atol=1E-8)
+    #  global mean is S0/4/sqrt(1-ecc**2)
+    weights = np.cos(np.deg2rad(lat))
+    np.testing.assert_allclose(np.sum(Q0*weights)/np.sum(weights),
+                               const.S0/4./np.sqrt(1-0.05**2), rtol=1E-4)
+
+@pytest.mark.fast
+def test_insolation_table():
+    lat = np.linspace( -90., 90., 91 )
+    days = np.arange( 0., 365., 2. )
+    table = InsolationTable(lat, days)
+    orb = OrbitalTable().lookup_parameters(np.arange(-1000., 1., 100.))
+    Q = table(orb)
+    assert Q.shape == (lat.size, days.size, 11)
+    #  documented accuracy bound
+    error = np.abs(Q - daily_insolation(lat, days, orb)).max()
+    assert error < 1.13 * table.max_error
+    assert table.max_error < 0.005
+    #  single orbit, scaled solar constant
+    np.testing.assert_allclose(table(S0=1000.), daily_insolation(lat, days, S0=1000.),
+                               atol=table.max_error)
+    with pytest.raises(ValueError):
+        table({'ecc': 0.01, 'long_peri': 90., 'obliquity': 45.})
+
+@pytest.mark.fast
+def test_tabulated_daily_insolation():
+    from climlab.radiation import AnnualMeanInsolation, DailyInsolation
+    sfc = EBM_seasonal().domains['Ts']
+    exact = DailyInsolation(domains=sfc)
+    tabulated = DailyInsolation(domains=sfc, tabulated=True)
+    assert tabulated.param['tabulated']
+    np.testing.assert_allclose(tabulated.insolation_array, exact.insolation_array,
+                               atol=0.01)
+    #  the option only exists for daily insolation
+    assert 'tabulated' not in AnnualMeanInsolation(domains=sfc).param
+
+@pytest.mark.fast
+def test_shared_insolation_cache(monkeypatch):
+    from climlab.radiation import insolation
+    monkeypatch.setattr(insolation, 'insolation_cache_size', 4)
+    models = [EBM_seasonal() for n in range(3)]
+    arrays = [model.subprocess['insolation'].insolation_array for model in models]
+    assert all(array is arrays[0] for array in arrays)
+    assert not arrays[0].flags.writeable
+    #  a change of orbit or solar constant gives a new array
+    ins = models[0].subprocess['insolation']
+    ins.S0 = 1300.
+    assert ins.insolation_array is not arrays[0]
+    np.testing.assert_allclose(ins.insolation_array, arrays[0] * 1300. / const.S0)
+    for ecc in np.linspace(0., 0.05, 10):
+        ins.orb = {'ecc': ecc, 'long_peri': 90., 'obliquity': 23.}
+    assert len(insolation._insolation_cache) <= 4
+
+@pytest.mark.fast
+def test_diurnal_insolation():
+    from climlab.domain.axis import Axis
+    from climlab.domain.domain import SlabOcean
+    from climlab.radiation import DiurnalInsolation
+    axes = {'lat': Axis(axis_type='lat', num_points=30),
+            'lon': Axis(axis_type='lon', num_points=24),
+            'depth': Axis(axis_type='depth', num_points=1)}
+    sfc = SlabOcean(axes=axes)
+    sun = DiurnalInsolation(domains=sfc, timestep=const.seconds_per_hour)
+    assert sun.insolation.shape == sfc.shape
+    Q = 0.
+    for n in range(24):
+        sun.step_forward()
+        assert np.all(sun.coszen >= 0.)
+        Q += sun.insolation / 24.
+    #  every longitude sees the same day
+    np.testing.assert_allclose(Q, Q[:, :1, :] * np.ones_like(Q), atol=1E-10)
+    #  daily mean is close to the daily average insolation
+    Qdaily = daily_insolation(axes['lat'].points, 0.)
+    np.testing.assert_allclose(np.squeeze(Q[:, 0]), Qdaily, atol=2.)
+
 @pytest.mark.fast
 def test_orbital_parameters():
     kyears = np.arange( -1000., 1.)
@@ -41,6 +154,47 @@ def test_orbital_parameters():
         assert orb[k].min() > orb_expected[k][0]
         assert orb[k].max() < orb_expected[k][1]
 
+@pytest.mark.fast
+def test_orbital_lookup():
+    table = OrbitalTable()
+    kyears = np.random.RandomState(0).uniform(table.kyear_min, table.kyear_max, size=(20, 50))
+    orb = table.lookup_parameters(kyears)
+    order = np.argsort(table.kyear)
+    for k in ['ecc', 'obliquity']:
+        assert orb[k].shape == kyears.shape
+        expected = np.interp(kyears, table.kyear[order], getattr(table, k)[order])
+        np.testing.assert_allclose(orb[k], expected, rtol=1E-12)
+    #  exact at the table points, including both ends
+    kyears = np.array([table.kyear_min, -1000., table.kyear_max])
+    orb = table.lookup_parameters(kyears)
+    index = [np.nonzero(table.kyear == k)[0][0] for k in kyears]
+    np.testing.assert_allclose(orb['ecc'], table.ecc[index])
+    #  long_peri is shifted by 180 degrees (Berger 1978 Appendix)
+    np.testing.assert_allclose(orb['long_peri'], (table.long_peri[index] + 180.) % 360.)
+    for kyear in [table.kyear_max + 1., table.kyear_min - 1., np.nan,
+                  [0., np.nan], np.inf]:
+        with pytest.raises(ValueError):
+            table.lookup_parameters(kyear)
+
+@pytest.mark.fast
+def test_orbital_table_cache(tmpdir, monkeypatch):
+    from climlab.solar import orbital
+    #  no disk cache by default
+    assert not isinstance(OrbitalTable().kyear, np.memmap)
+    monkeypatch.setattr(orbital, 'cache_dir', str(tmpdir))
+    table = OrbitalTable()
+    assert tmpdir.join('orbit91.npy').check()
+    #  second load is memory-mapped from the binary cache
+    cached = OrbitalTable()
+    assert isinstance(cached.kyear, np.memmap)
+    for name in ['kyear', 'ecc', 'long_peri', 'obliquity']:
+        assert np.array_equal(getattr(table, name), getattr(cached, name))
+    assert OrbitalTable.instance() is OrbitalTable.instance()
+    #  no download attempt in offline mode
+    monkeypatch.setattr(orbital, 'offline', True)
+    with pytest.raises(IOError):
+        LongOrbitalTable()
+
 @pytest.mark.slow
 def test_long_orbital_parameters():
     kyears = np.arange( -1000., +500.)
@@ -0,0 +1,82 @@
+from __future__ import division
+import numpy as np
+from climlab import EBM_seasonal
+from climlab.solar.orbital_cycles import OrbitalCycles
+from climlab.surface import StepFunctionAlbedo
+import pytest
+
+
+def make_model():
+    '''Seasonal EBM with an albedo feedback.'''
+    ebm = EBM_seasonal()
+    albedo = StepFunctionAlbedo(state=ebm.state, **ebm.param)
+    ebm.add_subprocess('albedo', albedo)
+    return ebm
+
+@pytest.mark.slow
+def test_orbital_cycles_checkpoint(tmpdir):
+    args = dict(kyear_start=-20, kyear_stop=-19.7, segment_length_years=10.,
+                orbital_year_factor=10., verbose=False)
+    reference = OrbitalCycles(make_model(), **args)
+    assert reference.segment == reference.num_segments == 3
+    #  interrupted after the second segment...
+    checkpoint = str(tmpdir.join('checkpoint.npz'))
+    output = str(tmpdir.join('output'))
+    experiment = OrbitalCycles(make_model(), checkpoint=checkpoint, output=output,
+                               integrate=False, **args)
+    experiment.run(num_segments=2)
+    assert experiment.segment == 2
+    assert len(tmpdir.join('output').listdir()) == 2
+    #  ... and resumed with a new model
+    resumed = OrbitalCycles(make_model(), checkpoint=checkpoint, output=output, **args)
+    assert resumed.segment == 3
+    np.testing.assert_allclose(resumed.T_segments, reference.T_segments)
+    np.testing.assert_allclose(resumed.T_segments_global, reference.T_segments_global)
+    segment = np.load(tmpdir.join('output', 'segment_00002.npz').strpath)
+    np.testing.assert_allclose(segment['T_annual'], reference.T_segments_annual[:, 2])
+    assert segment['kyear'] == reference.orb_kyear[2]
+    #  a new run without checkpoint replaces the output of the previous run
+    OrbitalCycles(make_model(), output=output, kyear_start=-20, kyear_stop=-19.9,
+                  segment_length_years=10., orbital_year_factor=10., verbose=False)
+    assert len(tmpdir.join('output').listdir()) == 1
+    #  netCDF output
+    nc = pytest.importorskip('netCDF4')
+    ncfile = str(tmpdir.join('output.nc'))
+    OrbitalCycles(make_model(), output=ncfile, kyear_start=-21, kyear_stop=-20,
+                  segment_length_years=10., orbital_year_factor=20., verbose=False)
+    experiment = OrbitalCycles(make_model(), output=ncfile, **args)
+    with nc.Dataset(ncfile) as dataset:
+        assert dataset.dimensions['segment'].size == 3
+        np.testing.assert_allclose(dataset.variables['T_global'][:],
+                                   reference.T_segments_global)
+
+@pytest.mark.slow
+def test_orbital_cycles_adaptive():
+    args = dict(kyear_start=-20, kyear_stop=-19, segment_length_years=50.,
+                orbital_year_factor=4., verbose=False)
+    reference = OrbitalCycles(make_model(), **args)
+    for extrapolate in [False, True]:
+        experiment = OrbitalCycles(make_model(), adaptive=True, tolerance=0.01,
+                                   extrapolate=extrapolate, **args)
+        assert np.all(experiment.segment_years >= 2.)
+        assert experiment.segment_years.sum() < reference.segment_years.sum() / 2.
+        np.testing.assert_allclose(experiment.T_segments_global,
+                                   reference.T_segments_global, atol=0.05)
+
+@pytest.mark.slow
+def test_orbital_cycles_checkpoint_setup(tmpdir):
+    #  a checkpoint can only be resumed with the same adaptive settings
+    args = dict(kyear_start=-20, kyear_stop=-19.8, segment_length_years=10.,
+                orbital_year_factor=10., verbose=False)
+    checkpoint = str(tmpdir.join('checkpoint.npz'))
+    OrbitalCycles(make_model(), checkpoint=checkpoint, adaptive=True,
+                  integrate=False, **args).run(num_segments=1)
+    for options in [{}, {'adaptive': True, 'tolerance': 0.1},
+                    {'adaptive': True, 'min_years': 3.},
+                    {'adaptive': True, 'extrapolate': True}]:
+        with pytest.raises(ValueError):
+            OrbitalCycles(make_model(), checkpoint=checkpoint, integrate=False,
+                          **dict(args, **options))
+    resumed = OrbitalCycles(make_model(), checkpoint=checkpoint, adaptive=True,
+                            integrate=False, **args)
+    assert resumed.segment == 1
@@ -38,3 +38,88 @@ def test_convective_adjustment(rcm):
     rcm.step_forward()
     rcm.subprocess['ConvectiveAdjustment'].adj_lapse_rate = 'moist adiabat'
     rcm.step_forward()
+
+@pytest.mark.fast
+def test_akmaev_adjustment_columns():
+    from climlab.convection.akmaev_adjustment import (Akmaev_adjustment_columns,
+                                                      Akmaev_adjustment)
+    num_lev = 30
+    state = np.random.RandomState(0)
+    #  unstable profiles of potential temperature, surface first
+    theta = (np.linspace(290., 400., num_lev) +
+             state.normal(0., 10., size=(4, 5, num_lev)))
+    q = state.uniform(0.5, 2., size=num_lev)
+    adjusted = Akmaev_adjustment_columns(theta, q)
+    assert adjusted.shape == theta.shape
+    #  stable and energy conserving
+    assert np.all(np.diff(adjusted, axis=-1) >= -1E-10)
+    np.testing.assert_allclose(np.sum(q*adjusted, axis=-1), np.sum(q*theta, axis=-1))
+    #  same as the pure Python reference, column by column
+    for column in np.ndindex(theta.shape[:-1]):
+        reference = Akmaev_adjustment(theta[column].copy(), q, None,
+                        np.zeros(num_lev, dtype=np.int8), np.zeros(num_lev),
+                        np.zeros(num_lev), np.zeros(num_lev))
+        np.testing.assert_allclose(adjusted[column], reference)
+
+@pytest.mark.fast
+@pytest.mark.parametrize('lapse_rate', [6.5, 'MALR'])
+def test_convective_adjustment_columns(lapse_rate):
+    #  many columns adjusted at once give the same result as one at a time
+    num_lev = 20
+    state = climlab.column_state(num_lev=num_lev, num_lat=6)
+    noise = np.random.RandomState(0)
+    state.Tatm += noise.normal(0., 3., size=state.Tatm.shape)
+    state.Ts += noise.normal(0., 3., size=state.Ts.shape)
+    convadj = climlab.convection.ConvectiveAdjustment(state=state,
+                                                      adj_lapse_rate=lapse_rate)
+    convadj.compute()
+    assert convadj.adjustment['Ts'].shape == state.Ts.shape
+    assert convadj.adjustment['Tatm'].shape == state.Tatm.shape
+    for j in range(state.Ts.shape[0]):
+        column = climlab.column_state(num_lev=num_lev)
+        column.Ts[:] = state.Ts[j]
+        column.Tatm[:] = state.Tatm[j]
+        single = climlab.convection.ConvectiveAdjustment(state=column,
+                                                         adj_lapse_rate=lapse_rate)
+        single.compute()
+        np.testing.assert_allclose(convadj.adjustment['Ts'][j], single.adjustment['Ts'])
+        np.testing.assert_allclose(convadj.adjustment['Tatm'][j], single.adjustment['Tatm'])
+
+@pytest.mark.fast
+def test_convective_adjustment_stable_columns():
+    from climlab.convection.akmaev_adjustment import (convective_adjustment_direct,
+                                                      convective_adjustment_coefficients,
+                                                      Akmaev_adjustment_columns)
+    num_lev = 20
+    p = np.linspace(1000., 50., num_lev)
+    c = np.ones(num_lev)
+    Pi, beta, q = convective_adjustment_coefficients(p, c)
+    #  stable profiles, and unstable ones in every other column
+    theta = np.linspace(300., 400., num_lev) * np.ones((8, 1))
+    theta[::2, :5] = 320.
+    T = theta * Pi
+    Tadj = convective_adjustment_direct(p, T, c)
+    assert np.all(Tadj[1::2] == T[1::2])
+    np.testing.assert_allclose(Tadj, Akmaev_adjustment_columns(theta, q) * Pi)
+    #  pressure-dependent coefficients are cached, but not for moist adiabats
+    state = climlab.column_state(num_lev=num_lev)
+    convadj = climlab.convection.ConvectiveAdjustment(state=state, adj_lapse_rate=6.5)
+    convadj.compute()
+    assert convadj._coefficients is not None
+    #  the cache follows changes of heat capacity and of lapse rate arrays
+    reference = climlab.convection.ConvectiveAdjustment(state=state,
+                                                        adj_lapse_rate=6.5)
+    state.Tatm.domain.heat_capacity *= 2.
+    lapse = np.full(num_lev + 1, 6.5)
+    convadj.adj_lapse_rate = lapse
+    convadj.compute()
+    lapse[:10] = 4.
+    convadj.compute()
+    reference.adj_lapse_rate = lapse.copy()
+    reference.compute()
+    np.testing.assert_allclose(convadj.adjustment['Tatm'], reference.adjustment['Tatm'])
+    np.testing.assert_allclose(convadj.adjustment['Ts'], reference.adjustment['Ts'])
+    convadj.adj_lapse_rate = 'MALR'
+    assert convadj._coefficients is None
+    convadj.compute()
+    assert convadj._coefficients is None
@@ -2,7 +2,8 @@ from __future__ import division
 import numpy as np
 import climlab
 import pytest
-from climlab.radiation.rrtm import _climlab_to_rrtm, _rrtm_to_climlab
+from climlab.radiation.rrtm import _climlab_to_rrtm, _rrtm_to_climlab, radiative_kernels
+from climlab.radiation.rrtm.utils import interface_temperature
 from climlab.tests.xarray_test import to_xarray
 
 num_lev = 30
@@ -56,6 +57,62 @@ def test_multidim():
     rad.step_forward()
     assert rad.OLR.shape == rad.Ts.shape
 
+@pytest.mark.fast
+def test_latlon():
+    '''RRTMG on a lat-lon grid should reproduce the single-latitude columns.'''
+    from climlab.domain.axis import Axis
+    from climlab.domain.domain import Atmosphere, SlabOcean
+    from climlab.domain.field import Field
+    from climlab.utils.attr_dict import AttrDict
+    latax = Axis(axis_type='lat', num_points=3)
+    lonax = Axis(axis_type='lon', num_points=4)
+    levax = Axis(axis_type='lev', num_points=num_lev)
+    depthax = Axis(axis_type='depth', bounds=[0., 5.])
+    sfc = SlabOcean(axes={'lat': latax, 'lon': lonax, 'depth': depthax})
+    atm = Atmosphere(axes={'lat': latax, 'lon': lonax, 'lev': levax})
+    zonal = climlab.column_state(num_lev=num_lev, num_lat=3, water_depth=5.)
+    state = AttrDict()
+    state['Ts'] = Field(zonal.Ts[:, np.newaxis, :] * np.ones(sfc.shape), domain=sfc)
+    state['Tatm'] = Field(zonal.Tatm[:, np.newaxis, :] * np.ones(atm.shape), domain=atm)
+    #  make one longitude warmer than the others
+    state.Ts[:, 2] += 5.
+    rad = climlab.radiation.RRTMG(state=state, icld=0)
+    rad.compute_diagnostics()
+    assert rad.OLR.shape == rad.Ts.shape
+    assert rad.TdotLW.shape == rad.Tatm.shape
+    assert np.all(rad.OLR[:, 2] > rad.OLR[:, 0])
+    radzon = climlab.radiation.RRTMG(state=zonal, icld=0)
+    radzon.compute_diagnostics()
+    assert np.allclose(rad.OLR[:, 0], radzon.OLR)
+    assert np.allclose(rad.ASR[:, 1], radzon.ASR)
+    assert np.allclose(rad.TdotLW[:, 3], radzon.TdotLW)
+    #  conversion to columns and back is reversible
+    assert np.all(_rrtm_to_climlab(_climlab_to_rrtm(rad.Tatm), rad.Tatm.shape) == rad.Tatm)
+
+@pytest.mark.fast
+def test_cached_arguments():
+    '''Arguments are passed in persistent buffers that are updated
+    when inputs are modified in place.'''
+    state = climlab.column_state(num_lev=num_lev, water_depth=5.)
+    rad = climlab.radiation.RRTMG_LW(state=state)
+    args = rad._prepare_lw_arguments()
+    rad.compute_diagnostics()
+    OLR = rad.OLR.copy()
+    co2vmr = args[14]
+    assert co2vmr.flags['F_CONTIGUOUS']
+    rad.absorber_vmr['CO2'] *= 2.
+    args2 = rad._prepare_lw_arguments()
+    assert args2[14] is co2vmr
+    assert np.allclose(co2vmr, rad.absorber_vmr['CO2'])
+    rad.compute_diagnostics()
+    assert rad.OLR < OLR
+    rad.Tatm[-1] += 1.
+    args3 = rad._prepare_lw_arguments()
+    assert args3[9][0, 0] == rad.Tatm[-1]
+    #  interface temperatures match the reference interpolation
+    tlev = _climlab_to_rrtm(interface_temperature(**rad.state))
+    assert np.allclose(args3[10], tlev)
+
 @pytest.mark.fast
 def test_cloud():
     '''Put a high cloud layer in a radiative model.
@@ -82,6 +139,89 @@ def test_cloud():
         assert(rad.ASR - rad.ASRclr < 0.)
         assert(rad.OLR - rad.OLRclr < 0.)
 
+@pytest.mark.fast
+def test_reuse_mcica():
+    '''Reused McICA subcolumns give the same fluxes and are regenerated
+    when the cloud fields change.'''
+    state = climlab.column_state(num_lev=num_lev, water_depth=5.)
+    lev = state.Tatm.domain.axes['lev'].points
+    cldfrac = 0.5*np.exp(-(lev-lev[15])**2/(2*25.)**2)
+    clouds = {'clwp': np.zeros_like(state.Tatm) + 60.,
+              'r_liq': np.zeros_like(state.Tatm) + 14.}
+    rad = climlab.radiation.RRTMG(state=state, cldfrac=cldfrac, **clouds)
+    rad_reuse = climlab.radiation.RRTMG(state=state, cldfrac=cldfrac.copy(),
+                                        reuse_mcica=True, **clouds)
+    rad.compute_diagnostics()
+    rad_reuse.compute_diagnostics()
+    LW = rad_reuse.subprocess['LW']
+    subcolumns = LW._mcica_subcol(LW._prepare_lw_arguments())
+    assert LW._mcica_subcol(LW._prepare_lw_arguments()) is subcolumns
+    assert np.allclose(rad.OLR, rad_reuse.OLR)
+    assert np.allclose(rad.ASR, rad_reuse.ASR)
+    #  Modify cloud field in place
+    rad_reuse.cldfrac *= 0.5
+    assert LW._mcica_subcol(LW._prepare_lw_arguments()) is not subcolumns
+    rad_reuse.compute_diagnostics()
+    assert rad_reuse.OLR > rad.OLR
+    #  clear-sky calculations reuse the same zero arrays
+    rad_clr = climlab.radiation.RRTMG_LW(state=state, icld=0)
+    args = rad_clr._prepare_lw_arguments()
+    assert rad_clr._mcica_subcol(args)[0] is rad_clr._mcica_subcol(args)[0]
+
+@pytest.mark.fast
+def test_radiation_interval():
+    '''Between full radiation calculations, upward longwave fluxes
+    follow the surface temperature through the stored derivatives.'''
+    state = climlab.column_state(num_lev=num_lev, water_depth=5.)
+    rad = climlab.radiation.RRTMG(state=state, icld=0, radiation_interval=3)
+    ref = climlab.radiation.RRTMG(state=state, icld=0)
+    Tatm0 = state.Tatm.copy()
+    Ts0 = state.Ts.copy()
+    rad.step_forward()
+    ASR = rad.ASR.copy()
+    #  Only the surface temperature has changed since the full calculation
+    state.Tatm[:] = Tatm0
+    state.Ts[:] = Ts0 + 1.
+    rad.compute_diagnostics()
+    ref.compute_diagnostics()
+    assert rad.subprocess['LW'].time['steps'] % 3 != 0
+    assert np.allclose(rad.OLR, ref.OLR, atol=0.05)
+    assert np.allclose(rad.LW_flux_up, ref.LW_flux_up, atol=0.2)
+    #  shortwave held fixed
+    assert np.all(rad.ASR == ASR)
+    #  Full calculation every third step
+    rad.step_forward()
+    rad.step_forward()
+    ref.compute_diagnostics()
+    rad.compute_diagnostics()
+    assert np.allclose(rad.OLR, ref.OLR)
+    assert np.allclose(rad.ASR, ref.ASR)
+
+@pytest.mark.fast
+def test_radiation_interval_insolation():
+    '''Between full radiation calculations, shortwave fluxes follow
+    the incoming solar radiation, and sunrise triggers a full calculation.'''
+    state = climlab.column_state(num_lev=num_lev, num_lat=2, water_depth=5.)
+    coszen = np.array([[0.5], [0.]])
+    sw = climlab.radiation.RRTMG_SW(state=state, icld=0, radiation_interval=4,
+                                    coszen=coszen, insolation=coszen*climlab.constants.S0)
+    sw.step_forward()
+    ASR = sw.ASR.copy()
+    assert ASR[0] > 0. and np.isclose(ASR[1], 0., atol=1e-6)
+    sw.coszen = np.array([[0.25], [0.]])
+    sw.compute_diagnostics()
+    assert sw.time['steps'] % 4 != 0
+    assert np.allclose(sw.ASR, np.array([ASR[0] / 2., [0.]]), atol=1e-6)
+    #  sunrise in the second column
+    sw.coszen = np.array([[0.25], [0.25]])
+    sw.compute_diagnostics()
+    ref = climlab.radiation.RRTMG_SW(state=state, icld=0, coszen=sw.coszen,
+                                     insolation=sw.coszen*climlab.constants.S0,
+                                     specific_humidity=sw.specific_humidity)
+    ref.compute_diagnostics()
+    assert np.allclose(sw.ASR, ref.ASR)
+    assert sw.ASR[1] > 0.
+
 @pytest.mark.slow
 def test_radiative_forcing():
     '''Run a single-column radiative-convective model with RRTMG radiation
@@ -143,3 +283,31 @@ def test_latitude():
     grad = np.diff(model.Ts, axis=0)
     assert np.all(grad[0:(int(num_lat/2)-1)] > 0.)
     assert np.all(grad[int(num_lat/2):] < 0.)
+
+@pytest.mark.fast
+def test_kernels():
+    '''Kernels computed in a single batched call to RRTMG should match
+    brute-force perturbations of the model state, one at a time.'''
+    state = climlab.column_state(num_lev=num_lev, num_lat=2, water_depth=5.)
+    h2o = climlab.radiation.ManabeWaterVapor(state=state)
+    rad = climlab.radiation.RRTMG(state=state, specific_humidity=h2o.q,
+                                  cldfrac=0.2, clwp=20., r_liq=14.)
+    kernels = radiative_kernels(rad, dT=1., dlnq=0.1)
+    assert kernels['Tatm'].shape == (2, num_lev, num_lev+1)
+    assert kernels['Ts'].shape == (2, num_lev+1)
+    def net_flux():
+        rad.compute_diagnostics()
+        return np.array(rad.SW_flux_net - rad.LW_flux_net)
+    F0 = net_flux()
+    for k in [0, num_lev//2, num_lev-1]:
+        rad.Tatm[:, k] += 1.
+        assert np.allclose(net_flux() - F0, kernels['Tatm'][:, k])
+        rad.Tatm[:, k] -= 1.
+        q0 = h2o.q[:, k].copy()
+        h2o.q[:, k] *= np.exp(0.1)
+        assert np.allclose((net_flux() - F0)/0.1, kernels['q'][:, k])
+        h2o.q[:, k] = q0
+    rad.Ts += 1.
+    assert np.allclose(net_flux() - F0, kernels['Ts'])
+    #  warmer surface means more OLR
+    assert np.all(kernels['Ts'][:, 0] < 0.)
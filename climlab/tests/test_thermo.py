@@ -33,3 +33,53 @@ def test_thermo_domain():
     thermo.qsat(T, p)
     thermo.pseudoadiabat(T, p)
     thermo.blackbody_emission(T)
+
+@pytest.mark.fast
+def test_water_vapor_in_place():
+    '''Water vapor is updated in place with the saturation formula.'''
+    state = climlab.column_state(num_lev=30, num_lat=3)
+    h2o = climlab.radiation.ManabeWaterVapor(state=state)
+    q = h2o.q
+    h2o.Tatm += 5.
+    h2o.compute_diagnostics()
+    assert h2o.q is q
+    expected = np.maximum(h2o.qStrat, h2o.RH_profile * thermo.clausius_clapeyron(h2o.Tatm)
+                          / h2o.lev * climlab.constants.Rd / climlab.constants.Rv)
+    assert np.allclose(h2o.q, expected, rtol=1E-14, atol=0.)
+
+@pytest.mark.fast
+def test_pseudoadiabat_profile():
+    from scipy.integrate import solve_ivp
+    T0 = np.array([[250., 280.], [300., 310.]])
+    p = np.array([1000., 900., 700., 500., 300., 100., 1050.])
+    T = thermo.pseudoadiabat_profile(T0, p)
+    assert T.shape == T0.shape + p.shape
+    assert np.all(T[..., 0] == T0)
+    #  compare with accurate integration of the slope, one parcel at a time
+    for index in np.ndindex(T0.shape):
+        for k in range(p.size):
+            solution = solve_ivp(lambda pressure, T: thermo.pseudoadiabat(T, pressure),
+                                 (1000., p[k]), [T0[index]], rtol=1E-10, atol=1E-10)
+            assert T[index][k] == pytest.approx(solution.y[0, -1], abs=1E-4)
+
+@pytest.mark.fast
+def test_pseudoadiabat_profile_surface_pressure():
+    '''One surface pressure per column.'''
+    from scipy.integrate import solve_ivp
+    T0 = np.array([300., 290., 280.])
+    p0 = np.array([1010., 850., 600.])
+    p = np.array([1000., 900., 700., 500., 300., 100.])
+    T = thermo.pseudoadiabat_profile(T0, p, p0=p0)
+    assert T.shape == T0.shape + p.shape
+    #  same as a separate calculation for each column
+    for n in range(T0.size):
+        assert np.allclose(T[n], thermo.pseudoadiabat_profile(T0[n], p, p0=p0[n]),
+                           rtol=0., atol=1E-4)
+        for k in range(p.size):
+            solution = solve_ivp(lambda pressure, T: thermo.pseudoadiabat(T, pressure),
+                                 (p0[n], p[k]), [T0[n]], rtol=1E-10, atol=1E-10)
+            assert T[n, k] == pytest.approx(solution.y[0, -1], abs=1E-4)
+    #  p0 is broadcast against T0
+    T = thermo.pseudoadiabat_profile(T0[:, np.newaxis], p, p0=p0)
+    assert T.shape == (3, 3) + p.shape
+    assert np.allclose(T[1, 2], thermo.pseudoadiabat_profile(T0[1], p, p0=p0[2]))
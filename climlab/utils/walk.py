@@ -44,9 +44,6 @@ def walk_processes(top, topname='top', topdown=True, ignoreFlag=False):
             top
             diffusion
             LW
-            iceline
-            cold_albedo
-            warm_albedo
             albedo
             insolation
 
@@ -98,9 +95,6 @@ def process_tree(top, name='top'):
                diffusion: <class 'climlab.dynamics.diffusion.MeridionalDiffusion'>
                LW: <class 'climlab.radiation.AplusBT.AplusBT'>
                albedo: <class 'climlab.surface.albedo.StepFunctionAlbedo'>
-                  iceline: <class 'climlab.surface.albedo.Iceline'>
-                  cold_albedo: <class 'climlab.surface.albedo.ConstantAlbedo'>
-                  warm_albedo: <class 'climlab.surface.albedo.P2Albedo'>
                insolation: <class 'climlab.radiation.insolation.P2Insolation'>
 
     """